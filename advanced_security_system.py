@@ -28,6 +28,8 @@ from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 import keyboard
 import sys
+from keystroke_events import KeystrokeEventBuffer, KEY_DOWN, KEY_UP
+from phrase_template import PhraseTemplate, phrase_timings, timing_list
 
 class AdvancedSecuritySystem:
     def __init__(self):
@@ -89,13 +91,18 @@ class AdvancedSecuritySystem:
         
         typed_chars = []
         char_times = []
+        # Raw presses and releases for the per-position phrase template
+        self.last_key_events = KeystrokeEventBuffer()
         
         def on_key_press(event):
-            if event.event_type == keyboard.KEY_DOWN:
+            if event.event_type == keyboard.KEY_UP:
+                self.last_key_events.append(time.time(), event.name, KEY_UP)
+            elif event.event_type == keyboard.KEY_DOWN:
                 current_time = time.time()
                 if event.name == 'enter':
                     return False  # Stop recording
-                elif len(event.name) == 1:  # Regular character
+                self.last_key_events.append(current_time, event.name, KEY_DOWN)
+                if len(event.name) == 1:  # Regular character
                     typed_chars.append(event.name)
                     char_times.append(current_time)
         
@@ -118,6 +125,7 @@ class AdvancedSecuritySystem:
         print("You'll need to type the same phrase 5 times for accuracy")
         
         all_timings = []
+        position_timings = []
         
         for attempt in range(5):
             print(f"\n📝 Training attempt {attempt + 1}/5")
@@ -125,6 +133,7 @@ class AdvancedSecuritySystem:
             
             if typed_text.lower().replace(' ', '') == training_phrase.lower().replace(' ', ''):
                 all_timings.append(timings)
+                position_timings.append(timing_list(phrase_timings(self.last_key_events, training_phrase)[1]))
                 print("✅ Pattern recorded successfully")
             else:
                 print("❌ Text mismatch, please try again")
@@ -142,6 +151,11 @@ class AdvancedSecuritySystem:
                 'threshold': 0.3  # Tolerance threshold
             }
             
+            try:
+                self.keystroke_patterns[username]['template'] = PhraseTemplate.fit(training_phrase, position_timings).to_dict()
+            except ValueError as e:
+                print(f"⚠️ No per-position timing template: {e}")
+            
             self.save_keystroke_patterns()
             print(f"🎉 Training completed for {username}")
             return True
@@ -165,6 +179,17 @@ class AdvancedSecuritySystem:
             print("❌ Text mismatch")
             return False
         
+        # Per-position hold and latency template, when the profile has one
+        if 'template' in pattern and phrase == pattern['phrase']:
+            template = PhraseTemplate.from_dict(pattern['template'])
+            accepted, score = template.verify(*phrase_timings(self.last_key_events, phrase))
+            print(f"📊 Template score: {score:.3f} (threshold: {template.threshold})")
+            if accepted:
+                print("✅ Authentication successful!")
+                return True
+            print("❌ Authentication failed - keystroke pattern doesn't match")
+            return False
+        
         # Check timing patterns
         if len(timings) != len(pattern['avg_timings']):
             print("❌ Timing pattern length mismatch")
@@ -0,0 +1,12 @@
+"""
+Atomic File Replacement
+Temporary file names for write-then-os.replace that never collide between writers
+"""
+
+import os
+import threading
+
+
+def atomic_tmp_path(path):
+    """Temporary name next to path, unique per process and thread so concurrent writers never share one"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
@@ -0,0 +1,98 @@
+"""
+Scoring Engine Benchmark
+Compares enrollment time, per-attempt scoring latency and EER of the typing scoring engines
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+from keystroke_storage import KeystrokeStorage, NGRAM_FEATURES, stored_user_ids
+from ngram_index import NGramTimingIndex
+from scoring_engines import ENGINES, create_engine, export_engine, equal_error_rate
+
+
+def load_users(data_dir="keystroke_data", min_sessions=6):
+    """KeystrokeStorage and stored sessions for every user with enough sessions"""
+    users = []
+    for user_id in stored_user_ids(data_dir):
+        storage = KeystrokeStorage(user_id)
+        sessions = storage.load_all_sessions()
+        if len(sessions) >= min_sessions:
+            users.append((storage, sessions))
+    return users
+
+
+def benchmark_engines(users, engines=ENGINES, train_fraction=0.5, latency_repeats=200):
+    """Enroll every user with each engine on the first sessions; score the rest and other users' sessions
+
+    Returns {engine: {fit_ms, score_us, eer, per_user_eer}}. Latency is
+    measured on the exported NumPy scorer for a single attempt, which is
+    what authentication runs.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="engine_benchmark_") as export_dir:
+        for engine in engines:
+            fit_times, score_times, per_user_eer = [], [], {}
+            for storage, sessions in users:
+                split = max(3, int(len(sessions) * train_fraction))
+                enrollment, genuine = sessions[:split], sessions[split:]
+                impostor = [session for other, other_sessions in users if other is not storage for session in other_sessions]
+
+                # Only enrollment sessions decide which n-grams become features
+                index = NGramTimingIndex()
+                for session in enrollment:
+                    index.merge(storage.session_ngrams(session))
+                ngrams = index.top_k(NGRAM_FEATURES)
+
+                def matrix(batch):
+                    return np.array([storage.session_vector(session, ngrams) for session in batch], dtype=np.float64)
+
+                started = time.perf_counter()
+                scaler = StandardScaler()
+                model = create_engine(engine).fit(scaler.fit_transform(matrix(enrollment)))
+                fit_times.append(time.perf_counter() - started)
+
+                scorer = export_engine(model, scaler, os.path.join(export_dir, f"{storage.user_id}_{engine}.model"))
+                genuine_scores = scorer.decision_function(scorer.scaler.transform(matrix(genuine)))
+                impostor_scores = scorer.decision_function(scorer.scaler.transform(matrix(impostor)))
+                per_user_eer[storage.user_id] = equal_error_rate(genuine_scores, impostor_scores)[0]
+
+                single = matrix(genuine[:1])
+                started = time.perf_counter()
+                for _ in range(latency_repeats):
+                    scorer.decision_function(scorer.scaler.transform(single))
+                score_times.append((time.perf_counter() - started) / latency_repeats)
+
+            results[engine] = {
+                "fit_ms": float(np.mean(fit_times)) * 1000,
+                "score_us": float(np.mean(score_times)) * 1e6,
+                "eer": float(np.nanmean(list(per_user_eer.values()))),
+                "per_user_eer": per_user_eer
+            }
+    return results
+
+
+def main():
+    """Benchmark every engine on the stored keystroke data"""
+    print("⏱️ SCORING ENGINE BENCHMARK")
+    print("=" * 40)
+
+    users = load_users()
+    if len(users) < 2:
+        print("❌ Need at least two users with 6+ stored sessions to measure impostor scores")
+        return
+
+    print(f"👥 Users: {len(users)}  📊 Sessions: {sum(len(sessions) for _, sessions in users)}")
+    results = benchmark_engines(users)
+
+    print()
+    print(f"{'engine':<18}{'fit (ms)':>10}{'score (µs)':>12}{'EER':>8}")
+    for engine, result in results.items():
+        print(f"{engine:<18}{result['fit_ms']:>10.1f}{result['score_us']:>12.1f}{result['eer']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
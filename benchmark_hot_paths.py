@@ -0,0 +1,295 @@
+"""
+Hot Path Microbenchmarks
+Times feature extraction, training and scoring over growing synthetic inputs and saves diffable JSON results
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+from keystroke_events import EVENT_TYPE_CODES
+from session_database import STORAGE_BACKENDS, configured_backend
+from typing_population import TypingPopulation, TRAINING_TEXTS
+
+# Raw key events per session for the per-event benchmarks, and stored sessions per user for the per-session ones
+DEFAULT_EVENT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_SESSION_SIZES = [3, 10, 100, 1_000, 10_000]
+QUICK_EVENT_SIZES = [100, 1_000, 10_000]
+QUICK_SESSION_SIZES = [3, 10, 100]
+# Relative median change that the comparison flags as a regression or an improvement
+CHANGE_TOLERANCE = 0.10
+
+
+def measure(run, setup=None, repeats=10, min_repeats=3, time_budget=2.0, warmup=1):
+    """Time run() repeatedly, then once more under tracemalloc for its peak allocation
+
+    `warmup` untimed calls come first so lazy imports and first-call caches
+    are not counted. Timing stops after `repeats` runs, or earlier once `time_budget` seconds have
+    gone by and at least `min_repeats` runs were timed, so large inputs
+    stay affordable. setup(), if given, runs untimed before every call.
+    Memory is traced in a separate run so tracing never inflates the times.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        run()
+
+    times = []
+    started = time.perf_counter()
+    for i in range(repeats):
+        if setup:
+            setup()
+        begin = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - begin)
+        if i + 1 >= min_repeats and time.perf_counter() - started > time_budget:
+            break
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    times = np.array(times) * 1000
+    return {
+        "median_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "min_ms": float(times.min()),
+        "repeats": len(times),
+        "peak_kb": peak / 1024
+    }
+
+
+def long_session(population, events):
+    """One synthetic typing with exactly `events` raw key events, as stored keystrokes"""
+    text = " ".join(TRAINING_TEXTS)
+    text = " ".join([text] * (events // (2 * len(text)) + 1))
+    keystrokes = population.session(population.profile(0), 0, text).keystrokes()
+    return keystrokes[:events]
+
+
+def collector_training_record(session):
+    """A KeystrokeCollector.save_training_data entry for a synthetic session"""
+    buffer = session.event_buffer()
+    dwell = buffer.hold_times()
+    flight = buffer.release_to_press_times()
+    return {
+        'timestamp': time.time(),
+        'features': {
+            'avg_dwell_time': float(dwell.mean()),
+            'std_dwell_time': float(dwell.std()),
+            'avg_flight_time': float(flight.mean()),
+            'std_flight_time': float(flight.std()),
+            'typing_speed': len(dwell) / session.duration if session.duration else 0,
+            'rhythm_consistency': float(1 / (1 + flight.std())),
+            'pressure_pattern': float(dwell.mean() / flight.mean())
+        },
+        'raw_dwell_times': dwell.tolist(),
+        'raw_flight_times': flight.tolist()
+    }
+
+
+def storage_with_sessions(population, user_id, count, backend=None):
+    """A KeystrokeStorage holding `count` synthetic sessions, loaded through its own backup import"""
+    from keystroke_storage import KeystrokeStorage
+
+    storage = KeystrokeStorage(user_id, backend=backend)
+    typist = population.profile(0)
+    sessions = []
+    for index, session in enumerate(population.sessions(typist, count)):
+        payload = session.payload()
+        sessions.append({
+            "session_id": index + 1,
+            "timestamp": datetime.now().isoformat(),
+            "text_typed": payload["text"],
+            "keystrokes": payload["keystrokes"],
+            "typing_speed": payload["typing_speed"],
+            "accuracy": payload["accuracy"],
+            "session_duration": payload["duration"]
+        })
+    backup = os.path.join(storage.user_dir, "benchmark_backup.json")
+    with open(backup, 'w') as f:
+        json.dump({"user_id": user_id, "profile": storage.profile, "sessions": sessions}, f)
+    storage.import_data(backup)
+    os.remove(backup)
+    storage.profile["training_sessions"] = count
+    storage.save_profile()
+    return storage
+
+
+def benchmark_events(population, sizes, repeats, collector_class=None):
+    """Per-event paths: KeystrokeStorage.extract_features and, given the class, KeystrokeCollector.get_typing_features"""
+    from keystroke_storage import KeystrokeStorage
+
+    storage = KeystrokeStorage("benchmark_events")
+    results = []
+    for size in sizes:
+        keystrokes = long_session(population, size)
+        print(f"  ⏱️ {size:,} events")
+        results.append(dict(name="KeystrokeStorage.extract_features", size=size, unit="events",
+                            **measure(lambda: storage.extract_features(keystrokes), repeats=repeats)))
+
+        if collector_class is not None:
+            collector = collector_class()
+            start = time.time()
+            for event in keystrokes:
+                collector.process_event(start + event["timestamp"] / 1000, event["key"], EVENT_TYPE_CODES[event["type"]])
+            results.append(dict(name="KeystrokeCollector.get_typing_features", size=size, unit="events",
+                                **measure(collector.get_typing_features, repeats=repeats)))
+    return results
+
+
+def benchmark_sessions(population, sizes, repeats, backend=None):
+    """Per-session paths: KeystrokeStorage stats/training/authentication and TypingPatternModel training/authentication"""
+    from feature_cache import FeatureMatrixCache
+    from typing_model import TypingPatternModel
+
+    attempt = population.session(population.profile(0), 10_000_000).payload()
+    results = []
+    for size in sizes:
+        print(f"  ⏱️ {size:,} sessions")
+        storage = storage_with_sessions(population, f"benchmark_{size}", size, backend)
+
+        def drop_feature_cache():
+            for path in (storage.feature_cache.matrix_file, storage.feature_cache.index_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            storage.feature_cache = FeatureMatrixCache(storage.user_dir)
+
+        results.append(dict(name="KeystrokeStorage.prepare_training_data[cold]", size=size, unit="sessions",
+                            **measure(storage.prepare_training_data, setup=drop_feature_cache, repeats=repeats)))
+        results.append(dict(name="KeystrokeStorage.prepare_training_data[cached]", size=size, unit="sessions",
+                            **measure(storage.prepare_training_data, repeats=repeats)))
+        results.append(dict(name="KeystrokeStorage.get_user_stats", size=size, unit="sessions",
+                            **measure(storage.get_user_stats, repeats=repeats)))
+        results.append(dict(name="KeystrokeStorage.train_model", size=size, unit="sessions",
+                            **measure(storage.train_model, repeats=repeats)))
+        results.append(dict(name="KeystrokeStorage.authenticate_typing", size=size, unit="sessions",
+                            **measure(lambda: storage.authenticate_typing(attempt), repeats=repeats)))
+
+        training_file = f"benchmark_training_{size}.json"
+        with open(training_file, 'w') as f:
+            json.dump([collector_training_record(session) for session in population.sessions(population.profile(0), size)], f)
+        model = TypingPatternModel(f"benchmark_model_{size}.pkl", f"benchmark_scaler_{size}.pkl")
+        results.append(dict(name="TypingPatternModel.train_model", size=size, unit="sessions",
+                            **measure(lambda: model.train_model(training_file), repeats=repeats)))
+        model.save_model()
+        model.load_model()
+        features = collector_training_record(population.session(population.profile(0), 10_000_000))["features"]
+        results.append(dict(name="TypingPatternModel.authenticate", size=size, unit="sessions",
+                            **measure(lambda: model.authenticate(features), repeats=repeats)))
+    return results
+
+
+def environment():
+    """Versions and machine details stored with the results"""
+    import sklearn
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare_results(current, baseline):
+    """Per-benchmark median ratio against a baseline run: [(name, size, baseline_ms, current_ms, ratio)]"""
+    previous = {(result["name"], result["size"]): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = previous.get((result["name"], result["size"]))
+        if before is not None and before["median_ms"] > 0:
+            rows.append((result["name"], result["size"], before["median_ms"], result["median_ms"],
+                         result["median_ms"] / before["median_ms"]))
+    return rows
+
+
+def main():
+    """Run the hot path benchmarks"""
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the keystroke feature, training and scoring paths")
+    parser.add_argument("--events", default=None, help="Comma-separated event counts (default 100 to 1,000,000)")
+    parser.add_argument("--sessions", default=None, help="Comma-separated session counts (default 3 to 10,000)")
+    parser.add_argument("--quick", action="store_true", help="Small sizes only, for a fast check")
+    parser.add_argument("--repeats", type=int, default=10, help="Maximum timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic population seed")
+    parser.add_argument("--backend", choices=STORAGE_BACKENDS, default=None, help="KeystrokeStorage backend (default: from security_config.json)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare medians against")
+    args = parser.parse_args()
+
+    event_sizes = [int(size) for size in args.events.split(",")] if args.events else (QUICK_EVENT_SIZES if args.quick else DEFAULT_EVENT_SIZES)
+    session_sizes = [int(size) for size in args.sessions.split(",")] if args.sessions else (QUICK_SESSION_SIZES if args.quick else DEFAULT_SESSION_SIZES)
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+
+    print("⏱️ HOT PATH BENCHMARKS")
+    print("=" * 40)
+    try:
+        from keystroke_collector import KeystrokeCollector
+    except Exception as e:
+        # pynput needs a display or input device; skip that benchmark rather than the whole run
+        print(f"⚠️ KeystrokeCollector unavailable ({e}), skipping get_typing_features")
+        KeystrokeCollector = None
+    population = TypingPopulation(args.seed)
+    results = []
+
+    # Storage and models write relative to the working directory, so run in a scratch one
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="hot_path_benchmark_")
+    try:
+        os.chdir(work_dir)
+        with open(os.devnull, 'w') as devnull:
+            print("📈 Per-event benchmarks")
+            with contextlib.redirect_stdout(devnull):
+                results.extend(benchmark_events(population, event_sizes, args.repeats, KeystrokeCollector))
+            print("📈 Per-session benchmarks")
+            with contextlib.redirect_stdout(devnull):
+                results.extend(benchmark_sessions(population, session_sizes, args.repeats, args.backend))
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"environment": environment(), "seed": args.seed, "backend": args.backend or configured_backend(), "results": results}
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    print(f"{'benchmark':<48}{'size':>10}{'median (ms)':>13}{'p95 (ms)':>11}{'peak (KB)':>12}")
+    for result in results:
+        print(f"{result['name']:<48}{result['size']:>10,}{result['median_ms']:>13.3f}{result['p95_ms']:>11.3f}{result['peak_kb']:>12.0f}")
+
+    if baseline is not None:
+        print(f"\n📊 Compared with {args.compare}")
+        for name, size, before, after, ratio in compare_results(report, baseline):
+            marker = "🔴" if ratio > 1 + CHANGE_TOLERANCE else "🟢" if ratio < 1 - CHANGE_TOLERANCE else "⚪"
+            print(f"{marker} {name:<48}{size:>10,}{before:>11.3f} → {after:.3f} ms ({ratio:.2f}x)")
+
+    print(f"\n💾 Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Detector Calibration
+Grid-searches engine settings per user and keeps the EER-optimal acceptance threshold
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scoring_engines import create_engine, equal_error_rate
+
+DEFAULT_GRID = {
+    "isolation_forest": {"contamination": [0.01, 0.05, 0.1, 0.15, 0.2], "n_estimators": [50, 100, 200]},
+    # Contamination only rescales a distance detector's scores, so one setting covers it
+    "scaled_manhattan": {"contamination": [0.1], "n_estimators": [None]},
+    "mahalanobis": {"contamination": [0.1], "n_estimators": [None]}
+}
+
+
+def grid_configs(grid=None):
+    """Expand a {engine: {param: [values]}} grid into a list of settings dicts"""
+    configs = []
+    for engine, params in (grid or DEFAULT_GRID).items():
+        for contamination in params.get("contamination", [0.1]):
+            for n_estimators in params.get("n_estimators", [100]):
+                configs.append({"engine": engine, "contamination": contamination, "n_estimators": n_estimators or 100})
+    return configs
+
+
+def synthetic_impostors(X_genuine, count=200, spread=3.0, seed=0):
+    """Impostor vectors drawn around the genuine mean with a much wider spread
+
+    Used when no other users' sessions are available; each feature is drawn
+    independently with `spread` times the genuine standard deviation (or 10%
+    of the mean for features that never varied).
+    """
+    X_genuine = np.asarray(X_genuine, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    mean = X_genuine.mean(axis=0)
+    std = X_genuine.std(axis=0)
+    std = np.where(std > 0, std, np.maximum(np.abs(mean) * 0.1, 1e-3))
+    return np.abs(rng.normal(mean, spread * std, size=(count, len(mean))))
+
+
+def leave_one_out_scores(config, X_genuine, X_impostor):
+    """Genuine scores of each held-out session and pooled impostor scores, one model per fold"""
+    from sklearn.preprocessing import StandardScaler
+
+    genuine, impostor = [], []
+    for held_out in range(len(X_genuine)):
+        train = np.delete(X_genuine, held_out, axis=0)
+        scaler = StandardScaler()
+        model = create_engine(config["engine"], config["contamination"], config["n_estimators"])
+        model.fit(scaler.fit_transform(train))
+        genuine.append(model.decision_function(scaler.transform(X_genuine[held_out:held_out + 1]))[0])
+        impostor.append(model.decision_function(scaler.transform(X_impostor)))
+    return np.array(genuine), np.concatenate(impostor)
+
+
+def evaluate_config(config, X_genuine, X_impostor):
+    """EER and EER threshold of one setting under leave-one-session-out"""
+    started = time.perf_counter()
+    genuine, impostor = leave_one_out_scores(config, X_genuine, X_impostor)
+    eer, threshold = equal_error_rate(genuine, impostor)
+    return dict(config, eer=eer, threshold=threshold, seconds=time.perf_counter() - started)
+
+
+def _evaluate_config_args(args):
+    return evaluate_config(*args)
+
+
+def calibrate(X_genuine, X_impostor, grid=None, workers=None):
+    """Evaluate every grid setting in parallel; returns (best, all results sorted by EER)
+
+    Ties on EER go to the cheaper setting (distance engines, then fewer trees).
+    """
+    X_genuine = np.asarray(X_genuine, dtype=np.float64)
+    X_impostor = np.asarray(X_impostor, dtype=np.float64)
+    configs = grid_configs(grid)
+    tasks = [(config, X_genuine, X_impostor) for config in configs]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        results = [_evaluate_config_args(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_evaluate_config_args, tasks))
+
+    def cost(result):
+        return (result["eer"], result["engine"] == "isolation_forest", result["n_estimators"], -result["contamination"])
+
+    results.sort(key=cost)
+    return results[0], results
+
+
+def main():
+    """Calibrate every stored user's model"""
+    from keystroke_storage import KeystrokeStorage, KeystrokeStorageCache, stored_user_ids
+
+    print("🎚️ DETECTOR CALIBRATION")
+    print("=" * 40)
+    for user_id in stored_user_ids():
+        KeystrokeStorageCache.validate_user_id(user_id)
+        KeystrokeStorage(user_id).calibrate_model()
+
+
+if __name__ == "__main__":
+    main()
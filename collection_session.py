@@ -0,0 +1,102 @@
+"""
+Keystroke Collection Sessions
+Future-backed handle on one running collection that threads can join and asyncio code can await
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+# Why a session finished
+DURATION = "duration"
+ESCAPE = "escape"
+CANCELLED = "cancelled"
+STOPPED = "stopped"
+
+# How often a session with a cancel_event checks for its own stop while waiting on that event
+CANCEL_CHECK_SECONDS = 0.05
+
+
+class CollectionSession:
+    """One keystroke collection that completes on its duration, ESC or a cancel
+
+    A single helper thread blocks on the session's own stop event with the
+    duration as timeout, so it wakes exactly once: when the duration runs
+    out or the event is set. It then stops the collector and resolves the
+    future with {'reason', 'seconds'}. Pass `cancel_event` to let an
+    existing threading.Event (a GUI stop flag, an authenticator's decision)
+    end the session; the helper then waits on that event instead, checking
+    its own stop event every CANCEL_CHECK_SECONDS. The session only reads
+    cancel_event and never sets it, so ending a session does not look like
+    the owner's decision. cancel() ends the session from any thread,
+    including an asyncio loop callback.
+    """
+
+    def __init__(self, stop_collection, duration=None, cancel_event=None, name="collection-session"):
+        self.stop_collection = stop_collection
+        self.duration = duration
+        self.cancel_event = cancel_event
+        self.stop_event = threading.Event()
+        self.future = Future()
+        self.reason = None
+        self.started = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        """Start timing the session; returns self"""
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        if not self._wait():
+            self.finish(DURATION)
+        # A cancel_event set from outside carries no reason of its own
+        self.finish(CANCELLED)
+        try:
+            self.stop_collection(self.reason)
+        finally:
+            self.future.set_result({"reason": self.reason, "seconds": time.time() - self.started})
+
+    def _wait(self):
+        """Block until the stop event or cancel_event is set (True) or the duration runs out (False)"""
+        if self.cancel_event is None:
+            return self.stop_event.wait(self.duration)
+        deadline = None if self.duration is None else time.monotonic() + self.duration
+        while not self.stop_event.is_set():
+            timeout = CANCEL_CHECK_SECONDS
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                timeout = min(timeout, remaining)
+            if self.cancel_event.wait(timeout):
+                return True
+        return True
+
+    def finish(self, reason):
+        """End the session; the first reason given wins"""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+        self.stop_event.set()
+
+    def cancel(self):
+        """End the session early from any thread"""
+        self.finish(CANCELLED)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """Block until the session finishes and return {'reason', 'seconds'}"""
+        return self.future.result(timeout)
+
+    def add_done_callback(self, callback):
+        """Call callback(session) once the session finishes, on the finishing thread"""
+        self.future.add_done_callback(lambda future: callback(self))
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
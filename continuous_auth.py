@@ -0,0 +1,127 @@
+"""
+Continuous Typing Authentication
+Rescores a sliding window of live keystrokes while the system is unlocked
+"""
+
+import threading
+import time
+from collections import deque
+from keystroke_events import KEY_DOWN
+from typing_statistics import SlidingWindowStats
+
+
+class ContinuousAuthenticator:
+    """Keeps a rolling window of the last N keystrokes and locks on sustained mismatch
+
+    Window statistics are updated per event in O(1); the model is only
+    consulted every `rescore_every` key presses. Scores are smoothed with an
+    exponential moving average and the lock callback fires once the
+    smoothed score has stayed below `threshold` for `lock_after`
+    consecutive rescores.
+    """
+
+    def __init__(self, model, window_size=60, rescore_every=10, threshold=0.0,
+                 smoothing=0.3, lock_after=3, on_lock=None):
+        self.model = model
+        self.window_size = window_size
+        self.rescore_every = rescore_every
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.lock_after = lock_after
+        self.on_lock = on_lock
+
+        self.dwell = SlidingWindowStats(window_size)
+        self.flight = SlidingWindowStats(window_size)
+        self.locked = threading.Event()
+        self.reset()
+
+    def reset(self):
+        """Clear the window and score history"""
+        self.dwell.clear()
+        self.flight.clear()
+        self.press_times = deque(maxlen=self.window_size)
+        self.key_press_times = {}
+        self.last_release_time = None
+        self.presses_since_score = 0
+        self.smoothed_score = None
+        self.last_score = None
+        self.below_count = 0
+        self.rescore_count = 0
+        self.scoring_time = 0.0
+        self.locked.clear()
+
+    def on_event(self, timestamp, key_char, event_type):
+        """Feed one resolved key event from the live collector"""
+        if self.locked.is_set():
+            return
+
+        if event_type == KEY_DOWN:
+            self.key_press_times[key_char] = timestamp
+            if self.last_release_time is not None:
+                self.flight.add(timestamp - self.last_release_time)
+            self.press_times.append(timestamp)
+            self.presses_since_score += 1
+            if self.presses_since_score >= self.rescore_every and len(self.dwell) >= self.rescore_every:
+                self.presses_since_score = 0
+                self.rescore()
+        else:
+            press_time = self.key_press_times.pop(key_char, None)
+            if press_time is not None:
+                self.dwell.add(timestamp - press_time)
+            self.last_release_time = timestamp
+
+    def window_features(self):
+        """Build the TypingPatternModel feature dict for the current window"""
+        if not len(self.dwell) or not len(self.flight):
+            return None
+        span = self.press_times[-1] - self.press_times[0] if len(self.press_times) > 1 else 0
+        return {
+            'avg_dwell_time': self.dwell.mean,
+            'std_dwell_time': self.dwell.std,
+            'avg_flight_time': self.flight.mean,
+            'std_flight_time': self.flight.std,
+            'typing_speed': len(self.press_times) / span if span > 0 else 0,
+            'rhythm_consistency': 1 / (1 + self.flight.std),
+            'pressure_pattern': self.dwell.mean / self.flight.mean if self.flight.mean else 0
+        }
+
+    def rescore(self):
+        """Score the current window and update the smoothed score"""
+        features = self.window_features()
+        if features is None:
+            return None
+
+        started = time.perf_counter()
+        score = float(self.model.score(features))
+        self.scoring_time += time.perf_counter() - started
+        self.rescore_count += 1
+        self.last_score = score
+
+        if self.smoothed_score is None:
+            self.smoothed_score = score
+        else:
+            self.smoothed_score = self.smoothing * score + (1 - self.smoothing) * self.smoothed_score
+
+        if self.smoothed_score < self.threshold:
+            self.below_count += 1
+        else:
+            self.below_count = 0
+
+        if self.below_count >= self.lock_after:
+            self.locked.set()
+            if self.on_lock:
+                self.on_lock(self.get_status())
+        return score
+
+    def get_status(self):
+        """Get the current window and scoring state"""
+        return {
+            'window_keystrokes': len(self.press_times),
+            'last_score': self.last_score,
+            'smoothed_score': self.smoothed_score,
+            'threshold': self.threshold,
+            'below_threshold_count': self.below_count,
+            'rescore_count': self.rescore_count,
+            'avg_scoring_ms': self.scoring_time / self.rescore_count * 1000 if self.rescore_count else 0.0,
+            'locked': self.locked.is_set()
+        }
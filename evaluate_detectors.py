@@ -0,0 +1,273 @@
+"""
+Offline Detector Evaluation
+Trains a TypingPatternModel per subject of a keystroke dataset and reports FAR, FRR, EER and latency per engine
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from keystroke_events import KeystrokeEventBuffer
+from scoring_engines import ENGINES, equal_error_rate
+from session_database import DATABASE_NAME, SQLiteSessionStore, SessionDatabase, open_database
+from session_log import SESSION_LOG_NAME, has_sessions, load_user_sessions
+from typing_model import DEFAULT_FEATURE_NAMES, TypingPatternModel
+
+# Timing columns of the CMU keystroke dynamics (DSL-StrongPasswordData) layout
+DSL_TIMING_PREFIXES = ("H.", "DD.", "UD.")
+
+
+def iter_dsl_csv(path):
+    """Yield (subject, session, timing vector) per row of a CMU-DSL-style CSV, plus the timing column names
+
+    The first item yielded is the list of timing column names; rows follow
+    one at a time so the file is never held in memory as text.
+    """
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [i for i, name in enumerate(header) if name.startswith(DSL_TIMING_PREFIXES)]
+        subject_col = header.index("subject")
+        session_col = header.index("sessionIndex") if "sessionIndex" in header else None
+        yield [header[i] for i in columns]
+        for row in reader:
+            if not row:
+                continue
+            session = row[session_col] if session_col is not None else ""
+            yield row[subject_col], session, [float(row[i]) for i in columns]
+
+
+def session_model_features(session):
+    """TypingPatternModel feature dict for one stored keystroke session
+
+    Stored sessions keep dwell/flight statistics but not the model's derived
+    columns, and their typing_speed is WPM. Typing speed (presses per second),
+    rhythm consistency and pressure pattern are recomputed from the
+    keystrokes the way the live collectors compute them.
+    """
+    features = session.get("features", {})
+    avg_flight = features.get("avg_flight_time", 0) or 0
+    std_flight = features.get("std_flight_time", 0) or 0
+    avg_dwell = features.get("avg_dwell_time", 0) or 0
+    press_times = KeystrokeEventBuffer.from_keystrokes(session.get("keystrokes", [])).press_times()
+    span = press_times[-1] - press_times[0] if len(press_times) > 1 else 0
+    return {
+        'avg_dwell_time': avg_dwell,
+        'std_dwell_time': features.get("std_dwell_time", 0) or 0,
+        'avg_flight_time': avg_flight,
+        'std_flight_time': std_flight,
+        'typing_speed': len(press_times) / span if span > 0 else 0,
+        'rhythm_consistency': 1 / (1 + std_flight) if avg_flight else 0,
+        'pressure_pattern': avg_dwell / avg_flight if avg_flight else 0
+    }
+
+
+def read_keystroke_sessions(sessions):
+    """Feature rows for stored keystroke sessions, in DEFAULT_FEATURE_NAMES order"""
+    rows = []
+    for session in sessions:
+        features = session_model_features(session)
+        rows.append([float(features[name]) for name in DEFAULT_FEATURE_NAMES])
+    return rows
+
+
+def load_dataset(path):
+    """Load (feature_names, {subject: n_samples x n_features array}) from a dataset path
+
+    Accepts a CMU-DSL-style CSV, a keystroke_data directory (one
+    <subject>/sessions.jsonl or legacy keystrokes.json per user, plus any
+    users in its keystrokes.db), a session database file, a single
+    sessions.jsonl or keystrokes.json (the subject is its directory name)
+    or a KeystrokeStorage.export_data() backup. Samples keep their file order.
+    """
+    subjects = OrderedDict()
+    if os.path.isdir(path):
+        # A user in the database was imported from, and superseded, their session files
+        database = open_database(path) if os.path.isfile(os.path.join(path, DATABASE_NAME)) else None
+        database_users = set(database.user_ids()) if database else set()
+        for user_id in sorted(database_users.union(os.listdir(path))):
+            user_dir = os.path.join(path, user_id)
+            if user_id in database_users:
+                subjects[user_id] = read_keystroke_sessions(SQLiteSessionStore(database, user_id))
+            elif has_sessions(user_dir):
+                subjects[user_id] = read_keystroke_sessions(load_user_sessions(user_dir))
+        feature_names = list(DEFAULT_FEATURE_NAMES)
+    elif path.lower().endswith(".db"):
+        database = SessionDatabase(path)
+        for user_id in database.user_ids():
+            subjects[user_id] = read_keystroke_sessions(SQLiteSessionStore(database, user_id))
+        feature_names = list(DEFAULT_FEATURE_NAMES)
+    elif path.lower().endswith(".csv"):
+        rows = iter_dsl_csv(path)
+        feature_names = next(rows)
+        for subject, session, vector in rows:
+            subjects.setdefault(subject, []).append(vector)
+    elif os.path.basename(path) == SESSION_LOG_NAME:
+        subject = os.path.basename(os.path.dirname(os.path.abspath(path))) or "user"
+        subjects[subject] = read_keystroke_sessions(load_user_sessions(os.path.dirname(os.path.abspath(path))))
+        feature_names = list(DEFAULT_FEATURE_NAMES)
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            subjects[data.get("user_id", "user")] = read_keystroke_sessions(data.get("sessions", []))
+        else:
+            subject = os.path.basename(os.path.dirname(os.path.abspath(path))) or "user"
+            subjects[subject] = read_keystroke_sessions(data)
+        feature_names = list(DEFAULT_FEATURE_NAMES)
+    return feature_names, OrderedDict((subject, np.array(rows, dtype=np.float64)) for subject, rows in subjects.items())
+
+
+def split_subjects(subjects, train_samples=None, impostor_samples=5):
+    """Killourhy & Maxion protocol: train on each subject's first samples, test on the rest
+
+    Impostor samples are the first `impostor_samples` of every other
+    subject. train_samples=None trains on the first half (at least 3).
+    Yields (subject, X_train, X_genuine, X_impostor).
+    """
+    for subject, X in subjects.items():
+        split = train_samples or max(3, len(X) // 2)
+        if len(X) <= split:
+            continue
+        impostors = [other[:impostor_samples] for name, other in subjects.items() if name != subject]
+        if not impostors:
+            continue
+        yield subject, X[:split], X[split:], np.concatenate(impostors)
+
+
+def evaluate_subject(engine, feature_names, X_train, X_genuine, X_impostor, contamination=0.1):
+    """Train one subject's model and score its genuine and impostor samples
+
+    The model is saved and reloaded so scoring runs on the exported
+    scorer, as authentication does. Returns FAR/FRR at the model's
+    threshold, EER, training time and per-sample scoring times.
+    """
+    with tempfile.TemporaryDirectory(prefix="detector_eval_") as model_dir:
+        model = TypingPatternModel(
+            os.path.join(model_dir, "typing_model.pkl"),
+            os.path.join(model_dir, "scaler.pkl"),
+            engine=engine,
+            feature_names=feature_names
+        )
+        started = time.perf_counter()
+        model.fit(X_train, contamination)
+        train_seconds = time.perf_counter() - started
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.save_model()
+            model.load_model()
+
+        genuine = model.score_batch(X_genuine)
+        impostor = model.score_batch(X_impostor)
+
+        latencies = []
+        for row in np.concatenate([X_genuine, X_impostor]):
+            started = time.perf_counter()
+            model.score_batch(row)
+            latencies.append(time.perf_counter() - started)
+
+    eer, eer_threshold = equal_error_rate(genuine, impostor)
+    return {
+        "far": float(np.mean(impostor >= model.threshold)),
+        "frr": float(np.mean(genuine < model.threshold)),
+        "eer": eer,
+        "eer_threshold": eer_threshold,
+        "train_seconds": train_seconds,
+        "latencies": latencies
+    }
+
+
+def _evaluate_subject_args(args):
+    return args[0], args[1], evaluate_subject(*args[1:])
+
+
+def evaluate_dataset(feature_names, subjects, engines=ENGINES, train_samples=None, impostor_samples=5,
+                     contamination=0.1, workers=None):
+    """Evaluate every engine on every subject, subjects in parallel; returns {engine: report}"""
+    tasks = [
+        (subject, engine, feature_names, X_train, X_genuine, X_impostor, contamination)
+        for engine in engines
+        for subject, X_train, X_genuine, X_impostor in split_subjects(subjects, train_samples, impostor_samples)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        results = [_evaluate_subject_args(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluate_subject_args, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    report = {}
+    for engine in engines:
+        per_subject = {subject: result for subject, name, result in results if name == engine}
+        if not per_subject:
+            continue
+        latencies = np.concatenate([result["latencies"] for result in per_subject.values()]) * 1e6
+        eers = np.array([result["eer"] for result in per_subject.values()])
+        report[engine] = {
+            "subjects": len(per_subject),
+            "far": float(np.mean([result["far"] for result in per_subject.values()])),
+            "frr": float(np.mean([result["frr"] for result in per_subject.values()])),
+            "eer": float(np.nanmean(eers)),
+            "eer_std": float(np.nanstd(eers)),
+            "train_ms": float(np.mean([result["train_seconds"] for result in per_subject.values()])) * 1000,
+            "score_us": {
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "p99": float(np.percentile(latencies, 99))
+            },
+            "per_subject_eer": {subject: result["eer"] for subject, result in per_subject.items()}
+        }
+    return report
+
+
+def main():
+    """Evaluate the scoring engines on a keystroke dataset"""
+    parser = argparse.ArgumentParser(description="Offline FAR/FRR/EER evaluation of the typing scoring engines")
+    parser.add_argument("dataset", nargs="?", default="keystroke_data",
+                        help="CMU-DSL-style CSV, keystroke_data directory, keystrokes.db, sessions.jsonl, keystrokes.json or export backup")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated engines to evaluate")
+    parser.add_argument("--train-samples", type=int, default=None, help="Training samples per subject (default: half)")
+    parser.add_argument("--impostor-samples", type=int, default=5, help="Samples taken from each other subject")
+    parser.add_argument("--contamination", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    print("🧪 OFFLINE DETECTOR EVALUATION")
+    print("=" * 40)
+
+    started = time.perf_counter()
+    feature_names, subjects = load_dataset(args.dataset)
+    print(f"👥 Subjects: {len(subjects)}  📊 Samples: {sum(len(X) for X in subjects.values())}  "
+          f"🔢 Features: {len(feature_names)}  ({time.perf_counter() - started:.1f}s to load)")
+    if len(subjects) < 2:
+        print("❌ Need at least two subjects to measure impostor scores")
+        return
+
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+    report = evaluate_dataset(feature_names, subjects, engines, args.train_samples, args.impostor_samples,
+                              args.contamination, args.workers)
+
+    print()
+    print(f"{'engine':<18}{'FAR':>7}{'FRR':>7}{'EER':>7}{'train (ms)':>12}{'p50 (µs)':>10}{'p95 (µs)':>10}{'p99 (µs)':>10}")
+    for engine, result in report.items():
+        latency = result["score_us"]
+        print(f"{engine:<18}{result['far']:>7.3f}{result['frr']:>7.3f}{result['eer']:>7.3f}{result['train_ms']:>12.1f}"
+              f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
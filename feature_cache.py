@@ -0,0 +1,96 @@
+"""
+Feature Matrix Cache
+Keeps KeystrokeStorage training rows on disk, keyed by per-session content hashes
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+from atomic_files import atomic_tmp_path
+
+
+class FeatureMatrixCache:
+    """Training feature matrix stored as .npy next to the session log
+
+    The sidecar index records the feature schema, one content hash per row
+    and the size/mtime of the sessions file the matrix was built from. If
+    the sessions file is unchanged the matrix is used as-is; otherwise rows
+    are reused for every session whose hash is still present.
+    """
+
+    def __init__(self, user_dir):
+        self.matrix_file = os.path.join(user_dir, "feature_matrix.npy")
+        self.index_file = os.path.join(user_dir, "feature_matrix.json")
+        self.load()
+
+    def load(self):
+        """Load the cached matrix and index, or start empty"""
+        self.matrix = None
+        self.index = {"schema": None, "source": None, "hashes": []}
+        try:
+            if os.path.exists(self.matrix_file) and os.path.exists(self.index_file):
+                with open(self.index_file, 'r') as f:
+                    index = json.load(f)
+                matrix = np.load(self.matrix_file)
+                if len(matrix) == len(index.get("hashes", [])):
+                    self.matrix = matrix
+                    self.index = index
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable feature cache: {e}")
+
+    @staticmethod
+    def session_hash(session):
+        """Content hash of one stored session"""
+        return hashlib.sha1(json.dumps(session, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def source_stamp(path):
+        """Size and modification time of the sessions file, or the stamp() of a session store"""
+        if hasattr(path, "stamp"):
+            return path.stamp()
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_fresh(self, source_path, schema):
+        """True if the matrix was built from the current sessions file with this schema"""
+        return (self.matrix is not None
+                and self.index["schema"] == schema
+                and self.index["source"] == self.source_stamp(source_path))
+
+    def cached_rows(self, schema):
+        """Map of session hash to cached row, for rows built with this schema"""
+        if self.matrix is None or self.index["schema"] != schema:
+            return {}
+        return dict(zip(self.index["hashes"], self.matrix))
+
+    def store(self, matrix, hashes, schema, source_path):
+        """Replace the cached matrix"""
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.index = {"schema": schema, "source": self.source_stamp(source_path), "hashes": list(hashes)}
+        self._write()
+
+    def append(self, row, session_hash, schema, source_path):
+        """Add one session's row to a matrix that is otherwise up to date"""
+        row = np.asarray(row, dtype=np.float64).reshape(1, -1)
+        if self.matrix is None or self.index["schema"] != schema or self.matrix.shape[1] != row.shape[1]:
+            return False
+        self.matrix = np.vstack([self.matrix, row])
+        self.index["hashes"].append(session_hash)
+        self.index["source"] = self.source_stamp(source_path)
+        self._write()
+        return True
+
+    def _write(self):
+        # Write both files via temporary names so a crash never leaves a half-written cache
+        # (named per process and thread: a training job and the web server may write at once)
+        matrix_tmp = atomic_tmp_path(self.matrix_file)
+        index_tmp = atomic_tmp_path(self.index_file)
+        with open(matrix_tmp, 'wb') as f:
+            np.save(f, self.matrix)
+        with open(index_tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(matrix_tmp, self.matrix_file)
+        os.replace(index_tmp, self.index_file)
@@ -0,0 +1,161 @@
+"""
+NumPy Isolation Forest Scorer
+Exports a trained IsolationForest + StandardScaler to flat arrays and scores them without sklearn
+"""
+
+import numpy as np
+from model_artifact import load_artifact, write_artifact
+
+
+def average_path_length(n_samples):
+    """Expected path length of an unsuccessful BST search, as in sklearn's IsolationForest"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros(n_samples.shape)
+    lengths[n_samples == 2] = 1.0
+    many = n_samples > 2
+    lengths[many] = 2.0 * (np.log(n_samples[many] - 1.0) + np.euler_gamma) - 2.0 * (n_samples[many] - 1.0) / n_samples[many]
+    return lengths
+
+
+def export_forest(model, scaler, path, threshold=0.0, schema=None, metadata=None):
+    """Flatten a fitted IsolationForest and StandardScaler into one model artifact
+
+    All trees are concatenated into shared node arrays. Leaves point to
+    themselves so traversal can run a fixed number of steps, and every node
+    carries the path length a sample ending there contributes, so scoring
+    needs no tree objects at all. `threshold` is the decision score at or
+    above which a sample is accepted (0.0 unless the model was calibrated).
+    """
+    features, thresholds, lefts, rights, path_lengths, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+
+        # Depth counted in nodes on the path (root = 1), like decision_path().sum()
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        depth[0] = 1
+        for node in range(n_nodes):
+            if left[node] != -1:
+                depth[left[node]] = depth[node] + 1
+                depth[right[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        is_leaf = left == -1
+        nodes = np.arange(n_nodes)
+        left = np.where(is_leaf, nodes, left) + offset
+        right = np.where(is_leaf, nodes, right) + offset
+        feature = np.where(is_leaf, 0, np.asarray(estimator_features)[np.maximum(tree.feature, 0)])
+
+        features.append(feature.astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(left)
+        rights.append(right)
+        path_lengths.append(depth + average_path_length(tree.n_node_samples) - 1.0)
+        roots.append(offset)
+        offset += n_nodes
+
+    mean = scaler.mean_ if getattr(scaler, "mean_", None) is not None else np.zeros(model.n_features_in_)
+    scale = scaler.scale_ if getattr(scaler, "scale_", None) is not None else np.ones(model.n_features_in_)
+
+    arrays = {
+        "feature": np.concatenate(features),
+        "node_threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "path_length": np.concatenate(path_lengths),
+        "roots": np.array(roots, dtype=np.int64),
+        "scaler_mean": np.asarray(mean, dtype=np.float64),
+        "scaler_scale": np.asarray(scale, dtype=np.float64)
+    }
+    header = {
+        "engine": "isolation_forest",
+        "schema": schema,
+        "n_features": int(model.n_features_in_),
+        "threshold": float(threshold),
+        "params": {"max_depth": max_depth, "max_samples": int(model.max_samples_), "offset": float(model.offset_)},
+        "metadata": metadata or {}
+    }
+    write_artifact(path, arrays, header)
+    return NumpyForestScorer.load(path)
+
+
+class NumpyStandardScaler:
+    """StandardScaler.transform from stored mean and scale"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        """Standardize features"""
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class NumpyForestScorer:
+    """IsolationForest decision_function/predict over exported node arrays
+
+    Every (sample, tree) pair walks its tree in lockstep for max_depth
+    steps. Inputs are rounded to float32 before comparison, as sklearn's
+    trees do, and per-tree path lengths are summed in tree order, so scores
+    match sklearn to floating point precision.
+    """
+
+    def __init__(self, header, arrays):
+        params = header["params"]
+        self.feature = arrays["feature"]
+        self.node_threshold = arrays["node_threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.path_length = arrays["path_length"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(params["max_depth"])
+        self.offset_ = float(params["offset"])
+        self.threshold = float(header.get("threshold", 0.0))
+        self.schema = header.get("schema")
+        self.metadata = header.get("metadata", {})
+        self.denominator = len(self.roots) * float(average_path_length([int(params["max_samples"])])[0])
+        self.scaler = NumpyStandardScaler(arrays["scaler_mean"], arrays["scaler_scale"])
+
+    @classmethod
+    def load(cls, path, schema=None):
+        """Load an exported forest; raises SchemaMismatchError before mapping anything if the schema differs"""
+        header, arrays = load_artifact(path, schema)
+        if header.get("engine") != "isolation_forest":
+            raise ValueError(f"{path} holds a {header.get('engine')} model, not an isolation forest")
+        return cls(header, arrays)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf node index for every sample in every tree, shape (n_samples, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.node_threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def score_samples(self, X):
+        """Opposite of the anomaly score, as IsolationForest.score_samples"""
+        lengths = self.path_length[self.apply(X)]
+        depths = np.zeros(len(lengths))
+        for tree in range(lengths.shape[1]):
+            depths += lengths[:, tree]
+        # A forest fit on a single sample has denominator 0; sklearn uses a ratio of 1 there
+        ratio = depths / self.denominator if self.denominator else np.ones_like(depths)
+        return -(2 ** (-ratio))
+
+    def decision_function(self, X):
+        """Decision score; negative means anomalous"""
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        """1 for inliers, -1 for outliers"""
+        return np.where(self.decision_function(X) < 0, -1, 1)
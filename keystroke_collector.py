@@ -1,10 +1,13 @@
 import time
 import threading
 from pynput import keyboard
-import numpy as np
 from collections import defaultdict
 import json
 import os
+from keystroke_events import KeystrokeEventBuffer, KEY_DOWN, KEY_UP
+from keystroke_pipeline import KeystrokeRingBuffer, KeystrokeConsumer, key_name
+from typing_statistics import RunningStats
+from collection_session import CollectionSession, ESCAPE, STOPPED
 
 class KeystrokeCollector:
     def __init__(self):
@@ -13,65 +16,85 @@ class KeystrokeCollector:
         self.start_time = None
         self.last_key_time = None
         self.is_collecting = False
+        self.events = KeystrokeEventBuffer()
+        self.ring = KeystrokeRingBuffer()
+        self.consumer = KeystrokeConsumer(self.ring, self.process_event)
         self.key_press_times = {}
-        self.dwell_times = []  # Time key is held down
-        self.flight_times = []  # Time between key releases and next key press
+        self.dwell_stats = RunningStats()
+        self.flight_stats = RunningStats()
+        self.event_listeners = []  # Called with (timestamp, key_char, event_type) on the consumer thread
+        self.session = None
+        self._stop_lock = threading.Lock()
+        
+    @property
+    def dwell_times(self):
+        """Time each key is held down"""
+        self.consumer.flush()
+        return self.events.hold_times()
+        
+    @property
+    def flight_times(self):
+        """Time between key releases and the next key press"""
+        self.consumer.flush()
+        return self.events.release_to_press_times()
         
     def on_key_press(self, key):
         if not self.is_collecting:
             return
             
-        current_time = time.time()
-        
-        try:
-            key_char = key.char if hasattr(key, 'char') and key.char else str(key)
-        except AttributeError:
-            key_char = str(key)
-            
-        # Record key press time
-        self.key_press_times[key_char] = current_time
-        
-        # Calculate flight time (time between previous key release and current key press)
-        if self.last_key_time is not None:
-            flight_time = current_time - self.last_key_time
-            self.flight_times.append(flight_time)
-            
-        if self.start_time is None:
-            self.start_time = current_time
+        # Only hand the raw event off; the consumer thread does the rest
+        self.ring.put(time.time(), key, KEY_DOWN)
             
     def on_key_release(self, key):
         if not self.is_collecting:
             return
             
-        current_time = time.time()
-        
-        try:
-            key_char = key.char if hasattr(key, 'char') and key.char else str(key)
-        except AttributeError:
-            key_char = str(key)
-            
-        # Calculate dwell time (how long key was held)
-        if key_char in self.key_press_times:
-            dwell_time = current_time - self.key_press_times[key_char]
-            self.dwell_times.append(dwell_time)
-            del self.key_press_times[key_char]
-            
-        self.last_key_time = current_time
+        self.ring.put(time.time(), key, KEY_UP)
         
         # Stop collection on ESC key
         if key == keyboard.Key.esc:
-            self.stop_collection()
+            self.stop_collection(ESCAPE)
             return False
             
-    def start_collection(self, duration=None):
-        """Start collecting keystroke data"""
-        self.is_collecting = True
+    def process_event(self, timestamp, key, event_type):
+        """Resolve and record one raw key event (runs on the consumer thread)"""
+        key_char = key_name(key)
+        self.events.append(timestamp, key_char, event_type)
+        
+        if event_type == KEY_DOWN:
+            self.key_press_times[key_char] = timestamp
+            
+            # Flight time (time between previous key release and current key press)
+            if self.last_key_time is not None:
+                self.flight_stats.add(timestamp - self.last_key_time)
+                
+            if self.start_time is None:
+                self.start_time = timestamp
+        else:
+            # Dwell time (how long key was held)
+            press_time = self.key_press_times.pop(key_char, None)
+            if press_time is not None:
+                self.dwell_stats.add(timestamp - press_time)
+                
+            self.last_key_time = timestamp
+            
+        for listener in self.event_listeners:
+            listener(timestamp, key_char, event_type)
+            
+    def start_collection(self, duration=None, cancel_event=None):
+        """Start collecting keystroke data; returns the CollectionSession to join or await"""
+        self.stop_collection()
         self.keystroke_data = []
         self.current_session = []
-        self.dwell_times = []
-        self.flight_times = []
+        self.events.clear()
+        self.key_press_times = {}
+        self.dwell_stats.reset()
+        self.flight_stats.reset()
         self.start_time = None
         self.last_key_time = None
+        self.ring = KeystrokeRingBuffer()
+        self.consumer = KeystrokeConsumer(self.ring, self.process_event)
+        self.consumer.start()
         
         print("Starting keystroke collection... Press ESC to stop or wait for duration to complete.")
         
@@ -82,30 +105,58 @@ class KeystrokeCollector:
         )
         self.listener.start()
         
-        # If duration is specified, stop after that time
-        if duration:
-            threading.Timer(duration, self.stop_collection).start()
+        # Ends after the duration (if any), on ESC, on cancel_event or on stop_collection()
+        session = CollectionSession(lambda reason: self.end_session(session, reason), duration, cancel_event)
+        # Together, so a late end callback of the previous session can never see the new one as its own
+        with self._stop_lock:
+            self.session = session
+            self.is_collecting = True
+        return session.start()
+        
+    def end_session(self, session, reason):
+        """Stop collecting when `session` finishes; ignored once a newer collection has replaced it"""
+        with self._stop_lock:
+            if session is not self.session or not self.is_collecting:
+                return
+            self.is_collecting = False
+        self._shutdown(session, reason)
             
-    def stop_collection(self):
+    def stop_collection(self, reason=STOPPED):
         """Stop collecting keystroke data"""
-        self.is_collecting = False
+        with self._stop_lock:
+            if not self.is_collecting:
+                return
+            self.is_collecting = False
+            session = self.session
+        self._shutdown(session, reason)
+        
+    def _shutdown(self, session, reason):
+        # Caller has just cleared is_collecting for `session`
         if hasattr(self, 'listener'):
             self.listener.stop()
+        self.consumer.stop()
+        if self.ring.dropped:
+            print(f"⚠️ {self.ring.dropped} keystrokes dropped - processing fell behind")
         print("Keystroke collection stopped.")
+        if session is not None:
+            session.finish(reason)
         
     def get_typing_features(self):
         """Extract typing pattern features"""
-        if not self.dwell_times or not self.flight_times:
+        self.consumer.flush()
+        dwell = self.dwell_stats
+        flight = self.flight_stats
+        if not dwell.count or not flight.count:
             return None
             
         features = {
-            'avg_dwell_time': np.mean(self.dwell_times),
-            'std_dwell_time': np.std(self.dwell_times),
-            'avg_flight_time': np.mean(self.flight_times),
-            'std_flight_time': np.std(self.flight_times),
-            'typing_speed': len(self.dwell_times) / (time.time() - self.start_time) if self.start_time else 0,
-            'rhythm_consistency': 1 / (1 + np.std(self.flight_times)) if self.flight_times else 0,
-            'pressure_pattern': np.mean(self.dwell_times) / np.mean(self.flight_times) if self.flight_times else 0
+            'avg_dwell_time': dwell.mean,
+            'std_dwell_time': dwell.std,
+            'avg_flight_time': flight.mean,
+            'std_flight_time': flight.std,
+            'typing_speed': dwell.count / (time.time() - self.start_time) if self.start_time else 0,
+            'rhythm_consistency': 1 / (1 + flight.std),
+            'pressure_pattern': dwell.mean / flight.mean
         }
         
         return features
@@ -130,8 +181,8 @@ class KeystrokeCollector:
         session_data = {
             'timestamp': time.time(),
             'features': features,
-            'raw_dwell_times': self.dwell_times,
-            'raw_flight_times': self.flight_times
+            'raw_dwell_times': self.dwell_times.tolist(),
+            'raw_flight_times': self.flight_times.tolist()
         }
         
         training_data.append(session_data)
@@ -149,10 +200,8 @@ class KeystrokeCollector:
         print("You can type anything - sentences, passwords, or random text.")
         print("Focus on typing at your normal speed and rhythm.")
         
-        self.start_collection(duration=session_duration)
-        
-        # Wait for collection to complete
-        time.sleep(session_duration + 1)
+        # Wait for the duration or ESC, without polling
+        self.start_collection(duration=session_duration).result()
         
         return self.save_training_data()
 
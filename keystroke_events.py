@@ -0,0 +1,231 @@
+"""
+Keystroke Event Pairing Engine
+Single-pass extraction of dwell, flight and interval timings from raw key events
+"""
+
+import numpy as np
+
+
+def pair_keystrokes(keystrokes):
+    """Pair key down/up events in one pass and return timing arrays
+
+    Keeps an open-press table per key, so every "down" is matched with the
+    first later "up" of the same key without scanning ahead. All timings are
+    returned as float64 NumPy arrays in the order of the events that started
+    them.
+    """
+    n = len(keystrokes)
+    timestamps = np.empty(n, dtype=np.float64)
+    is_down = np.zeros(n, dtype=bool)
+    is_up = np.zeros(n, dtype=bool)
+    dwell = np.zeros(n, dtype=np.float64)
+    paired = np.zeros(n, dtype=bool)
+    labels = []
+    open_presses = {}
+
+    for i, event in enumerate(keystrokes):
+        key = event.get('key')
+        event_type = event.get('type')
+        timestamp = event.get('timestamp', np.nan)
+        timestamps[i] = timestamp
+        labels.append(event.get('key', ''))
+
+        if event_type == 'down':
+            is_down[i] = True
+            open_presses.setdefault(key, []).append(i)
+        elif event_type == 'up':
+            is_up[i] = True
+            # Every pending press of this key ends at its first release
+            for j in open_presses.pop(key, ()):
+                dwell[j] = timestamp - timestamps[j]
+                paired[j] = True
+
+    # Flight time (key up to the very next event being a key down)
+    flight_mask = is_up[:-1] & is_down[1:]
+    flight_times = timestamps[1:][flight_mask] - timestamps[:-1][flight_mask]
+
+    # Adjacent down-down pairs, grouped per key pair
+    pair_mask = is_down[:-1] & is_down[1:]
+    pair_gaps = timestamps[1:][pair_mask] - timestamps[:-1][pair_mask]
+    grouped = {}
+    for idx, gap in zip(np.flatnonzero(pair_mask), pair_gaps):
+        grouped.setdefault(f"{labels[idx]}-{labels[idx + 1]}", []).append(gap)
+    key_intervals = {pair: np.array(gaps, dtype=np.float64) for pair, gaps in grouped.items()}
+
+    return {
+        "dwell_times": dwell[paired],
+        "flight_times": flight_times,
+        "press_press_times": np.diff(timestamps[is_down]),
+        "release_release_times": np.diff(timestamps[is_up]),
+        "key_intervals": key_intervals
+    }
+
+
+# Event type codes stored in the 1-byte event column
+KEY_DOWN = 0
+KEY_UP = 1
+
+EVENT_TYPE_NAMES = {KEY_DOWN: 'down', KEY_UP: 'up'}
+EVENT_TYPE_CODES = {'down': KEY_DOWN, 'up': KEY_UP, 'press': KEY_DOWN, 'release': KEY_UP}
+
+
+class KeyCodeTable:
+    """Interns key names as small integer codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def code(self, key):
+        """Return the code for a key name, assigning a new one if unseen"""
+        code = self.codes.get(key)
+        if code is None:
+            code = len(self.names)
+            self.codes[key] = code
+            self.names.append(key)
+        return code
+
+    def name(self, code):
+        """Return the key name for a code"""
+        return self.names[code]
+
+
+# Shared by every buffer so key codes mean the same thing across collectors
+KEY_CODES = KeyCodeTable()
+
+
+class KeystrokeEventBuffer:
+    """Columnar keystroke event store backed by typed NumPy arrays
+
+    Each event takes 11 bytes: a float64 timestamp, a uint16 key code and a
+    uint8 event type. Columns grow geometrically and are exposed as
+    zero-copy views; a view taken before a later append may refer to the
+    old storage once the buffer grows, so take views after capture ends.
+    """
+
+    def __init__(self, capacity=1024, key_table=None):
+        self.key_table = key_table or KEY_CODES
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._key_codes = np.empty(capacity, dtype=np.uint16)
+        self._event_types = np.empty(capacity, dtype=np.uint8)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._timestamps)
+
+    @property
+    def nbytes(self):
+        """Bytes allocated for the event columns"""
+        return self._timestamps.nbytes + self._key_codes.nbytes + self._event_types.nbytes
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self._size]
+
+    @property
+    def key_codes(self):
+        return self._key_codes[:self._size]
+
+    @property
+    def event_types(self):
+        return self._event_types[:self._size]
+
+    def _reserve(self, needed):
+        """Grow the columns geometrically to hold at least `needed` events"""
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, 16)
+        for name in ('_timestamps', '_key_codes', '_event_types'):
+            old = getattr(self, name)
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, name, grown)
+
+    def append_code(self, timestamp, key_code, event_type):
+        """Append one event whose key is already interned"""
+        i = self._size
+        if i == self.capacity:
+            self._reserve(i + 1)
+        self._timestamps[i] = timestamp
+        self._key_codes[i] = key_code
+        self._event_types[i] = event_type
+        self._size = i + 1
+
+    def append(self, timestamp, key, event_type):
+        """Append one event by key name"""
+        self.append_code(timestamp, self.key_table.code(key), event_type)
+
+    def extend(self, other):
+        """Append every event held by another buffer"""
+        start, count = self._size, len(other)
+        self._reserve(start + count)
+        self._timestamps[start:start + count] = other.timestamps
+        if other.key_table is self.key_table:
+            self._key_codes[start:start + count] = other.key_codes
+        else:
+            names = other.key_table.names
+            self._key_codes[start:start + count] = [self.key_table.code(names[c]) for c in other.key_codes]
+        self._event_types[start:start + count] = other.event_types
+        self._size = start + count
+
+    def clear(self):
+        """Drop all events but keep the allocated storage"""
+        self._size = 0
+
+    @classmethod
+    def from_keystrokes(cls, keystrokes, key_table=None):
+        """Build a buffer from stored {'key', 'type', 'timestamp'} event dicts"""
+        buffer = cls(capacity=max(len(keystrokes), 16), key_table=key_table)
+        for event in keystrokes:
+            event_type = EVENT_TYPE_CODES.get(event.get('type'))
+            if event_type is not None:
+                buffer.append(event.get('timestamp', np.nan), event.get('key'), event_type)
+        return buffer
+
+    def to_keystrokes(self):
+        """Return events in the {'key', 'type', 'timestamp'} format KeystrokeStorage saves"""
+        names = self.key_table.names
+        return [
+            {"key": names[code], "type": EVENT_TYPE_NAMES[event_type], "timestamp": timestamp}
+            for timestamp, code, event_type in zip(self.timestamps.tolist(), self.key_codes.tolist(), self.event_types.tolist())
+        ]
+
+    def press_times(self):
+        """Timestamps of every key press"""
+        return self.timestamps[self.event_types == KEY_DOWN]
+
+    def hold_times(self):
+        """Hold time of each release, paired with the latest press of the same key
+
+        A repeated press of a held key replaces the earlier one and a release
+        with no pending press is ignored, matching the pynput collectors.
+        Results are ordered by release.
+        """
+        codes = self.key_codes
+        types = self.event_types
+        order = np.argsort(codes, kind='stable')
+        grouped_codes = codes[order]
+        grouped_types = types[order]
+        # Within one key's events, a release pairs with the event right before it if that is a press
+        match = ((grouped_codes[1:] == grouped_codes[:-1])
+                 & (grouped_types[:-1] == KEY_DOWN) & (grouped_types[1:] == KEY_UP))
+        release_idx = order[1:][match]
+        press_idx = order[:-1][match]
+        by_release = np.argsort(release_idx, kind='stable')
+        timestamps = self.timestamps
+        return timestamps[release_idx[by_release]] - timestamps[press_idx[by_release]]
+
+    def release_to_press_times(self):
+        """Time from the latest release (of any key) to each following press"""
+        types = self.event_types
+        positions = np.arange(self._size)
+        last_release = np.maximum.accumulate(np.where(types == KEY_UP, positions, -1))
+        presses = types == KEY_DOWN
+        previous = last_release[presses]
+        valid = previous >= 0
+        timestamps = self.timestamps
+        return timestamps[presses][valid] - timestamps[previous[valid]]
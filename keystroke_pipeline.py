@@ -0,0 +1,173 @@
+"""
+Keystroke Capture Pipeline
+Non-blocking handoff from keyboard hook callbacks to a feature-processing thread
+"""
+
+import threading
+
+
+def key_name(key):
+    """Resolve a pynput key object to the name the collectors store"""
+    try:
+        return key.char if hasattr(key, 'char') and key.char else str(key)
+    except AttributeError:
+        return str(key)
+
+
+class KeystrokeRingBuffer:
+    """Bounded single-producer/single-consumer ring of raw key events
+
+    The keyboard hook is the only writer and the consumer thread the only
+    reader, so each side owns one index and no lock is taken on the hot
+    path. When the ring is full new events are dropped and counted rather
+    than blocking the hook.
+    """
+
+    def __init__(self, capacity=4096):
+        size = 1 << max(capacity - 1, 1).bit_length()
+        self._mask = size - 1
+        self._timestamps = [0.0] * size
+        self._keys = [None] * size
+        self._types = [0] * size
+        self._head = 0  # Next slot to write (producer only)
+        self._tail = 0  # Next slot to read (consumer only)
+        self._overflowing = False
+        self._not_empty = threading.Event()
+        self._woken = False
+        self.dropped = 0
+        self.overflows = 0
+        self.high_water = 0
+
+    @property
+    def capacity(self):
+        return self._mask + 1
+
+    @property
+    def written(self):
+        return self._head
+
+    @property
+    def consumed(self):
+        return self._tail
+
+    def __len__(self):
+        return self._head - self._tail
+
+    def put(self, timestamp, key, event_type):
+        """Record one raw event from the hook; never blocks"""
+        head = self._head
+        if head - self._tail > self._mask:
+            self.dropped += 1
+            if not self._overflowing:
+                self._overflowing = True
+                self.overflows += 1
+            return False
+        slot = head & self._mask
+        self._timestamps[slot] = timestamp
+        self._keys[slot] = key
+        self._types[slot] = event_type
+        self._head = head + 1
+        self._overflowing = False
+        if not self._not_empty.is_set():
+            self._not_empty.set()
+        return True
+
+    def drain(self):
+        """Yield every pending (timestamp, key, event_type) and release the slots"""
+        tail, head = self._tail, self._head
+        pending = head - tail
+        if pending > self.high_water:
+            self.high_water = pending
+        mask = self._mask
+        for seq in range(tail, head):
+            slot = seq & mask
+            yield self._timestamps[slot], self._keys[slot], self._types[slot]
+            self._keys[slot] = None
+            self._tail = seq + 1
+
+    def wait(self, timeout=None):
+        """Block the consumer until an event is pending, wake() is called or the timeout expires"""
+        if self._head != self._tail or self._woken:
+            self._woken = False
+            return True
+        self._not_empty.clear()
+        # Re-check after clearing so a put or wake that raced the clear is not missed
+        if self._head != self._tail or self._woken:
+            self._woken = False
+            return True
+        return self._not_empty.wait(timeout)
+
+    def wake(self):
+        """Wake a waiting consumer without adding an event"""
+        self._woken = True
+        self._not_empty.set()
+
+    def get_stats(self):
+        """Get queue depth and overflow counters"""
+        return {
+            "capacity": self.capacity,
+            "pending": len(self),
+            "written": self._head,
+            "consumed": self._tail,
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+            "high_water": self.high_water
+        }
+
+
+class KeystrokeConsumer:
+    """Background thread that drains a ring buffer into an event handler"""
+
+    def __init__(self, ring, handler, name="keystroke-consumer"):
+        self.ring = ring
+        self.handler = handler
+        self.name = name
+        self._running = False
+        self._thread = None
+        self._progress = threading.Condition()
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the consumer thread"""
+        if self.is_running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the consumer thread after handling everything already queued"""
+        self._running = False
+        self.ring.wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        if not self.is_running:
+            self._process()
+
+    def flush(self, timeout=1.0):
+        """Wait until every event written so far has been handled"""
+        target = self.ring.written
+        if not self.is_running:
+            self._process()
+            return True
+        with self._progress:
+            return self._progress.wait_for(lambda: self.ring.consumed >= target, timeout)
+
+    def _run(self):
+        # Blocks until an event or stop() arrives, so an idle collector never wakes
+        while self._running:
+            if self.ring.wait():
+                self._process()
+        self._process()
+
+    def _process(self):
+        for timestamp, key, event_type in self.ring.drain():
+            try:
+                self.handler(timestamp, key, event_type)
+            except Exception as e:
+                print(f"❌ Keystroke processing error: {e}")
+        with self._progress:
+            self._progress.notify_all()
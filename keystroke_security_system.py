@@ -16,6 +16,9 @@ import threading
 import subprocess
 from datetime import datetime
 import hashlib
+import numpy as np
+from keystroke_events import KeystrokeEventBuffer, KEY_DOWN, KEY_UP
+from phrase_template import PhraseTemplate, phrase_timings, timing_list
 
 class KeystrokeSecuritySystem:
     def __init__(self):
@@ -43,8 +46,9 @@ class KeystrokeSecuritySystem:
         self.current_user = None
         
         # Keystroke timing data
-        self.key_timings = []
-        self.last_key_time = 0
+        self.key_events = KeystrokeEventBuffer()
+        # Parsed phrase template of the user selected on the auth screen
+        self.auth_template = None
         
         self.load_patterns()
         self.setup_login_interface()
@@ -174,6 +178,7 @@ class KeystrokeSecuritySystem:
                     font=("Arial", 12, "bold"), fg=self.colors['text'], bg=self.colors['panel']).pack(pady=(20, 5))
             
             self.user_var = tk.StringVar(value=users[0])
+            self.user_var.trace_add('write', self.select_auth_user)
             user_menu = tk.OptionMenu(auth_frame, self.user_var, *users)
             user_menu.config(font=("Arial", 12), bg=self.colors['input'], fg=self.colors['text'])
             user_menu.pack(pady=10)
@@ -185,6 +190,7 @@ class KeystrokeSecuritySystem:
         # Random text for authentication
         import random
         self.auth_text = random.choice(self.training_texts)
+        self.select_auth_user()
         
         text_display = tk.Text(auth_frame, height=3, font=("Arial", 14, "bold"),
                               fg=self.colors['accent'], bg=self.colors['input'], 
@@ -203,6 +209,9 @@ class KeystrokeSecuritySystem:
         self.auth_entry.pack(fill=tk.X, padx=20, pady=10)
         self.auth_entry.focus()
         
+        # Start from an empty buffer, not the last training phrase
+        self.key_events.clear()
+        
         # Bind keystroke capture
         self.auth_entry.bind('<KeyPress>', self.capture_keystroke)
         self.auth_entry.bind('<KeyRelease>', self.on_key_release)
@@ -298,12 +307,12 @@ class KeystrokeSecuritySystem:
         self.training_entry.focus()
         
         # Reset timing data
-        self.key_timings = []
-        self.last_key_time = 0
+        self.key_events.clear()
         self.training_start_time = time.time()
         
         # Bind keystroke capture
         self.training_entry.bind('<KeyPress>', self.capture_training_keystroke)
+        self.training_entry.bind('<KeyRelease>', self.capture_key_release)
         
         # Instructions
         tk.Label(parent, text="💡 Type naturally at your normal speed. Press Enter when finished.", 
@@ -314,34 +323,35 @@ class KeystrokeSecuritySystem:
     
     def capture_training_keystroke(self, event):
         """Capture keystroke timing during training"""
-        current_time = time.time()
-        
-        if self.last_key_time > 0:
-            interval = current_time - self.last_key_time
-            self.key_timings.append({
-                'char': event.char,
-                'interval': interval,
-                'timestamp': current_time
-            })
-        
-        self.last_key_time = current_time
+        self.key_events.append(time.time(), event.char, KEY_DOWN)
     
     def capture_keystroke(self, event):
         """Capture keystroke timing during authentication"""
-        current_time = time.time()
-        
-        if self.last_key_time > 0:
-            interval = current_time - self.last_key_time
-            self.key_timings.append({
-                'char': event.char,
-                'interval': interval,
-                'timestamp': current_time
-            })
-        
-        self.last_key_time = current_time
+        self.key_events.append(time.time(), event.char, KEY_DOWN)
+    
+    def capture_key_release(self, event):
+        """Capture key release timing so hold times can be measured"""
+        self.key_events.append(time.time(), event.char, KEY_UP)
+    
+    def key_intervals(self):
+        """Intervals between consecutive captured key presses"""
+        return np.diff(self.key_events.press_times())
+    
+    def key_timing_records(self):
+        """Captured intervals in the {'char', 'interval', 'timestamp'} format saved with patterns"""
+        names = self.key_events.key_table.names
+        presses = self.key_events.event_types == KEY_DOWN
+        timestamps = self.key_events.timestamps[presses].tolist()
+        chars = [names[code] for code in self.key_events.key_codes[presses].tolist()]
+        intervals = self.key_intervals().tolist()
+        return [
+            {'char': char, 'interval': interval, 'timestamp': timestamp}
+            for char, interval, timestamp in zip(chars[1:], intervals, timestamps[1:])
+        ]
     
     def on_key_release(self, event):
         """Handle key release during authentication"""
+        self.capture_key_release(event)
         typed_text = self.auth_entry.get("1.0", tk.END).strip()
         
         # Update status based on typing progress
@@ -349,7 +359,15 @@ class KeystrokeSecuritySystem:
             self.auth_status.config(text="⏳ Start typing...", fg=self.colors['warning'])
         elif typed_text == self.auth_text[:len(typed_text)]:
             progress = len(typed_text) / len(self.auth_text) * 100
-            self.auth_status.config(text=f"✅ Typing correctly... {progress:.0f}%", fg=self.colors['success'])
+            status = f"✅ Typing correctly... {progress:.0f}%"
+            
+            # Score the prefix typed so far against the selected user's template for this text
+            template = self.auth_template
+            if template is not None:
+                score = template.score(phrase_timings(self.key_events, self.auth_text)[1])
+                if not np.isnan(score):
+                    status += f" (rhythm {score:.2f} / {template.threshold:.2f})"
+            self.auth_status.config(text=status, fg=self.colors['success'])
         else:
             self.auth_status.config(text="❌ Text mismatch detected", fg=self.colors['accent'])
     
@@ -360,13 +378,15 @@ class KeystrokeSecuritySystem:
         if typed_text == expected_text:
             # Calculate typing metrics
             total_time = time.time() - self.training_start_time
-            avg_interval = sum(t['interval'] for t in self.key_timings) / len(self.key_timings) if self.key_timings else 0
+            intervals = self.key_intervals()
+            avg_interval = float(np.mean(intervals)) if intervals.size else 0
             
             training_data = {
                 'text': expected_text,
                 'total_time': total_time,
                 'avg_interval': avg_interval,
-                'key_timings': self.key_timings.copy(),
+                'key_timings': self.key_timing_records(),
+                'position_timings': timing_list(phrase_timings(self.key_events, expected_text)[1]),
                 'char_count': len(expected_text),
                 'wpm': (len(expected_text) / 5) / (total_time / 60) if total_time > 0 else 0
             }
@@ -387,12 +407,24 @@ class KeystrokeSecuritySystem:
         avg_wpm = sum(t['wpm'] for t in self.training_data) / len(self.training_data)
         avg_interval = sum(t['avg_interval'] for t in self.training_data) / len(self.training_data)
         
+        # Per-position timing template for every training text
+        samples = {}
+        for t in self.training_data:
+            samples.setdefault(t['text'], []).append(t['position_timings'])
+        templates = {}
+        for text, vectors in samples.items():
+            try:
+                templates[text] = PhraseTemplate.fit(text, vectors).to_dict()
+            except ValueError as e:
+                self.log_event("training_warning", f"No timing template for '{text}': {e}", "warning")
+        
         # Create user profile
         user_profile = {
             'username': self.current_user,
             'avg_wpm': avg_wpm,
             'avg_interval': avg_interval,
             'training_data': self.training_data,
+            'phrase_templates': templates,
             'created_at': datetime.now().isoformat(),
             'tolerance': 0.25  # 25% tolerance for authentication
         }
@@ -427,14 +459,32 @@ class KeystrokeSecuritySystem:
             return
         
         # Analyze keystroke pattern
-        if not self.key_timings:
+        intervals = self.key_intervals()
+        if not intervals.size:
             self.handle_failed_authentication("No keystroke data captured")
             return
         
         user_profile = self.keystroke_patterns[selected_user]
         
+        # Per-position template when this text was enrolled with one
+        template = self.phrase_template(selected_user, self.auth_text)
+        if template is not None:
+            typed, timings = phrase_timings(self.key_events, self.auth_text)
+            accepted, score = template.verify(typed, timings)
+            if accepted:
+                self.is_authenticated = True
+                self.current_user = selected_user
+                self.failed_attempts = 0
+                
+                self.log_event("auth_success", f"User {selected_user} authenticated successfully (template score {score:.2f})")
+                self.grant_system_access()
+            else:
+                self.handle_failed_authentication(f"Keystroke pattern mismatch (template score {score:.2f} > {template.threshold:.2f})")
+            return
+        
+        # Profiles trained before templates: compare the mean interval only
         # Calculate current typing metrics
-        current_avg_interval = sum(t['interval'] for t in self.key_timings) / len(self.key_timings)
+        current_avg_interval = float(np.mean(intervals))
         
         # Compare with stored profile
         stored_avg_interval = user_profile['avg_interval']
@@ -453,6 +503,17 @@ class KeystrokeSecuritySystem:
         else:
             self.handle_failed_authentication(f"Keystroke pattern mismatch (difference: {difference:.2%})")
     
+    def select_auth_user(self, *args):
+        """Parse the selected user's template for the auth text once, not on every key release"""
+        self.auth_template = None
+        if hasattr(self, 'user_var'):
+            self.auth_template = self.phrase_template(self.user_var.get(), self.auth_text)
+    
+    def phrase_template(self, username, text):
+        """Enrolled timing template of a user for one text, or None"""
+        data = self.keystroke_patterns.get(username, {}).get('phrase_templates', {}).get(text)
+        return PhraseTemplate.from_dict(data) if data else None
+    
     def handle_failed_authentication(self, reason):
         """Handle failed authentication attempt"""
         self.failed_attempts += 1
@@ -469,8 +530,7 @@ class KeystrokeSecuritySystem:
             
             # Reset for next attempt
             self.auth_entry.delete("1.0", tk.END)
-            self.key_timings = []
-            self.last_key_time = 0
+            self.key_events.clear()
             self.auth_entry.focus()
     
     def activate_security_breach(self):
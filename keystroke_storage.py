@@ -9,32 +9,201 @@ import pickle
 import numpy as np
 from datetime import datetime
 import hashlib
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import joblib
+from atomic_files import atomic_tmp_path
+from keystroke_events import pair_keystrokes
+from ngram_index import NGramTimingIndex
+from feature_cache import FeatureMatrixCache
+from model_artifact import read_header
+from model_registry import MODEL_REGISTRY
+from session_log import SessionLog, LEGACY_SESSIONS_NAME, has_sessions, load_user_sessions
+from session_database import DATABASE_NAME, SQLiteSessionStore, configured_backend, open_database
+from scoring_engines import configured_engine, create_engine, decision_confidence, export_engine, update_engine
+from typing_population import TypingPopulation
+
+# Number of most frequent digraphs/trigraphs used as model features
+NGRAM_FEATURES = 10
+
+# Profile fields written by train_model; a background training job hands these back to the server
+MODEL_PROFILE_FIELDS = ("is_trained", "model_engine", "model_ngrams", "model_accuracy")
+
+# User ids become directory names, so keep them to a safe character set
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}$")
+
+def extract_session_features(keystrokes):
+    """Extract typing pattern features from keystroke data"""
+    if len(keystrokes) < 2:
+        return {}
+
+    timings = pair_keystrokes(keystrokes)
+    dwell_times = timings["dwell_times"]
+    flight_times = timings["flight_times"]
+
+    features = {
+        "dwell_times": dwell_times.tolist(),  # Time key is held down
+        "flight_times": flight_times.tolist(), # Time from key release to next key press
+        "typing_rhythm": [],
+        "pressure_patterns": [],
+        "key_intervals": {pair: gaps.tolist() for pair, gaps in timings["key_intervals"].items()},
+        "ngram_timings": NGramTimingIndex().add_keystrokes(keystrokes).to_records()
+    }
+
+    # Calculate statistics
+    if dwell_times.size:
+        features["avg_dwell_time"] = np.mean(dwell_times)
+        features["std_dwell_time"] = np.std(dwell_times)
+
+    if flight_times.size:
+        features["avg_flight_time"] = np.mean(flight_times)
+        features["std_flight_time"] = np.std(flight_times)
+
+    return features
+
+
+def _extract_feature_batch(keystroke_lists):
+    """Process-pool worker: extract features for a batch of sessions"""
+    return [extract_session_features(keystrokes) for keystrokes in keystroke_lists]
+
+
+def batch_extract_features(keystroke_lists, workers=None):
+    """Extract features for many sessions, spread across a process pool"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(keystroke_lists) < 2 * workers:
+        return _extract_feature_batch(keystroke_lists)
+        
+    # A few batches per worker keeps the pool busy without paying IPC per session
+    batch_size = max(1, len(keystroke_lists) // (workers * 4))
+    batches = [keystroke_lists[i:i + batch_size] for i in range(0, len(keystroke_lists), batch_size)]
+    
+    features = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch_features in pool.map(_extract_feature_batch, batches):
+            features.extend(batch_features)
+    return features
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temporary file and swap it in, so readers never see a partial file"""
+    tmp_path = atomic_tmp_path(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def dump_atomic(obj, path):
+    """joblib.dump to a temporary file and swap it in, so a reader never loads a half-written pickle"""
+    tmp_path = atomic_tmp_path(path)
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def stored_user_ids(data_dir="keystroke_data"):
+    """Users with stored sessions, in session files or in the data directory's database"""
+    if not os.path.isdir(data_dir):
+        return []
+    user_ids = {user_id for user_id in os.listdir(data_dir) if has_sessions(os.path.join(data_dir, user_id))}
+    if os.path.isfile(os.path.join(data_dir, DATABASE_NAME)):
+        user_ids.update(open_database(data_dir).user_ids())
+    return sorted(user_ids)
+
+
+def reextract_all_users(workers=None):
+    """Recompute stored features for every user in one shared process pool"""
+    storages = [KeystrokeStorage(user_id) for user_id in stored_user_ids()]
+    
+    started = time.perf_counter()
+    user_sessions = [storage.load_all_sessions() for storage in storages]
+    all_keystrokes = [session.get("keystrokes", []) for sessions in user_sessions for session in sessions]
+    features = batch_extract_features(all_keystrokes, workers)
+    
+    offset = 0
+    for storage, sessions in zip(storages, user_sessions):
+        storage.replace_session_features(sessions, features[offset:offset + len(sessions)])
+        offset += len(sessions)
+        
+    elapsed = time.perf_counter() - started
+    rate = len(all_keystrokes) / elapsed if elapsed > 0 else 0.0
+    print(f"♻️ Re-extracted {len(all_keystrokes)} sessions for {len(storages)} users in {elapsed:.2f}s ({rate:.1f} sessions/sec)")
+    return {"users": len(storages), "sessions": len(all_keystrokes), "seconds": elapsed, "sessions_per_sec": rate}
+
 
 class KeystrokeStorage:
-    def __init__(self, user_id="default_user"):
+    def __init__(self, user_id="default_user", engine=None, backend=None):
         self.user_id = user_id
+        self.engine = engine or configured_engine()
+        self.backend = backend or configured_backend()
         self.data_dir = "keystroke_data"
         self.user_dir = os.path.join(self.data_dir, user_id)
         self.profile_file = os.path.join(self.user_dir, "profile.json")
-        self.keystroke_file = os.path.join(self.user_dir, "keystrokes.json")
+        # Sessions live in an append-only log (or the shared SQLite database); keystrokes.json is only read once, to migrate it
+        if self.backend == "sqlite":
+            self.database = open_database(self.data_dir)
+            self.session_log = SQLiteSessionStore(self.database, user_id)
+        else:
+            self.database = None
+            self.session_log = SessionLog(self.user_dir)
+        self.keystroke_file = self.session_log.path
+        self.legacy_keystroke_file = os.path.join(self.user_dir, LEGACY_SESSIONS_NAME)
         self.model_file = os.path.join(self.user_dir, "typing_model.pkl")
         self.scaler_file = os.path.join(self.user_dir, "scaler.pkl")
+        self.scorer_file = os.path.join(self.user_dir, "typing_model.model")
+        self.ngram_file = os.path.join(self.user_dir, "ngram_index.json")
+        self.model = None
+        self.scaler = None
+        self.model_stamp = None
+        # Request handlers and training-job callbacks both change the profile, n-gram index and caches
+        self._lock = threading.RLock()
+        # Fold each newly saved session into a trained model instead of waiting for a retrain
+        self.auto_update_model = True
         
         self.ensure_directories()
+        self.migrate_sessions()
         self.load_profile()
+        self.load_ngram_index()
+        self.feature_cache = FeatureMatrixCache(self.user_dir)
         
     def ensure_directories(self):
         """Create necessary directories if they don't exist"""
         os.makedirs(self.user_dir, exist_ok=True)
         
-    def load_profile(self):
-        """Load user profile or create new one"""
+    def migrate_sessions(self):
+        """One-time move of file-backed sessions into the session log or database"""
+        if self.database is not None:
+            count = self.session_log.import_files(self.user_dir)
+        else:
+            count = self.session_log.migrate_legacy(self.legacy_keystroke_file)
+        if count is not None:
+            print(f"📦 Migrated {count} sessions for {self.user_id} to {self.session_log.path}")
+            
+    def stored_profile(self):
+        """The profile as currently saved (by this or another process), or None"""
+        if self.database is not None:
+            profile = self.database.load_profile(self.user_id)
+            if profile is not None:
+                return profile
         if os.path.exists(self.profile_file):
             with open(self.profile_file, 'r') as f:
-                self.profile = json.load(f)
+                return json.load(f)
+        return None
+        
+    def load_profile(self):
+        """Load user profile or create new one"""
+        with self._lock:
+            self._load_profile()
+            
+    def _load_profile(self):
+        profile = self.stored_profile()
+        if profile is not None:
+            self.profile = profile
+            if self.database is not None and self.database.load_profile(self.user_id) is None:
+                self.save_profile()
         else:
             self.profile = {
                 "user_id": self.user_id,
@@ -54,172 +223,271 @@ class KeystrokeStorage:
             self.save_profile()
             
     def save_profile(self):
-        """Save user profile to file"""
-        with open(self.profile_file, 'w') as f:
-            json.dump(self.profile, f, indent=2)
+        """Save user profile to file or database"""
+        with self._lock:
+            if self.database is not None:
+                self.database.save_profile(self.user_id, self.profile)
+            else:
+                write_json_atomic(self.profile_file, self.profile)
+            
+    def update_profile(self, **fields):
+        """Set profile fields on top of the stored profile and save
+
+        The stored profile is re-read first, so fields another process saved
+        meanwhile (session counts from the web server, model fields from a
+        background training job) are kept instead of overwritten.
+        """
+        with self._lock:
+            self.refresh_profile()
+            self.profile.update(fields)
+            self.save_profile()
             
-    def save_keystroke_session(self, session_data):
-        """Save a complete keystroke training session"""
-        # Load existing sessions
-        sessions = self.load_all_sessions()
+    def refresh_profile(self):
+        """Merge the stored profile into this one, keeping fields only this process has set"""
+        with self._lock:
+            stored = self.stored_profile()
+            if stored is not None:
+                self.profile.update(stored)
+            
+    def reload(self):
+        """Re-read profile, n-gram index and feature cache after another process changed them"""
+        with self._lock:
+            self.load_profile()
+            self.load_ngram_index()
+            self.feature_cache.load()
+            
+    def adopt_trained_model(self, model_profile):
+        """Pick up a model another process trained, with the model fields it produced
+
+        The worker saved those fields over a profile it read before any
+        sessions this process saved meanwhile, so they are applied again on
+        top of the reloaded profile, all under the storage lock.
+        """
+        with self._lock:
+            self.reload()
+            self.update_profile(**model_profile)
         
-        # Add new session
-        session_entry = {
-            "session_id": len(sessions) + 1,
-            "timestamp": datetime.now().isoformat(),
-            "text_typed": session_data.get("text", ""),
-            "keystrokes": session_data.get("keystrokes", []),
-            "typing_speed": session_data.get("typing_speed", 0),
-            "accuracy": session_data.get("accuracy", 0),
-            "session_duration": session_data.get("duration", 0),
-            "features": self.extract_features(session_data.get("keystrokes", []))
-        }
+    def load_ngram_index(self):
+        """Load the user's n-gram timing index, rebuilding it from stored sessions if missing or unreadable"""
+        if os.path.exists(self.ngram_file):
+            try:
+                with open(self.ngram_file, 'r') as f:
+                    self.ngram_index = NGramTimingIndex.from_dict(json.load(f))
+                return
+            except Exception as e:
+                print(f"⚠️ Rebuilding unreadable n-gram index: {e}")
+            
+        self.ngram_index = NGramTimingIndex()
+        for session in self.iter_sessions():
+            self.ngram_index.merge(self.session_ngrams(session))
+        if self.ngram_index.top_k(1):
+            self.save_ngram_index()
+            
+    def save_ngram_index(self):
+        """Write the n-gram timing index atomically"""
+        write_json_atomic(self.ngram_file, self.ngram_index.to_dict())
+            
+    def session_ngrams(self, session):
+        """Get the n-gram index of one stored session"""
+        records = session.get("features", {}).get("ngram_timings")
+        if records is not None:
+            return NGramTimingIndex.from_records(records)
+        # Sessions saved before n-gram timings were stored
+        return NGramTimingIndex().add_keystrokes(session.get("keystrokes", []))
         
-        sessions.append(session_entry)
+    def save_keystroke_session(self, session_data):
+        """Save a complete keystroke training session"""
+        features = self.extract_features(session_data.get("keystrokes", []))
         
-        # Save updated sessions
-        with open(self.keystroke_file, 'w') as f:
-            json.dump(sessions, f, indent=2)
+        # One writer at a time, so a training-job reload cannot swap the index or profile mid-save
+        with self._lock:
+            session_entry = {
+                "session_id": self.session_count() + 1,
+                "timestamp": datetime.now().isoformat(),
+                "text_typed": session_data.get("text", ""),
+                "keystrokes": session_data.get("keystrokes", []),
+                "typing_speed": session_data.get("typing_speed", 0),
+                "accuracy": session_data.get("accuracy", 0),
+                "session_duration": session_data.get("duration", 0),
+                "features": features
+            }
             
-        # Update profile
-        self.profile["training_sessions"] += 1
-        self.profile["total_keystrokes"] += len(session_data.get("keystrokes", []))
-        self.profile["last_training"] = datetime.now().isoformat()
-        self.save_profile()
-        
-        print(f"✅ Session {session_entry['session_id']} saved for user {self.user_id}")
+            ngrams = self.ngram_index.top_k(NGRAM_FEATURES)
+            cache_was_fresh = self.feature_cache.is_fresh(self.session_log, self.feature_schema(ngrams))
+            
+            # Append only this session to the log; earlier sessions are never rewritten
+            self.session_log.append(session_entry)
+            
+            # Fold this session's digraph/trigraph timings into the user's index
+            self.ngram_index.merge(NGramTimingIndex.from_records(session_entry["features"].get("ngram_timings", [])))
+            self.save_ngram_index()
+            
+            # Append the new row to the cached training matrix while its schema still holds
+            if cache_was_fresh and self.ngram_index.top_k(NGRAM_FEATURES) == ngrams:
+                self.feature_cache.append(
+                    self.session_vector(session_entry, ngrams),
+                    FeatureMatrixCache.session_hash(session_entry),
+                    self.feature_schema(ngrams),
+                    self.session_log
+                )
+                
+            # Update profile on top of the stored one, which a training job may have changed
+            self.refresh_profile()
+            self.profile.setdefault("typing_statistics", {})["common_patterns"] = ["".join(ngram) for ngram in self.ngram_index.top_k(5)]
+            self.profile["training_sessions"] += 1
+            self.profile["total_keystrokes"] += len(session_data.get("keystrokes", []))
+            self.profile["last_training"] = datetime.now().isoformat()
+            self.save_profile()
+            
+            print(f"✅ Session {session_entry['session_id']} saved for user {self.user_id}")
+            
+            if self.auto_update_model and self.profile.get("is_trained"):
+                self.update_model([session_entry])
+                
         return session_entry["session_id"]
         
     def load_all_sessions(self):
         """Load all keystroke sessions"""
-        if os.path.exists(self.keystroke_file):
-            with open(self.keystroke_file, 'r') as f:
-                return json.load(f)
-        return []
+        return list(self.session_log)
+        
+    def iter_sessions(self):
+        """Stream stored sessions one at a time, without holding the history in memory"""
+        return iter(self.session_log)
+        
+    def session_count(self):
+        """Number of stored sessions, from the session log index"""
+        return len(self.session_log)
+        
+    def sessions_between(self, since=None, until=None):
+        """Stored sessions with an ISO timestamp in [since, until), either bound optional"""
+        return list(self.session_log.sessions_between(since, until))
         
     def extract_features(self, keystrokes):
         """Extract typing pattern features from keystroke data"""
-        if len(keystrokes) < 2:
-            return {}
-            
-        features = {
-            "dwell_times": [],  # Time key is held down
-            "flight_times": [], # Time between key releases
-            "typing_rhythm": [],
-            "pressure_patterns": [],
-            "key_intervals": {}
-        }
+        return extract_session_features(keystrokes)
         
-        for i in range(len(keystrokes) - 1):
-            current = keystrokes[i]
-            next_key = keystrokes[i + 1]
-            
-            # Dwell time (key down to key up)
-            if current.get('type') == 'down' and i + 1 < len(keystrokes):
-                for j in range(i + 1, len(keystrokes)):
-                    if keystrokes[j].get('key') == current.get('key') and keystrokes[j].get('type') == 'up':
-                        dwell_time = keystrokes[j]['timestamp'] - current['timestamp']
-                        features["dwell_times"].append(dwell_time)
-                        break
-            
-            # Flight time (key up to next key down)
-            if current.get('type') == 'up' and next_key.get('type') == 'down':
-                flight_time = next_key['timestamp'] - current['timestamp']
-                features["flight_times"].append(flight_time)
-                
-            # Key pair intervals
-            if current.get('type') == 'down' and next_key.get('type') == 'down':
-                key_pair = f"{current.get('key', '')}-{next_key.get('key', '')}"
-                interval = next_key['timestamp'] - current['timestamp']
-                if key_pair not in features["key_intervals"]:
-                    features["key_intervals"][key_pair] = []
-                features["key_intervals"][key_pair].append(interval)
+    def feature_vector(self, features, typing_speed, accuracy, duration, ngrams):
+        """Build the model feature vector for one session's extracted features"""
+        vector = [
+            features.get("avg_dwell_time", 0),
+            features.get("std_dwell_time", 0),
+            features.get("avg_flight_time", 0),
+            features.get("std_flight_time", 0),
+            len(features.get("dwell_times", [])),
+            len(features.get("flight_times", [])),
+            typing_speed,
+            accuracy,
+            duration
+        ]
         
-        # Calculate statistics
-        if features["dwell_times"]:
-            features["avg_dwell_time"] = np.mean(features["dwell_times"])
-            features["std_dwell_time"] = np.std(features["dwell_times"])
-            
-        if features["flight_times"]:
-            features["avg_flight_time"] = np.mean(features["flight_times"])
-            features["std_flight_time"] = np.std(features["flight_times"])
+        # Add the user's most frequent digraph/trigraph timings
+        if ngrams:
+            session_means = {tuple(names): mean for names, count, mean, m2 in features.get("ngram_timings", [])}
+            vector.extend(session_means.get(ngram, 0) for ngram in ngrams)
+            vector.extend([0] * (NGRAM_FEATURES - len(ngrams)))
+        else:
+            # Models trained before the n-gram index used ten columns that were always 0
+            vector.extend([0] * NGRAM_FEATURES)
             
-        return features
+        return vector
+        
+    def session_vector(self, session, ngrams):
+        """Build the model feature vector for one stored session"""
+        features = session.get("features", {})
+        if "ngram_timings" not in features:
+            features = dict(features, ngram_timings=self.session_ngrams(session).to_records())
+            
+        return self.feature_vector(
+            features,
+            session.get("typing_speed", 0),
+            session.get("accuracy", 0),
+            session.get("session_duration", 0),
+            ngrams
+        )
+        
+    def feature_schema(self, ngrams):
+        """Describe the feature vector layout so cached rows can be matched to it"""
+        return {"base_features": 9, "ngrams": [list(ngram) for ngram in ngrams]}
         
     def prepare_training_data(self):
         """Prepare feature vectors for machine learning"""
-        sessions = self.load_all_sessions()
+        self.training_ngrams = self.ngram_index.top_k(NGRAM_FEATURES)
+        schema = self.feature_schema(self.training_ngrams)
         
-        if len(sessions) < 3:
+        # Unchanged sessions: reuse the cached matrix without parsing it
+        if self.feature_cache.is_fresh(self.session_log, schema) and len(self.feature_cache.matrix) >= 3:
+            X = self.feature_cache.matrix
+            return X, np.ones(len(X), dtype=int)
+            
+        if self.session_count() < 3:
             print("❌ Need at least 3 training sessions to build a model")
             return None, None
             
+        cached_rows = self.feature_cache.cached_rows(schema)
         feature_vectors = []
-        labels = []
+        hashes = []
         
-        for session in sessions:
-            features = session.get("features", {})
-            
-            # Create feature vector
-            vector = [
-                features.get("avg_dwell_time", 0),
-                features.get("std_dwell_time", 0),
-                features.get("avg_flight_time", 0),
-                features.get("std_flight_time", 0),
-                len(features.get("dwell_times", [])),
-                len(features.get("flight_times", [])),
-                session.get("typing_speed", 0),
-                session.get("accuracy", 0),
-                session.get("session_duration", 0)
-            ]
-            
-            # Add common key pair timings
-            key_intervals = features.get("key_intervals", {})
-            common_pairs = ["th", "he", "er", "an", "in", "on", "at", "ed", "nd", "to"]
-            
-            for pair in common_pairs:
-                if pair in key_intervals:
-                    vector.append(np.mean(key_intervals[pair]))
-                else:
-                    vector.append(0)
-                    
+        for session_hash, session in self.session_log.training_rows():
+            vector = cached_rows.get(session_hash)
+            if vector is None:
+                vector = self.session_vector(session, self.training_ngrams)
+                
             feature_vectors.append(vector)
-            labels.append(1)  # All training data is from legitimate user
+            hashes.append(session_hash)
             
-        return np.array(feature_vectors), np.array(labels)
+        X = np.array(feature_vectors, dtype=np.float64)
+        self.feature_cache.store(X, hashes, schema, self.session_log)
         
-    def train_model(self):
-        """Train machine learning model on user's typing patterns"""
+        # All training data is from legitimate user
+        return X, np.ones(len(X), dtype=int)
+        
+    def train_model(self, progress=None):
+        """Train machine learning model on user's typing patterns
+
+        progress, if given, is called as progress(stage, fraction) between steps.
+        """
         print(f"🤖 Training typing pattern model for user {self.user_id}...")
+        report = progress or (lambda stage, fraction: None)
         
+        report("preparing", 0.1)
         X, y = self.prepare_training_data()
         
         if X is None:
             return False
             
         try:
-            # Use Isolation Forest for anomaly detection
+            # sklearn is only needed for training; authentication uses the exported engine
+            from sklearn.preprocessing import StandardScaler
+            
+            # Use anomaly detection (Isolation Forest by default)
             # This will learn what "normal" typing looks like for this user
             self.scaler = StandardScaler()
             X_scaled = self.scaler.fit_transform(X)
             
-            # Train isolation forest (contamination = expected % of outliers)
-            self.model = IsolationForest(
-                contamination=0.1,  # Expect 10% outliers
-                random_state=42,
-                n_estimators=100
-            )
+            # Train the configured engine with the calibrated settings, if any (contamination = expected % of outliers)
+            settings = self.calibration_settings()
+            self.model = create_engine(self.engine, settings["contamination"], settings["n_estimators"])
             
+            report("fitting", 0.3)
             self.model.fit(X_scaled)
             
             # Save model and scaler
-            joblib.dump(self.model, self.model_file)
-            joblib.dump(self.scaler, self.scaler_file)
+            report("saving", 0.8)
+            dump_atomic(self.model, self.model_file)
+            dump_atomic(self.scaler, self.scaler_file)
+            scorer = export_engine(
+                self.model, self.scaler, self.scorer_file, settings["threshold"],
+                self.feature_schema(self.training_ngrams), self.artifact_metadata(len(X))
+            )
+            self.model_stamp = MODEL_REGISTRY.put(self.scorer_file, None, scorer, scorer.scaler)
             
-            # Update profile
-            self.profile["is_trained"] = True
-            self.profile["model_accuracy"] = self.evaluate_model(X_scaled)
-            self.save_profile()
+            # Update only the model fields; session counts may have changed in another process
+            self.update_profile(**dict(zip(MODEL_PROFILE_FIELDS, (
+                True,
+                self.engine,
+                [list(ngram) for ngram in self.training_ngrams],
+                self.evaluate_model(X_scaled)
+            ))))
             
             print(f"✅ Model trained successfully! Accuracy: {self.profile['model_accuracy']:.2f}")
             return True
@@ -228,18 +496,172 @@ class KeystrokeStorage:
             print(f"❌ Model training failed: {e}")
             return False
             
-    def load_model(self):
-        """Load trained model from file"""
+    def artifact_metadata(self, training_samples):
+        """Training metadata stored in the model artifact header"""
+        return {
+            "user_id": self.user_id,
+            "trained_at": datetime.now().isoformat(),
+            "training_samples": training_samples,
+            "calibration": self.profile.get("calibration")
+        }
+        
+    def calibration_settings(self):
+        """Contamination, tree count and acceptance threshold for the current engine
+
+        Values come from the last calibrate_model() run for this engine and
+        fall back to the historical defaults (10% contamination, 100 trees,
+        accept at decision score 0).
+        """
+        settings = {"contamination": 0.1, "n_estimators": 100, "threshold": 0.0}
+        calibration = self.profile.get("calibration")
+        if calibration and calibration.get("engine") == self.engine:
+            settings.update({key: calibration[key] for key in settings if key in calibration})
+        return settings
+        
+    def calibrate_model(self, impostor_sessions=None, grid=None, workers=None):
+        """Pick contamination, tree count and threshold by leave-one-session-out EER, then retrain
+
+        Impostor samples are the other stored users' sessions unless given;
+        with no other users, synthetic impostors around this user's template
+        are used. The grid defaults to the configured engine's entry in
+        calibration.DEFAULT_GRID.
+        """
+        from calibration import DEFAULT_GRID, calibrate, synthetic_impostors
+        
+        started = time.perf_counter()
+        if self.session_count() < 4:
+            print("❌ Need at least 4 training sessions to calibrate (one is held out per fold)")
+            return None
+            
         try:
-            if os.path.exists(self.model_file) and os.path.exists(self.scaler_file):
-                self.model = joblib.load(self.model_file)
-                self.scaler = joblib.load(self.scaler_file)
-                return True
+            ngrams = self.ngram_index.top_k(NGRAM_FEATURES)
+            X_genuine = self.model_matrix(ngrams)
+            
+            if impostor_sessions is None and self.database is not None:
+                impostor_sessions = list(self.database.iter_other_sessions(self.user_id))
+            elif impostor_sessions is None:
+                impostor_sessions = []
+                for other_id in sorted(os.listdir(self.data_dir)):
+                    if other_id != self.user_id:
+                        impostor_sessions.extend(load_user_sessions(os.path.join(self.data_dir, other_id)))
+            if impostor_sessions:
+                X_impostor = np.array([self.session_vector(session, ngrams) for session in impostor_sessions], dtype=np.float64)
+                impostor_source = "other users"
+            else:
+                X_impostor = synthetic_impostors(X_genuine)
+                impostor_source = "synthetic"
+                
+            best, results = calibrate(X_genuine, X_impostor, grid or {self.engine: DEFAULT_GRID[self.engine]}, workers)
+            
+            self.engine = best["engine"]
+            self.profile["calibration"] = {
+                "engine": best["engine"],
+                "contamination": best["contamination"],
+                "n_estimators": best["n_estimators"],
+                "threshold": best["threshold"],
+                "eer": best["eer"],
+                "impostors": impostor_source,
+                "settings_tried": len(results),
+                "calibrated_at": datetime.now().isoformat()
+            }
+            self.save_profile()
+            
+            elapsed = time.perf_counter() - started
+            print(f"🎚️ Calibrated {self.user_id}: {best['engine']} contamination={best['contamination']} "
+                  f"trees={best['n_estimators']} threshold={best['threshold']:.4f} EER={best['eer']:.3f} "
+                  f"({len(results)} settings, {impostor_source} impostors, {elapsed:.1f}s)")
+            
+            if not self.train_model():
+                return None
+            return self.profile["calibration"]
+            
+        except Exception as e:
+            print(f"❌ Calibration failed: {e}")
+            return None
+            
+    def model_matrix(self, ngrams):
+        """Feature matrix of every stored session for a given n-gram layout, from the cache when it matches"""
+        if self.feature_cache.is_fresh(self.session_log, self.feature_schema(ngrams)):
+            return self.feature_cache.matrix
+        return np.array([self.session_vector(session, ngrams) for session in self.iter_sessions()], dtype=np.float64)
+        
+    def update_model(self, new_sessions):
+        """Incrementally fold new stored sessions into the trained model instead of a full retrain"""
+        with self._lock:
+            return self._update_model(new_sessions)
+            
+    def _update_model(self, new_sessions):
+        started = time.perf_counter()
+        
+        try:
+            # Use the model fields of the model file on disk, which a training job may have replaced
+            self.refresh_profile()
+            model = joblib.load(self.model_file)
+            scaler = joblib.load(self.scaler_file)
+            
+            # Keep the model's feature layout; a full train_model() picks new n-grams
+            ngrams = [tuple(ngram) for ngram in self.profile.get("model_ngrams", [])]
+            X_new = np.array([self.session_vector(session, ngrams) for session in new_sessions], dtype=np.float64)
+            X_all = self.model_matrix(ngrams)
+            
+            if not update_engine(model, scaler, X_new, X_all):
+                print("🌲 Forest reached its size limit, retraining from scratch")
+                return self.train_model()
+                
+            self.model = model
+            self.scaler = scaler
+            dump_atomic(self.model, self.model_file)
+            dump_atomic(self.scaler, self.scaler_file)
+            scorer = export_engine(
+                self.model, self.scaler, self.scorer_file, self.calibration_settings()["threshold"],
+                self.feature_schema(ngrams), self.artifact_metadata(len(X_all))
+            )
+            self.model_stamp = MODEL_REGISTRY.put(self.scorer_file, None, scorer, scorer.scaler)
+            
+            self.update_profile(
+                model_updates=self.profile.get("model_updates", 0) + 1,
+                model_accuracy=self.evaluate_model(self.scaler.transform(X_all))
+            )
+            
+            elapsed = time.perf_counter() - started
+            print(f"🔁 Model updated with {len(X_new)} new session(s) in {elapsed * 1000:.0f} ms")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Model update failed: {e}")
             return False
+            
+    def load_model(self):
+        """Load trained model from the warm registry, reading the files only when they changed"""
+        try:
+            if not os.path.exists(self.scorer_file) and os.path.exists(self.model_file):
+                self.export_legacy_model()
+            stamp = MODEL_REGISTRY.stamp(self.scorer_file)
+            if stamp is not None and self.model_stamp is not None and stamp != self.model_stamp:
+                # Retrained elsewhere: pick up the matching n-gram columns first
+                self.load_profile()
+            # The artifact must expect exactly the columns authentication will build
+            ngrams = [tuple(ngram) for ngram in self.profile.get("model_ngrams", [])]
+            model, scaler, stamp = MODEL_REGISTRY.get(self.scorer_file, schema=self.feature_schema(ngrams))
+            if model is None:
+                return False
+            self.model_stamp = stamp
+            self.model = model
+            self.scaler = scaler
+            return True
         except Exception as e:
             print(f"❌ Failed to load model: {e}")
             return False
             
+    def export_legacy_model(self):
+        """Export a model trained before NumPy scoring existed, so it loads without sklearn"""
+        model = joblib.load(self.model_file)
+        scaler = joblib.load(self.scaler_file)
+        ngrams = [tuple(ngram) for ngram in self.profile.get("model_ngrams", [])]
+        export_engine(model, scaler, self.scorer_file, self.calibration_settings()["threshold"],
+                      self.feature_schema(ngrams), self.artifact_metadata(None))
+        print(f"📦 Exported typing model for {self.user_id} to {self.scorer_file}")
+        
     def evaluate_model(self, X_scaled):
         """Evaluate model performance"""
         try:
@@ -252,87 +674,140 @@ class KeystrokeStorage:
             
     def authenticate_typing(self, keystroke_data):
         """Authenticate user based on typing pattern"""
+        results = self.authenticate_typing_batch([keystroke_data])
+        if not results:
+            return False, 0.0
+        is_authentic, confidence_score = results[0]
+        
+        print(f"🔍 Authentication result: {'✅ AUTHENTIC' if is_authentic else '❌ SUSPICIOUS'}")
+        print(f"📊 Confidence score: {confidence_score:.3f}")
+        
+        return is_authentic, confidence_score
+        
+    def attempt_matrix(self, attempts, workers=1):
+        """Build the model feature matrix for typing sessions, extracted feature dicts or ready 2-D rows"""
+        if isinstance(attempts, np.ndarray):
+            return np.atleast_2d(attempts.astype(np.float64))
+            
+        # Sessions with raw keystrokes still need their features extracted, all in one batch
+        ngrams = [tuple(ngram) for ngram in self.profile.get("model_ngrams", [])]
+        sessions = [i for i, attempt in enumerate(attempts) if isinstance(attempt, dict) and "keystrokes" in attempt]
+        features = dict(zip(sessions, batch_extract_features([attempts[i]["keystrokes"] for i in sessions], workers)))
+        
+        rows = []
+        for i, attempt in enumerate(attempts):
+            if isinstance(attempt, dict):
+                rows.append(self.feature_vector(
+                    features.get(i, attempt),
+                    attempt.get("typing_speed", 0),
+                    attempt.get("accuracy", 0),
+                    attempt.get("duration", 0),
+                    ngrams
+                ))
+            else:
+                rows.append(attempt)
+        return np.array(rows, dtype=np.float64).reshape(len(rows), -1)
+        
+    def authenticate_typing_batch(self, attempts, workers=1):
+        """Authenticate many typing attempts with one scaler transform and one decision_function
+
+        Each attempt is a session dict with "keystrokes", a dict of already
+        extracted features (as from extract_features, plus typing_speed,
+        accuracy and duration), or a row in the model's feature layout; a
+        2-D array of rows is accepted as the whole batch.
+        """
         if not self.profile["is_trained"]:
             print("❌ No trained model available. Please complete training first.")
-            return False, 0.0
+            return [(False, 0.0)] * len(attempts)
             
         if not self.load_model():
             print("❌ Failed to load authentication model")
-            return False, 0.0
+            return [(False, 0.0)] * len(attempts)
+            
+        if len(attempts) == 0:
+            return []
             
         try:
-            # Extract features from current typing
-            features = self.extract_features(keystroke_data.get("keystrokes", []))
-            
-            # Create feature vector (same format as training)
-            vector = [
-                features.get("avg_dwell_time", 0),
-                features.get("std_dwell_time", 0),
-                features.get("avg_flight_time", 0),
-                features.get("std_flight_time", 0),
-                len(features.get("dwell_times", [])),
-                len(features.get("flight_times", [])),
-                keystroke_data.get("typing_speed", 0),
-                keystroke_data.get("accuracy", 0),
-                keystroke_data.get("duration", 0)
-            ]
-            
-            # Add common key pair timings
-            key_intervals = features.get("key_intervals", {})
-            common_pairs = ["th", "he", "er", "an", "in", "on", "at", "ed", "nd", "to"]
-            
-            for pair in common_pairs:
-                if pair in key_intervals:
-                    vector.append(np.mean(key_intervals[pair]))
-                else:
-                    vector.append(0)
-            
-            # Scale and predict
-            vector_scaled = self.scaler.transform([vector])
-            prediction = self.model.predict(vector_scaled)[0]
-            confidence = self.model.decision_function(vector_scaled)[0]
-            
-            # Convert to probability-like score
-            confidence_score = max(0, min(1, (confidence + 0.5) / 1.0))
-            
-            is_authentic = prediction == 1 and confidence_score > 0.3
-            
-            print(f"🔍 Authentication result: {'✅ AUTHENTIC' if is_authentic else '❌ SUSPICIOUS'}")
-            print(f"📊 Confidence score: {confidence_score:.3f}")
-            
-            return is_authentic, confidence_score
+            # Create feature matrix (same format as training)
+            matrix = self.attempt_matrix(attempts, workers)
+            
+            # Scale and score against the threshold stored with the model (0.0 until calibrated)
+            confidence = self.model.decision_function(self.scaler.transform(matrix))
+            threshold = getattr(self.model, "threshold", 0.0)
+            
+            # Confidence is 0.5 exactly at the threshold; it is not a probability
+            confidence_score = decision_confidence(confidence, threshold)
+            
+            is_authentic = confidence >= threshold
+            
+            results = [(bool(authentic), float(score)) for authentic, score in zip(is_authentic, confidence_score)]
+            if self.database is not None:
+                self.database.record_attempts(self.user_id, results, self.engine)
+            return results
             
         except Exception as e:
             print(f"❌ Authentication error: {e}")
-            return False, 0.0
+            return [(False, 0.0)] * len(attempts)
             
+    def replace_session_features(self, sessions, features):
+        """Store recomputed features for every session and rebuild the n-gram index"""
+        for session, session_features in zip(sessions, features):
+            session["features"] = session_features
+        self.session_log.rewrite(sessions)
+        
+        self.ngram_index = NGramTimingIndex()
+        for session in sessions:
+            self.ngram_index.merge(self.session_ngrams(session))
+        self.save_ngram_index()
+        
+    def reextract_features(self, workers=None):
+        """Recompute features for every stored session in parallel after a feature change"""
+        started = time.perf_counter()
+        sessions = self.load_all_sessions()
+        features = batch_extract_features([session.get("keystrokes", []) for session in sessions], workers)
+        self.replace_session_features(sessions, features)
+        
+        elapsed = time.perf_counter() - started
+        rate = len(sessions) / elapsed if elapsed > 0 else 0.0
+        print(f"♻️ Re-extracted {len(sessions)} sessions for {self.user_id} in {elapsed:.2f}s ({rate:.1f} sessions/sec)")
+        return {"sessions": len(sessions), "seconds": elapsed, "sessions_per_sec": rate}
+        
     def get_user_stats(self):
         """Get comprehensive user statistics"""
-        sessions = self.load_all_sessions()
+        summary = self.session_log.summary()
         
         stats = {
             "profile": self.profile,
-            "total_sessions": len(sessions),
+            "total_sessions": summary["sessions"],
             "model_status": "Trained" if self.profile["is_trained"] else "Not Trained",
+            "storage_backend": self.backend,
             "data_files": {
-                "profile_exists": os.path.exists(self.profile_file),
-                "keystrokes_exists": os.path.exists(self.keystroke_file),
-                "model_exists": os.path.exists(self.model_file)
+                "profile_exists": os.path.exists(self.profile_file) or self.database is not None,
+                "keystrokes_exists": self.session_log.exists,
+                "model_exists": os.path.exists(self.model_file),
+                "artifact_exists": os.path.exists(self.scorer_file)
             }
         }
         
-        if sessions:
-            typing_speeds = [s.get("typing_speed", 0) for s in sessions]
-            accuracies = [s.get("accuracy", 0) for s in sessions]
-            
+        if os.path.exists(self.scorer_file):
+            try:
+                header = read_header(self.scorer_file)
+                stats["model_artifact"] = {key: header.get(key) for key in ("format_version", "engine", "n_features", "threshold", "metadata")}
+            except ValueError as e:
+                stats["model_artifact"] = {"error": str(e)}
+        
+        if summary["sessions"]:
             stats["performance"] = {
-                "avg_typing_speed": np.mean(typing_speeds),
-                "best_typing_speed": max(typing_speeds),
-                "avg_accuracy": np.mean(accuracies),
-                "best_accuracy": max(accuracies),
-                "improvement_trend": "Improving" if len(typing_speeds) > 1 and typing_speeds[-1] > typing_speeds[0] else "Stable"
+                "avg_typing_speed": summary["avg_typing_speed"],
+                "best_typing_speed": summary["best_typing_speed"],
+                "avg_accuracy": summary["avg_accuracy"],
+                "best_accuracy": summary["best_accuracy"],
+                "improvement_trend": "Improving" if summary["sessions"] > 1 and summary["last_typing_speed"] > summary["first_typing_speed"] else "Stable"
             }
             
+        if self.database is not None:
+            stats["auth_attempts"] = self.database.attempt_summary(self.user_id)
+            
         return stats
         
     def export_data(self, export_path=None):
@@ -364,9 +839,11 @@ class KeystrokeStorage:
             self.profile = import_data["profile"]
             self.save_profile()
             
-            # Restore sessions
-            with open(self.keystroke_file, 'w') as f:
-                json.dump(import_data["sessions"], f, indent=2)
+            # Restore sessions, recomputing features with the current definition
+            self.replace_session_features(
+                import_data["sessions"],
+                batch_extract_features([session.get("keystrokes", []) for session in import_data["sessions"]])
+            )
                 
             print(f"📥 Data imported successfully from: {import_path}")
             return True
@@ -375,6 +852,80 @@ class KeystrokeStorage:
             print(f"❌ Import failed: {e}")
             return False
 
+class KeystrokeStorageCache:
+    """Bounded LRU of per-user KeystrokeStorage instances for multi-user servers
+
+    Opening a storage reads the profile and n-gram index from disk, so
+    instances are kept for the most recently active users. Their trained
+    models live in the shared MODEL_REGISTRY, which has its own limits.
+    """
+        
+    def __init__(self, max_users=32):
+        self.max_users = max_users
+        self._storages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    @staticmethod
+    def validate_user_id(user_id):
+        """Reject user ids that are not safe to use as a directory name"""
+        if not isinstance(user_id, str) or not USER_ID_PATTERN.match(user_id):
+            raise ValueError(f"Invalid user_id: {user_id!r}")
+        return user_id
+        
+    def get(self, user_id):
+        """Get the storage for a user, opening it on first use"""
+        self.validate_user_id(user_id)
+        with self._lock:
+            storage = self._storages.get(user_id)
+            if storage is not None:
+                self._storages.move_to_end(user_id)
+                self.hits += 1
+                return storage
+            self.misses += 1
+            storage = KeystrokeStorage(user_id)
+            self._storages[user_id] = storage
+            while len(self._storages) > self.max_users:
+                self._storages.popitem(last=False)
+                self.evictions += 1
+        return storage
+        
+    def preload(self, user_ids=None):
+        """Load models ahead of the first request; defaults to the most recently trained users"""
+        if user_ids is None:
+            user_ids = self.trained_user_ids()[:self.max_users]
+        loaded = 0
+        for user_id in user_ids:
+            if self.get(user_id).load_model():
+                loaded += 1
+        return loaded
+        
+    @staticmethod
+    def trained_user_ids(data_dir="keystroke_data"):
+        """User ids that have a trained model on disk, most recently trained first"""
+        if not os.path.isdir(data_dir):
+            return []
+        trained = []
+        for user_id in os.listdir(data_dir):
+            model_file = os.path.join(data_dir, user_id, "typing_model.pkl")
+            if USER_ID_PATTERN.match(user_id) and os.path.exists(model_file):
+                trained.append((os.path.getmtime(model_file), user_id))
+        return [user_id for _, user_id in sorted(trained, reverse=True)]
+        
+    def get_stats(self):
+        """Get storage and model cache counters"""
+        return {
+            "users": len(self._storages),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "models": MODEL_REGISTRY.get_stats()
+        }
+
+
 def main():
     """Test the keystroke storage system"""
     print("🔒 KEYSTROKE STORAGE SYSTEM TEST")
@@ -383,6 +934,10 @@ def main():
     # Create storage instance
     storage = KeystrokeStorage("test_user")
     
+    # Sessions come from one seeded synthetic typist
+    population = TypingPopulation()
+    typist = population.profile(0)
+    
     # Show current stats
     stats = storage.get_user_stats()
     print(f"👤 User: {stats['profile']['user_id']}")
@@ -395,18 +950,7 @@ def main():
         print("\n🎯 Adding sample training sessions...")
         
         for i in range(3):
-            sample_session = {
-                "text": f"This is training session number {i+1}",
-                "keystrokes": [
-                    {"key": "t", "type": "down", "timestamp": 1000 + i*100},
-                    {"key": "t", "type": "up", "timestamp": 1050 + i*100},
-                    {"key": "h", "type": "down", "timestamp": 1100 + i*100},
-                    {"key": "h", "type": "up", "timestamp": 1150 + i*100},
-                ],
-                "typing_speed": 45 + i*5,
-                "accuracy": 0.95 + i*0.01,
-                "duration": 30 + i*2
-            }
+            sample_session = population.session(typist, i).payload()
             
             session_id = storage.save_keystroke_session(sample_session)
             print(f"  ✅ Session {session_id} saved")
@@ -424,17 +968,7 @@ def main():
     if storage.profile["is_trained"]:
         print("\n🔍 Testing authentication...")
         
-        test_data = {
-            "keystrokes": [
-                {"key": "t", "type": "down", "timestamp": 2000},
-                {"key": "t", "type": "up", "timestamp": 2050},
-                {"key": "e", "type": "down", "timestamp": 2100},
-                {"key": "e", "type": "up", "timestamp": 2150},
-            ],
-            "typing_speed": 47,
-            "accuracy": 0.96,
-            "duration": 32
-        }
+        test_data = population.session(typist, 100).payload()
         
         is_authentic, confidence = storage.authenticate_typing(test_data)
         print(f"Result: {'✅ Authentic' if is_authentic else '❌ Suspicious'} (confidence: {confidence:.3f})")
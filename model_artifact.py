@@ -0,0 +1,105 @@
+"""
+Typing Model Artifact
+One versioned file holding a scorer's arrays, scaler statistics, feature schema, threshold and training metadata
+"""
+
+import json
+import os
+import struct
+import numpy as np
+from atomic_files import atomic_tmp_path
+
+ARTIFACT_MAGIC = b"KSMODEL\0"
+ARTIFACT_FORMAT_VERSION = 1
+# Array data starts on cache-line boundaries so mapped views are aligned for any dtype
+ARTIFACT_ALIGNMENT = 64
+# Windows cannot replace a file while it is mapped, so retraining there would fail
+MMAP_BY_DEFAULT = os.name != "nt"
+
+_PREFIX = struct.Struct("<8sQ")
+
+
+class SchemaMismatchError(ValueError):
+    """The artifact was trained on a different feature layout than the caller builds"""
+
+
+def _aligned(offset):
+    return -(-offset // ARTIFACT_ALIGNMENT) * ARTIFACT_ALIGNMENT
+
+
+def write_artifact(path, arrays, header):
+    """Atomically write arrays plus a JSON header (engine, schema, threshold, params, metadata)
+
+    Layout: magic, header length, JSON header, then every array's raw
+    C-order bytes. Array offsets in the header count from the first
+    aligned byte after the header.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    header = dict(header, format_version=ARTIFACT_FORMAT_VERSION, arrays=layout)
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    data_start = _aligned(_PREFIX.size + len(header_bytes))
+
+    tmp_path = atomic_tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(ARTIFACT_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        # Pad to the end of the last slot so empty trailing arrays still lie inside the file
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    """Read only the JSON header; raises ValueError for foreign files or unknown versions"""
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"{path} is not a typing model artifact")
+        magic, header_length = _PREFIX.unpack(prefix)
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError(f"{path} is not a typing model artifact")
+        header = json.loads(f.read(header_length).decode("utf-8"))
+    header["data_start"] = _aligned(_PREFIX.size + header_length)
+    version = header.get("format_version")
+    if version != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version {version} in {path}")
+    return header
+
+
+def check_schema(header, schema, path=""):
+    """Raise SchemaMismatchError unless the artifact's feature schema equals `schema`"""
+    if schema is not None and header.get("schema") != schema:
+        raise SchemaMismatchError(f"Model {path} expects feature schema {header.get('schema')}, got {schema}")
+
+
+def load_artifact(path, schema=None, mmap=MMAP_BY_DEFAULT):
+    """Return (header, {name: read-only array}); the schema is checked before any array is touched
+
+    With mmap the arrays are views of one read-only mapping of the file, so
+    loading costs a header parse and processes scoring the same model share
+    its pages.
+    """
+    header = read_header(path)
+    check_schema(header, schema, path)
+
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=header["data_start"] + entry["offset"]).reshape(entry["shape"])
+        array.flags.writeable = False
+        arrays[name] = array
+    return header, arrays
@@ -0,0 +1,137 @@
+"""
+Warm Typing Model Registry
+Keeps each user's trained model and scaler loaded in memory between requests
+"""
+
+import os
+import threading
+from collections import OrderedDict
+import joblib
+from model_artifact import check_schema
+from scoring_engines import load_engine
+
+
+class ModelRegistry:
+    """Process-wide LRU of (model, scaler) pairs keyed by model file path
+
+    Each lookup costs two os.stat calls: the cached pair is returned as long
+    as the size and mtime of both artifact files are unchanged, and reloaded
+    from disk only after train_model (or anything else) rewrites them. The
+    least recently used models are evicted once either the model count or
+    the total artifact size (a cheap stand-in for memory use) is exceeded.
+    """
+
+    def __init__(self, max_models=16, max_bytes=256 * 1024 * 1024):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # model_file -> (stamp, model, scaler)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_models=None, max_bytes=None):
+        """Change the cache limits, evicting immediately if they shrank"""
+        with self._lock:
+            if max_models is not None:
+                self.max_models = max_models
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    @staticmethod
+    def stamp(model_file, scaler_file=None):
+        """Size and mtime of the artifact files, or None if one is missing"""
+        try:
+            model_stat = os.stat(model_file)
+            if scaler_file is None:
+                return (model_stat.st_size, model_stat.st_mtime_ns, 0, 0)
+            scaler_stat = os.stat(scaler_file)
+        except OSError:
+            return None
+        return (model_stat.st_size, model_stat.st_mtime_ns, scaler_stat.st_size, scaler_stat.st_mtime_ns)
+
+    @staticmethod
+    def _size(stamp):
+        return stamp[0] + stamp[2]
+
+    def get(self, model_file, scaler_file=None, schema=None):
+        """Get (model, scaler, stamp), loading from disk only if the files changed
+
+        An exported model artifact carries its own scaler, so scaler_file is
+        only needed for pickled sklearn models. With a schema, an artifact
+        trained on a different feature layout raises SchemaMismatchError,
+        whether it was cached or not.
+        """
+        stamp = self.stamp(model_file, scaler_file)
+        if stamp is None:
+            return None, None, None
+
+        with self._lock:
+            entry = self._entries.get(model_file)
+            if entry is not None and entry[0] == stamp:
+                if scaler_file is None:
+                    check_schema({"schema": entry[1].schema}, schema, model_file)
+                self._entries.move_to_end(model_file)
+                self.hits += 1
+                return entry[1], entry[2], stamp
+            self.misses += 1
+            if scaler_file is None:
+                model = load_engine(model_file, schema)
+                scaler = model.scaler
+            else:
+                model = joblib.load(model_file)
+                scaler = joblib.load(scaler_file)
+            self._store(model_file, stamp, model, scaler)
+        return model, scaler, stamp
+
+    def put(self, model_file, scaler_file, model, scaler):
+        """Register freshly written artifacts so the next lookup needs no reload"""
+        stamp = self.stamp(model_file, scaler_file)
+        if stamp is None:
+            return None
+        with self._lock:
+            self._store(model_file, stamp, model, scaler)
+        return stamp
+
+    def _store(self, model_file, stamp, model, scaler):
+        old = self._entries.pop(model_file, None)
+        if old is not None:
+            self.total_bytes -= self._size(old[0])
+        self._entries[model_file] = (stamp, model, scaler)
+        self.total_bytes += self._size(stamp)
+        self._evict()
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (len(self._entries) > self.max_models or self.total_bytes > self.max_bytes):
+            _, (stamp, _, _) = self._entries.popitem(last=False)
+            self.total_bytes -= self._size(stamp)
+            self.evictions += 1
+
+    def invalidate(self, model_file=None):
+        """Drop one cached model, or all of them"""
+        with self._lock:
+            if model_file is None:
+                self._entries.clear()
+                self.total_bytes = 0
+            else:
+                old = self._entries.pop(model_file, None)
+                if old is not None:
+                    self.total_bytes -= self._size(old[0])
+
+    def get_stats(self):
+        """Get cache size, limits and hit/miss/eviction counters"""
+        return {
+            "models": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_models": self.max_models,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,146 @@
+"""
+N-gram Keystroke Timing Index
+Running digraph/trigraph latency statistics keyed by interned key codes
+"""
+
+import numpy as np
+from keystroke_events import KeystrokeEventBuffer, KEY_CODES, KEY_DOWN
+
+CODE_BITS = 16
+CODE_MASK = (1 << CODE_BITS) - 1
+
+
+class NGramTimingIndex:
+    """Count, mean and variance of press-to-press latency for every n-gram seen
+
+    An n-gram is n consecutive key presses; its latency is the time from the
+    first press to the last. Entries are keyed by tuples of key codes from
+    the shared KeyCodeTable and merged with Chan's parallel update, so
+    sessions can be folded in one at a time without keeping raw keystrokes.
+    """
+
+    def __init__(self, orders=(2, 3), key_table=None):
+        self.orders = tuple(orders)
+        self.key_table = key_table or KEY_CODES
+        self.stats = {}  # (code, code[, code]) -> [count, mean, m2]
+
+    def __len__(self):
+        return len(self.stats)
+
+    def add_keystrokes(self, keystrokes):
+        """Fold a list of stored {'key', 'type', 'timestamp'} events into the index"""
+        return self.add_buffer(KeystrokeEventBuffer.from_keystrokes(keystrokes, self.key_table))
+
+    def add_buffer(self, buffer):
+        """Fold every n-gram of a KeystrokeEventBuffer into the index"""
+        presses = buffer.event_types == KEY_DOWN
+        codes = buffer.key_codes[presses].astype(np.int64)
+        timestamps = buffer.timestamps[presses]
+
+        for n in self.orders:
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            latency = timestamps[n - 1:] - timestamps[:count]
+            packed = np.zeros(count, dtype=np.int64)
+            for j in range(n):
+                packed = (packed << CODE_BITS) | codes[j:j + count]
+
+            packed_keys, inverse = np.unique(packed, return_inverse=True)
+            counts = np.bincount(inverse)
+            means = np.bincount(inverse, weights=latency) / counts
+            m2 = np.bincount(inverse, weights=(latency - means[inverse]) ** 2)
+
+            for value, c, mean, sq in zip(packed_keys.tolist(), counts.tolist(), means.tolist(), m2.tolist()):
+                self._merge(self._unpack(value, n), c, mean, sq)
+        return self
+
+    @staticmethod
+    def _unpack(value, n):
+        codes = []
+        for _ in range(n):
+            codes.append(value & CODE_MASK)
+            value >>= CODE_BITS
+        return tuple(reversed(codes))
+
+    def _merge(self, key, count, mean, m2):
+        entry = self.stats.get(key)
+        if entry is None:
+            self.stats[key] = [count, mean, m2]
+            return
+        total = entry[0] + count
+        delta = mean - entry[1]
+        entry[1] += delta * count / total
+        entry[2] += m2 + delta * delta * entry[0] * count / total
+        entry[0] = total
+
+    def merge(self, other):
+        """Fold another index (e.g. one session's) into this one"""
+        for key, (count, mean, m2) in other.stats.items():
+            if other.key_table is not self.key_table:
+                key = self.codes(other.names(key))
+            self._merge(key, count, mean, m2)
+        return self
+
+    def names(self, key):
+        """Key-name tuple for a key-code tuple"""
+        return tuple(self.key_table.names[code] for code in key)
+
+    def codes(self, names):
+        """Key-code tuple for a key-name tuple"""
+        return tuple(self.key_table.code(name) for name in names)
+
+    def get(self, names):
+        """Get {count, mean, variance} for a key-name tuple, or None if unseen"""
+        entry = self.stats.get(self.codes(names))
+        if entry is None:
+            return None
+        count, mean, m2 = entry
+        return {"count": count, "mean": mean, "variance": m2 / count}
+
+    def top_k(self, k, order=None):
+        """Most frequent n-grams as key-name tuples (ties broken by name for stability)"""
+        candidates = [
+            (-entry[0], self.names(key))
+            for key, entry in self.stats.items()
+            if order is None or len(key) == order
+        ]
+        candidates.sort()
+        return [names for _, names in candidates[:k]]
+
+    def vector(self, ngrams):
+        """Mean latency for each key-name tuple, 0 where an n-gram was never seen"""
+        vector = np.zeros(len(ngrams), dtype=np.float64)
+        for i, names in enumerate(ngrams):
+            entry = self.stats.get(self.codes(names))
+            if entry is not None:
+                vector[i] = entry[1]
+        return vector
+
+    def top_k_vector(self, k, order=None):
+        """Fixed-width vector of mean latencies for the user's k most frequent n-grams"""
+        ngrams = self.top_k(k, order)
+        vector = np.zeros(k, dtype=np.float64)
+        vector[:len(ngrams)] = self.vector(ngrams)
+        return vector
+
+    def to_records(self):
+        """Serializable [names, count, mean, m2] rows"""
+        return [[list(self.names(key)), count, mean, m2] for key, (count, mean, m2) in self.stats.items()]
+
+    @classmethod
+    def from_records(cls, records, orders=(2, 3), key_table=None):
+        """Rebuild an index from to_records() rows"""
+        index = cls(orders, key_table)
+        for names, count, mean, m2 in records:
+            index._merge(index.codes(names), count, mean, m2)
+        return index
+
+    def to_dict(self):
+        """JSON-serializable form of the whole index"""
+        return {"orders": list(self.orders), "ngrams": self.to_records()}
+
+    @classmethod
+    def from_dict(cls, data, key_table=None):
+        """Rebuild an index from to_dict() output"""
+        return cls.from_records(data.get("ngrams", []), data.get("orders", (2, 3)), key_table)
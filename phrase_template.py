@@ -0,0 +1,168 @@
+"""
+Fixed-Phrase Timing Template
+Per-character-position hold and latency template for authenticating one enrolled phrase
+"""
+
+import contextlib
+import time
+import numpy as np
+from keystroke_events import KeystrokeEventBuffer, KEY_DOWN, KEY_UP
+
+# Mean per-position deviation, in units of the enrolled spread, above which an attempt is rejected
+DEFAULT_THRESHOLD = 1.5
+# Spread floors: one enrollment sample has no spread of its own
+MIN_RELATIVE_SPREAD = 0.15
+MIN_SPREAD = 0.01
+
+# Names the different keyboard hooks use for the same keys
+KEY_ALIASES = {'space': ' ', 'Key.space': ' '}
+BACKSPACE_KEYS = {'backspace', 'BackSpace', 'Key.backspace', '\x08'}
+
+
+def phrase_timings(events, phrase=None):
+    """Typed text and per-position timing vector of one typing of a phrase
+
+    events is a KeystrokeEventBuffer or a list of stored {'key', 'type',
+    'timestamp'} dicts. Presses of printable single characters become
+    phrase positions; backspace removes the last one and other keys are
+    ignored. The vector interleaves hold and press-to-press latency,
+    [hold0, latency0-1, hold1, latency1-2, ..., hold(m-1)], so the first k
+    characters are always the first 2k-1 entries. A hold is NaN when its
+    release was not captured. With a phrase, characters beyond it are
+    dropped.
+    """
+    if not isinstance(events, KeystrokeEventBuffer):
+        events = KeystrokeEventBuffer.from_keystrokes(events)
+    names = events.key_table.names
+
+    chars, presses, holds = [], [], []
+    pending = {}  # key code -> position of its unreleased press
+    for timestamp, code, event_type in zip(events.timestamps.tolist(), events.key_codes.tolist(), events.event_types.tolist()):
+        name = names[code]
+        name = KEY_ALIASES.get(name, name)
+        if event_type == KEY_DOWN:
+            if name in BACKSPACE_KEYS:
+                if chars:
+                    chars.pop()
+                    presses.pop()
+                    holds.pop()
+                continue
+            if len(name) != 1 or not name.isprintable():
+                continue
+            pending[code] = len(chars)
+            chars.append(name)
+            presses.append(timestamp)
+            holds.append(np.nan)
+        elif event_type == KEY_UP:
+            position = pending.pop(code, None)
+            if position is not None and position < len(chars) and presses[position] <= timestamp:
+                holds[position] = timestamp - presses[position]
+
+    if phrase is not None:
+        del chars[len(phrase):], presses[len(phrase):], holds[len(phrase):]
+
+    vector = np.empty(max(2 * len(chars) - 1, 0), dtype=np.float64)
+    vector[0::2] = holds
+    vector[1::2] = np.diff(presses)
+    return ''.join(chars), vector
+
+
+def timing_list(vector):
+    """JSON-safe list of a timing vector (NaN becomes None)"""
+    return [None if np.isnan(value) else value for value in np.asarray(vector, dtype=np.float64).tolist()]
+
+
+@contextlib.contextmanager
+def record_key_events():
+    """Record presses and releases from a global pynput hook while the block runs
+
+    Lets console prompts that read a whole line with input() still collect
+    per-key timing. Yields a KeystrokeEventBuffer that stays empty when
+    pynput (or a display for it) is unavailable.
+    """
+    events = KeystrokeEventBuffer()
+    listener = None
+    try:
+        from pynput import keyboard
+        from keystroke_pipeline import key_name
+
+        listener = keyboard.Listener(
+            on_press=lambda key: events.append(time.time(), key_name(key), KEY_DOWN),
+            on_release=lambda key: events.append(time.time(), key_name(key), KEY_UP)
+        )
+        listener.start()
+    except Exception as e:
+        print(f"⚠️ Per-key timing unavailable ({e}), using whole-phrase timing only")
+        listener = None
+    try:
+        yield events
+    finally:
+        if listener is not None:
+            listener.stop()
+            listener.join()
+
+
+class PhraseTemplate:
+    """Enrolled per-position timing means and spreads for one fixed phrase
+
+    Scoring is one vectorized scaled-Manhattan distance: the mean over
+    positions of |x - mean| / spread. Because positions are interleaved in
+    typing order, a partially typed phrase is scored against the matching
+    prefix of the template with the same computation.
+    """
+
+    def __init__(self, phrase, mean, spread, n_samples=0, threshold=DEFAULT_THRESHOLD):
+        self.phrase = phrase
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.spread_ = np.asarray(spread, dtype=np.float64)
+        self.n_samples = n_samples
+        self.threshold = threshold
+
+    @classmethod
+    def fit(cls, phrase, vectors, threshold=DEFAULT_THRESHOLD):
+        """Build a template from enrollment timing vectors (lists with None/NaN for missing holds)"""
+        length = 2 * len(phrase) - 1
+        vectors = [np.asarray(vector, dtype=np.float64) for vector in vectors]
+        vectors = [vector for vector in vectors if len(vector) == length]
+        if not vectors:
+            raise ValueError(f"No complete timing samples for phrase '{phrase}'")
+
+        X = np.vstack(vectors)
+        seen = ~np.isnan(X)
+        counts = seen.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(seen, X, 0.0).sum(axis=0) / counts
+            deviation = np.where(seen, np.abs(X - mean), 0.0).sum(axis=0) / counts
+        # Positions never timed (e.g. holds from a press-only hook) stay NaN and are skipped when scoring
+        spread = np.maximum(deviation, np.maximum(np.abs(mean) * MIN_RELATIVE_SPREAD, MIN_SPREAD))
+        return cls(phrase, mean, spread, len(vectors), threshold)
+
+    def score(self, vector):
+        """Mean scaled deviation of a full or partial timing vector; NaN if nothing comparable was timed"""
+        vector = np.asarray(vector, dtype=np.float64)[:len(self.mean_)]
+        deviation = np.abs(vector - self.mean_[:len(vector)]) / self.spread_[:len(vector)]
+        valid = ~np.isnan(deviation)
+        return float(deviation[valid].mean()) if valid.any() else float('nan')
+
+    def verify(self, typed_text, vector):
+        """(accepted, score) for a finished attempt; the text must match and every position be typed"""
+        if typed_text.lower() != self.phrase.lower() or len(vector) != len(self.mean_):
+            return False, float('nan')
+        score = self.score(vector)
+        return bool(score <= self.threshold), score
+
+    def to_dict(self):
+        """JSON-safe form stored with a user's keystroke patterns"""
+        return {
+            'phrase': self.phrase,
+            'mean': timing_list(self.mean_),
+            'spread': timing_list(self.spread_),
+            'n_samples': self.n_samples,
+            'threshold': self.threshold
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a template saved with to_dict()"""
+        return cls(data['phrase'], np.array(data['mean'], dtype=np.float64), np.array(data['spread'], dtype=np.float64),
+                   data.get('n_samples', 0), data.get('threshold', DEFAULT_THRESHOLD))
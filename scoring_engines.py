@@ -0,0 +1,288 @@
+"""
+Typing Pattern Scoring Engines
+Selectable anomaly detectors behind the TypingPatternModel decision_function contract
+"""
+
+import json
+import os
+import numpy as np
+from forest_scorer import export_forest, NumpyForestScorer, NumpyStandardScaler
+from model_artifact import check_schema, load_artifact, read_header, write_artifact
+
+ENGINES = ("isolation_forest", "scaled_manhattan", "mahalanobis")
+DEFAULT_ENGINE = "isolation_forest"
+# Folds for the held-out distances that place a DistanceDetector threshold (leave-one-out below this many samples)
+THRESHOLD_FOLDS = 10
+
+
+def configured_engine(config_file="security_config.json"):
+    """Engine named by 'typing_engine' in the security config, or the default"""
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                engine = json.load(f).get('typing_engine', DEFAULT_ENGINE)
+            if engine in ENGINES:
+                return engine
+            print(f"⚠️ Unknown typing_engine '{engine}', using {DEFAULT_ENGINE}")
+    except Exception as e:
+        print(f"⚠️ Could not read typing_engine from {config_file}: {e}")
+    return DEFAULT_ENGINE
+
+
+def create_engine(name, contamination=0.1, n_estimators=100):
+    """Create an unfitted detector with fit/decision_function/predict"""
+    if name == "isolation_forest":
+        # sklearn is only imported when an IsolationForest is actually trained
+        from sklearn.ensemble import IsolationForest
+        return IsolationForest(contamination=contamination, random_state=42, n_estimators=n_estimators)
+    if name in ("scaled_manhattan", "mahalanobis"):
+        return DistanceDetector(name, contamination)
+    raise ValueError(f"Unknown scoring engine: {name}")
+
+
+def export_engine(model, scaler, path, threshold=0.0, schema=None, metadata=None):
+    """Write a fitted detector, its scaler, feature schema, threshold and metadata to one artifact; return the loaded scorer"""
+    if isinstance(model, DistanceDetector):
+        model.save(path, scaler, threshold, schema, metadata)
+        return DistanceDetector.load(path)
+    return export_forest(model, scaler, path, threshold, schema, metadata)
+
+
+def load_engine(path, schema=None):
+    """Load an exported detector of any engine; its scaler is available as .scaler
+
+    Only the header is read before a SchemaMismatchError is raised for a
+    model trained on a different feature layout than `schema`.
+    """
+    header = read_header(path)
+    check_schema(header, schema, path)
+    if header.get("engine") == "isolation_forest":
+        return NumpyForestScorer.load(path)
+    return DistanceDetector.load(path)
+
+
+def decision_confidence(scores, threshold=0.0):
+    """Map decision scores to a 0-1 confidence that is 0.5 exactly at the acceptance threshold"""
+    return np.clip(np.asarray(scores, dtype=np.float64) - threshold + 0.5, 0, 1)
+
+
+def update_engine(model, scaler, X_new, X_all, trees_per_update=10, max_estimators=200, window=20):
+    """Fold new raw samples into a fitted engine and its StandardScaler, in place
+
+    The scaler is updated with partial_fit and the existing model is mapped
+    onto the new scaling (split thresholds and template statistics are
+    per-feature, so this is an affine change of coordinates). A forest
+    then grows `trees_per_update` trees on the last `window` rows of X_all
+    (or the last max_samples_ rows, if more) via warm_start, keeping the
+    forest's max_samples_; a distance template updates its statistics in O(d).
+    The decision threshold is re-placed over X_all (every enrollment row,
+    new ones included). Returns False, leaving the model untouched, when
+    the forest has reached max_estimators and should be refit from scratch.
+    """
+    X_new = np.atleast_2d(np.asarray(X_new, dtype=np.float64))
+    X_all = np.atleast_2d(np.asarray(X_all, dtype=np.float64))
+    forest = not isinstance(model, DistanceDetector)
+    if forest and len(model.estimators_) + trees_per_update > max_estimators:
+        return False
+
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(X_new)
+    # A value v in the old scaled space is ratio * v + shift in the new one
+    ratio = old_scale / scaler.scale_
+    shift = (old_mean - scaler.mean_) / scaler.scale_
+
+    if not forest:
+        model.rescale(ratio, shift)
+        model.partial_fit(scaler.transform(X_new))
+        model.place_threshold(scaler.transform(X_all))
+        return True
+
+    for estimator, features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        split = tree.children_left != -1
+        split_features = np.asarray(features)[tree.feature[split]]
+        tree.threshold[split] = tree.threshold[split] * ratio[split_features] + shift[split_features]
+
+    # Scores divide by c(max_samples_) across the whole forest, so the new
+    # trees must subsample as many rows as the original ones did
+    max_samples = model.max_samples_
+    model.warm_start = True
+    model.max_samples = max_samples
+    model.n_estimators = len(model.estimators_) + trees_per_update
+    model.fit(scaler.transform(X_all[-max(window, max_samples):]))
+    if model.contamination != "auto":
+        model.offset_ = np.percentile(model.score_samples(scaler.transform(X_all)), 100.0 * model.contamination)
+    return True
+
+
+def equal_error_rate(genuine_scores, impostor_scores):
+    """Equal error rate and its threshold, for scores where higher means more genuine"""
+    genuine = np.sort(np.asarray(genuine_scores, dtype=np.float64))
+    impostor = np.sort(np.asarray(impostor_scores, dtype=np.float64))
+    if not len(genuine) or not len(impostor):
+        return float('nan'), float('nan')
+    thresholds = np.unique(np.concatenate([genuine, impostor]))
+    # Accept when score >= threshold
+    frr = np.searchsorted(genuine, thresholds, side='left') / len(genuine)
+    far = 1.0 - np.searchsorted(impostor, thresholds, side='left') / len(impostor)
+    best = np.argmin(np.abs(far - frr))
+    return float((far[best] + frr[best]) / 2), float(thresholds[best])
+
+
+class DistanceDetector:
+    """Template detector: distance of a sample from the enrolled per-feature mean
+
+    scaled_manhattan divides each feature's absolute deviation by its mean
+    absolute deviation in enrollment (Killourhy & Maxion); mahalanobis uses
+    a ridge-regularised covariance so it stays usable with only a handful of
+    sessions. The decision threshold is placed so that `contamination` of
+    the enrollment samples fall outside it, measuring each sample against a
+    template fitted without it: in-sample distances shrink with few
+    sessions and would reject most genuine attempts.
+    """
+
+    def __init__(self, metric="scaled_manhattan", contamination=0.1, ridge=0.1):
+        if metric not in ("scaled_manhattan", "mahalanobis"):
+            raise ValueError(f"Unknown distance metric: {metric}")
+        self.metric = metric
+        self.contamination = contamination
+        self.ridge = ridge
+        self.n_samples_ = 0
+        self.mean_ = None
+        self.spread_ = None
+        self.covariance_ = None
+        self.precision_ = None
+        self.offset_ = 1.0
+        self.threshold = 0.0
+        self.schema = None
+        self.metadata = {}
+        self.scaler = None
+
+    def fit(self, X):
+        """Learn the enrollment template from an n_samples x n_features matrix"""
+        X = np.asarray(X, dtype=np.float64)
+        return self._fit_template(X).place_threshold(X)
+
+    def _fit_template(self, X):
+        self.n_samples_ = len(X)
+        self.mean_ = X.mean(axis=0)
+        if self.metric == "scaled_manhattan":
+            self.spread_ = np.abs(X - self.mean_).mean(axis=0)
+        else:
+            diff = X - self.mean_
+            self.covariance_ = diff.T @ diff / len(X)
+            self._update_precision()
+        return self
+
+    def partial_fit(self, X):
+        """Add enrollment samples; O(d) per sample for scaled_manhattan, O(d²) for mahalanobis"""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        n, k = self.n_samples_, len(X)
+        total = n + k
+        batch_mean = X.mean(axis=0)
+        delta = batch_mean - self.mean_
+        mean = self.mean_ + delta * k / total
+        if self.metric == "scaled_manhattan":
+            # Running mean absolute deviation, measured against the updated mean
+            self.spread_ = (self.spread_ * n + np.abs(X - mean).sum(axis=0)) / total
+        else:
+            # Chan's parallel update of the co-moment matrix
+            batch_diff = X - batch_mean
+            comoment = self.covariance_ * n + batch_diff.T @ batch_diff + np.outer(delta, delta) * n * k / total
+            self.covariance_ = comoment / total
+            self._update_precision()
+        self.mean_ = mean
+        self.n_samples_ = total
+        return self
+
+    def rescale(self, ratio, shift):
+        """Follow a per-feature affine change of the input space (x -> ratio * x + shift)"""
+        self.mean_ = self.mean_ * ratio + shift
+        if self.metric == "scaled_manhattan":
+            self.spread_ = self.spread_ * np.abs(ratio)
+        else:
+            self.covariance_ = self.covariance_ * np.outer(ratio, ratio)
+            self._update_precision()
+
+    def place_threshold(self, X):
+        """Put the decision threshold where `contamination` of X falls outside it, by held-out distances"""
+        offset = float(np.percentile(self.held_out_distances(X), 100.0 * (1 - self.contamination)))
+        self.offset_ = offset if offset > 0 else 1.0
+        return self
+
+    def held_out_distances(self, X, folds=THRESHOLD_FOLDS):
+        """Distance of every row of X from a template fitted on the other folds of X"""
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) < 2:
+            return self.distance(X)
+        distances = np.empty(len(X))
+        for held in np.array_split(np.arange(len(X)), min(len(X), folds)):
+            keep = np.ones(len(X), dtype=bool)
+            keep[held] = False
+            template = DistanceDetector(self.metric, self.contamination, self.ridge)._fit_template(X[keep])
+            distances[held] = template.distance(X[held])
+        return distances
+
+    def _update_precision(self):
+        self.precision_ = np.linalg.pinv(self.covariance_ + self.ridge * np.eye(len(self.covariance_)))
+
+    def distance(self, X):
+        """Distance of every row from the template"""
+        diff = np.asarray(X, dtype=np.float64) - self.mean_
+        if self.metric == "scaled_manhattan":
+            # Features that never varied in enrollment count deviations in raw units
+            return (np.abs(diff) / np.where(self.spread_ > 0, self.spread_, 1.0)).sum(axis=1)
+        return np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', diff, self.precision_, diff), 0.0))
+
+    def decision_function(self, X):
+        """0.5 at the template, 0 at the threshold, negative beyond it"""
+        return 0.5 * (1.0 - self.distance(X) / self.offset_)
+
+    def predict(self, X):
+        """1 for inliers, -1 for outliers"""
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def save(self, path, scaler, threshold=0.0, schema=None, metadata=None):
+        """Write the template, scaler, feature schema, threshold and metadata to one model artifact"""
+        arrays = {
+            "mean": self.mean_,
+            "scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+            "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64)
+        }
+        if self.metric == "scaled_manhattan":
+            arrays["spread"] = self.spread_
+        else:
+            arrays["covariance"] = self.covariance_
+            arrays["precision"] = self.precision_
+        header = {
+            "engine": self.metric,
+            "schema": schema,
+            "n_features": len(self.mean_),
+            "threshold": float(threshold),
+            "params": {
+                "offset": float(self.offset_),
+                "contamination": float(self.contamination),
+                "ridge": float(self.ridge),
+                "n_samples": int(self.n_samples_)
+            },
+            "metadata": metadata or {}
+        }
+        write_artifact(path, arrays, header)
+
+    @classmethod
+    def load(cls, path, schema=None):
+        """Load a template written by save(), mapping its arrays read-only"""
+        header, arrays = load_artifact(path, schema)
+        params = header["params"]
+        detector = cls(header["engine"], params["contamination"], params["ridge"])
+        detector.n_samples_ = params["n_samples"]
+        detector.mean_ = arrays["mean"]
+        detector.covariance_ = arrays.get("covariance")
+        detector.offset_ = params["offset"]
+        detector.threshold = float(header.get("threshold", 0.0))
+        detector.schema = header.get("schema")
+        detector.metadata = header.get("metadata", {})
+        detector.spread_ = arrays.get("spread")
+        detector.precision_ = arrays.get("precision")
+        detector.scaler = NumpyStandardScaler(arrays["scaler_mean"], arrays["scaler_scale"])
+        return detector
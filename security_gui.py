@@ -17,6 +17,7 @@ class SecuritySystemGUI:
         # Initialize security system
         self.security_system = SecuritySystem()
         self.is_running = False
+        self.stop_event = threading.Event()  # Set by stop_security to wake the security loop
         self.auth_thread = None
         
         # Style configuration
@@ -260,6 +261,7 @@ class SecuritySystemGUI:
             return
             
         self.is_running = True
+        self.stop_event.clear()
         self.start_btn.config(state='disabled')
         self.stop_btn.config(state='normal')
         
@@ -283,13 +285,25 @@ class SecuritySystemGUI:
                             self.security_system.is_locked = False
                         else:
                             self.log("❌ Authentication failed!")
+                    elif self.security_system.continuous_auth.get('enabled', True):
+                        self.log("System is unlocked. Typing pattern is monitored continuously...")
+                        authenticator = self.security_system.start_continuous_authentication()
+                        session = self.security_system.keystroke_collector.session
+                        if not self.is_running:
+                            session.cancel()
+                        # Ends on a lock, ESC or stop_security
+                        session.result()
+                        self.security_system.stop_continuous_authentication()
+                        self.security_system.is_locked = True
+                        if authenticator.locked.is_set():
+                            self.log(f"🔒 Typing pattern mismatch (score {authenticator.smoothed_score:.3f}) - system locked again.")
                     else:
                         self.log("System is unlocked. Press any key to lock again...")
-                        time.sleep(5)  # Simulate system usage
+                        self.stop_event.wait(5)  # Simulate system usage
                         self.security_system.is_locked = True
                         self.log("System locked again.")
                         
-                    time.sleep(1)
+                    self.stop_event.wait(1)
                     
                 except Exception as e:
                     self.log(f"Error in security loop: {e}")
@@ -300,6 +314,11 @@ class SecuritySystemGUI:
     def stop_security(self):
         """Stop the security system"""
         self.is_running = False
+        self.stop_event.set()
+        # Release a pending authentication or monitoring session immediately
+        session = self.security_system.keystroke_collector.session
+        if session is not None:
+            session.cancel()
         self.security_system.stop_alarm()
         
         self.start_btn.config(state='normal')
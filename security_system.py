@@ -8,6 +8,9 @@ from typing_model import TypingPatternModel
 from notification_system import NotificationSystem
 from instant_mobile_alerts import InstantMobileAlerts
 from emergency_call_system import EmergencyCallSystem
+from continuous_auth import ContinuousAuthenticator
+from sequential_auth import SequentialAuthenticator, ACCEPT
+from collection_session import CANCELLED
 import cv2
 import pygame
 import requests
@@ -25,6 +28,13 @@ class SecuritySystem:
         self.camera = None
         self.alarm_active = False
         self.user_phone = None  # Will be set from config
+        self.continuous_auth = {}
+        self.continuous_authenticator = None
+        # Set when the unlocked session ends: Enter pressed, or continuous authentication locked
+        self.session_end = threading.Event()
+        self._enter_reader = None
+        self.sequential_auth = {}
+        self.last_auth_report = None
         self.config_file = "security_config.json"
         self.load_config()
         
@@ -39,6 +49,8 @@ class SecuritySystem:
                     config = json.load(f)
                     self.user_phone = config.get('user_phone', None)
                     self.max_attempts = config.get('max_attempts', 3)
+                    self.continuous_auth = config.get('continuous_auth', {})
+                    self.sequential_auth = config.get('sequential_auth', {})
                     print("Configuration loaded successfully!")
             except Exception as e:
                 print(f"Error loading config: {e}")
@@ -52,6 +64,22 @@ class SecuritySystem:
             'user_phone': None,
             'max_attempts': 3,
             'notification_service': 'email',  # or 'sms'
+            'typing_engine': 'isolation_forest',  # or 'scaled_manhattan' / 'mahalanobis'
+            'storage_backend': 'files',  # or 'sqlite' (one keystroke_data/keystrokes.db for all users)
+            'continuous_auth': {
+                'enabled': True,
+                'window_size': 60,      # Keystrokes kept in the rolling window
+                'rescore_every': 10,    # Key presses between model scores
+                'threshold': None,      # Decision score below which typing looks foreign (None: the model's calibrated threshold)
+                'smoothing': 0.3,       # Weight of the newest score in the moving average
+                'lock_after': 3         # Consecutive low smoothed scores before locking
+            },
+            'sequential_auth': {
+                'far': 0.01,            # Target false accept rate of the early decision
+                'frr': 0.05,            # Target false reject rate of the early decision
+                'min_shift': 0.75,      # Smallest impostor timing shift to detect, in enrolled spreads
+                'min_keystrokes': 15    # Key presses before any early decision
+            },
             'email_settings': {
                 'smtp_server': 'smtp.gmail.com',
                 'smtp_port': 587,
@@ -95,27 +123,56 @@ class SecuritySystem:
             return False
             
     def authenticate_user(self, timeout=30):
-        """Authenticate user based on typing pattern"""
-        print("Please type to authenticate (you have 30 seconds):")
+        """Authenticate user based on typing pattern, deciding as soon as the evidence is clear"""
+        print(f"Please type to authenticate (you have {timeout} seconds):")
         print("Type: 'I am the authorized user of this system'")
         
-        # Collect keystroke data
-        self.keystroke_collector.start_collection(duration=timeout)
-        time.sleep(timeout + 1)
-        
-        # Get typing features
-        features = self.keystroke_collector.get_typing_features()
+        try:
+            sequential = SequentialAuthenticator.from_model(self.typing_model, **self.sequential_auth)
+        except (ValueError, TypeError) as e:
+            print(f"Early decision unavailable ({e}), waiting for the full {timeout} seconds")
+            sequential = None
+            
+        # Collect keystroke data until the sequential test decides, ESC, a cancel or the timeout
+        if sequential is not None:
+            self.keystroke_collector.event_listeners.append(sequential.on_event)
+        try:
+            session = self.keystroke_collector.start_collection(
+                duration=timeout,
+                cancel_event=sequential.decided if sequential is not None else None
+            )
+            outcome = session.result()
+        finally:
+            if sequential is not None:
+                self.keystroke_collector.event_listeners.remove(sequential.on_event)
+        decision = sequential.decision if sequential is not None else None
+        elapsed = outcome['seconds']
         
-        if features is None:
-            print("No typing data collected!")
+        # Cancelled from outside (e.g. the GUI was stopped) before a decision: not a failed attempt
+        if decision is None and outcome['reason'] == CANCELLED:
+            print("Authentication cancelled.")
             return False
             
-        # Authenticate using the model
-        is_authentic, confidence = self.typing_model.authenticate(features)
-        
-        print(f"Authentication confidence: {confidence:.2%}")
-        
-        if is_authentic and confidence > 0.7:  # 70% confidence threshold
+        if decision is not None:
+            status = sequential.get_status()
+            is_authentic = decision == ACCEPT
+            self.last_auth_report = dict(status, method="sequential", seconds=elapsed)
+            print(f"Decided after {status['keystrokes']} keystrokes, {status['decision_seconds']:.1f}s of typing "
+                  f"({elapsed:.1f}s total, log-likelihood ratio {status['llr']:.2f})")
+        else:
+            # Ambiguous until the timeout: score the whole attempt with the model
+            features = self.keystroke_collector.get_typing_features()
+            
+            if features is None:
+                print("No typing data collected!")
+                return False
+                
+            is_authentic, confidence = self.typing_model.authenticate(features)
+            self.last_auth_report = {"method": "timeout", "seconds": elapsed, "confidence": confidence}
+            print(f"No early decision; model decided after {elapsed:.1f}s (confidence: {confidence:.2%})")
+            
+        # The model's calibrated threshold decides; confidence is only reported
+        if is_authentic:
             print("✅ Authentication successful!")
             self.failed_attempts = 0
             self.is_locked = False
@@ -125,6 +182,54 @@ class SecuritySystem:
             self.failed_attempts += 1
             return False
             
+    def start_continuous_authentication(self):
+        """Keep scoring live typing while unlocked and lock when it stops matching"""
+        settings = self.continuous_auth
+        self.continuous_authenticator = ContinuousAuthenticator(
+            self.typing_model,
+            window_size=settings.get('window_size', 60),
+            rescore_every=settings.get('rescore_every', 10),
+            threshold=settings['threshold'] if settings.get('threshold') is not None else self.typing_model.threshold,
+            smoothing=settings.get('smoothing', 0.3),
+            lock_after=settings.get('lock_after', 3),
+            on_lock=self.handle_continuous_mismatch
+        )
+        self.keystroke_collector.event_listeners.append(self.continuous_authenticator.on_event)
+        # The collection session ends by itself once the authenticator locks
+        self.keystroke_collector.start_collection(cancel_event=self.continuous_authenticator.locked)
+        return self.continuous_authenticator
+        
+    def stop_continuous_authentication(self):
+        """Stop scoring live typing"""
+        if self.continuous_authenticator is None:
+            return
+        self.keystroke_collector.stop_collection()
+        if self.continuous_authenticator.on_event in self.keystroke_collector.event_listeners:
+            self.keystroke_collector.event_listeners.remove(self.continuous_authenticator.on_event)
+        self.continuous_authenticator = None
+        
+    def handle_continuous_mismatch(self, status):
+        """Lock the session when continuous authentication rejects the typist"""
+        print(f"\n🔒 Typing pattern no longer matches (smoothed score {status['smoothed_score']:.3f}) - system LOCKED")
+        self.is_locked = True
+        self.session_end.set()
+        
+    def wait_for_session_end(self):
+        """Block until Enter is pressed or continuous authentication locks; True if it locked"""
+        # input() cannot be interrupted, so one reader thread stays pending across sessions
+        if self._enter_reader is None or not self._enter_reader.is_alive():
+            self._enter_reader = threading.Thread(target=self._read_enter, name="enter-reader", daemon=True)
+            self._enter_reader.start()
+        self.session_end.wait()
+        return self.continuous_authenticator is not None and self.continuous_authenticator.locked.is_set()
+        
+    def _read_enter(self):
+        try:
+            input()
+        except EOFError:
+            return
+        self.session_end.set()
+        
     def capture_intruder_photo(self):
         """Capture photo of potential intruder with enhanced detection"""
         try:
@@ -524,9 +629,19 @@ Check your computer now!"""
                 if self.authenticate_user():
                     print("🔓 System UNLOCKED! Welcome back!")
                     
-                    # Simulate system usage
-                    print("System is now accessible. Press Enter to lock again...")
-                    input()
+                    if self.continuous_auth.get('enabled', True):
+                        # Keep verifying the typist while the system is in use
+                        self.session_end.clear()
+                        self.start_continuous_authentication()
+                        print("System is now accessible and your typing is monitored continuously.")
+                        print("Press Enter to lock again (or re-authenticate if the session locks)...")
+                        if self.wait_for_session_end():
+                            print("Please re-authenticate to continue.")
+                        self.stop_continuous_authentication()
+                    else:
+                        # Simulate system usage
+                        print("System is now accessible. Press Enter to lock again...")
+                        input()
                     self.is_locked = True
                     print("System locked.")
                     
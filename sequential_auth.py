@@ -0,0 +1,140 @@
+"""
+Sequential Typing Authentication
+Wald sequential probability ratio test that decides as soon as live keystrokes give enough evidence
+"""
+
+import math
+import threading
+import time
+from keystroke_events import KEY_DOWN
+
+ACCEPT = "accept"
+REJECT = "reject"
+
+
+class SequentialAuthenticator:
+    """Accept or reject a typist keystroke by keystroke instead of after a fixed wait
+
+    Dwell and flight times are tested separately. Under the genuine
+    hypothesis they scatter around the enrolled user's mean with the
+    enrolled within-session spread; under the impostor hypothesis their
+    mean is shifted by `min_shift` spreads in either direction. Each side
+    keeps only a count and a sum of standardized deviations, which is all
+    the two-sided Gaussian log-likelihood ratio needs, so every keystroke
+    updates the evidence in O(1). The summed ratio is compared with Wald's
+    bounds for the target false accept and false reject rates; no decision
+    is taken before `min_keystrokes` presses. Deviations are capped at
+    `max_deviation` spreads so one long pause cannot end the test alone.
+    """
+
+    def __init__(self, mean_dwell, spread_dwell, mean_flight, spread_flight, far=0.01, frr=0.05,
+                 min_shift=0.75, min_keystrokes=15, max_deviation=4.0):
+        if spread_dwell <= 0 or spread_flight <= 0:
+            raise ValueError("Enrolled dwell and flight spreads must be positive")
+        self.params = {"dwell": (mean_dwell, spread_dwell), "flight": (mean_flight, spread_flight)}
+        self.far = far
+        self.frr = frr
+        self.min_shift = min_shift
+        self.min_keystrokes = min_keystrokes
+        self.max_deviation = max_deviation
+        # Wald's approximations for the thresholds on the log-likelihood ratio
+        self.accept_bound = math.log((1 - frr) / far)
+        self.reject_bound = math.log(frr / (1 - far))
+        self.decided = threading.Event()
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_model(cls, model, **settings):
+        """Build from a trained TypingPatternModel's scaler statistics (per-session means of each feature)"""
+        names = model.feature_names
+        try:
+            mean = model.scaler.mean_
+            stats = [float(mean[names.index(name)]) for name in ('avg_dwell_time', 'std_dwell_time', 'avg_flight_time', 'std_flight_time')]
+        except (AttributeError, ValueError) as e:
+            raise ValueError(f"Model has no dwell/flight statistics: {e}")
+        return cls(*stats, **settings)
+
+    def reset(self):
+        """Start a new attempt"""
+        with self._lock:
+            self.llr = 0.0
+            self.counts = {"dwell": 0, "flight": 0}
+            self.sums = {"dwell": 0.0, "flight": 0.0}
+            self.keystrokes = 0
+            self.observations = 0
+            self.decision = None
+            self.first_time = None
+            self.decision_time = None
+            self.key_press_times = {}
+            self.last_release_time = None
+            self.decided.clear()
+
+    def side_llr(self, count, total):
+        """Log-likelihood ratio (genuine over impostor) of `count` standardized deviations summing to `total`
+
+        Against an impostor mean shifted by +/-d it is n*d²/2 - log cosh(d*S);
+        log cosh is expanded as |x| + log1p(exp(-2|x|)) - log 2 so large sums cannot overflow.
+        """
+        shift = self.min_shift
+        log_cosh = abs(shift * total) + math.log1p(math.exp(-2 * abs(shift * total))) - math.log(2)
+        return count * shift * shift / 2 - log_cosh
+
+    def on_event(self, timestamp, key_char, event_type):
+        """Feed one resolved key event from the live collector"""
+        with self._lock:
+            if self.decision is not None:
+                return
+            if self.first_time is None:
+                self.first_time = timestamp
+
+            if event_type == KEY_DOWN:
+                self.keystrokes += 1
+                self.key_press_times[key_char] = timestamp
+                if self.last_release_time is not None:
+                    self._observe(timestamp - self.last_release_time, "flight")
+            else:
+                press_time = self.key_press_times.pop(key_char, None)
+                if press_time is not None:
+                    self._observe(timestamp - press_time, "dwell")
+                self.last_release_time = timestamp
+
+            if self.keystrokes >= self.min_keystrokes:
+                if self.llr >= self.accept_bound:
+                    self._decide(ACCEPT, timestamp)
+                elif self.llr <= self.reject_bound:
+                    self._decide(REJECT, timestamp)
+
+    def _observe(self, value, kind):
+        # Caller holds the lock
+        mean, spread = self.params[kind]
+        deviation = max(-self.max_deviation, min((value - mean) / spread, self.max_deviation))
+        self.counts[kind] += 1
+        self.sums[kind] += deviation
+        self.observations += 1
+        self.llr = sum(self.side_llr(self.counts[side], self.sums[side]) for side in self.params)
+
+    def _decide(self, decision, timestamp):
+        # Caller holds the lock
+        self.decision = decision
+        self.decision_time = timestamp - self.first_time
+        self.decided.set()
+
+    def wait(self, timeout=None):
+        """Block until accept/reject or the timeout; returns the decision or None if still ambiguous"""
+        self.decided.wait(timeout)
+        return self.decision
+
+    def get_status(self):
+        """Get the evidence collected so far"""
+        with self._lock:
+            return {
+                "decision": self.decision,
+                "llr": self.llr,
+                "accept_bound": self.accept_bound,
+                "reject_bound": self.reject_bound,
+                "keystrokes": self.keystrokes,
+                "observations": self.observations,
+                "decision_seconds": self.decision_time,
+                "elapsed_seconds": time.time() - self.first_time if self.first_time is not None else 0.0
+            }
@@ -0,0 +1,482 @@
+"""
+SQLite Session Database
+Optional single-file backend for keystroke sessions, profiles and authentication attempts
+"""
+
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+from datetime import datetime
+import numpy as np
+from feature_cache import FeatureMatrixCache
+from keystroke_events import EVENT_TYPE_NAMES
+from session_log import has_sessions, load_user_sessions
+
+DATABASE_NAME = "keystrokes.db"
+STORAGE_BACKENDS = ("files", "sqlite")
+DEFAULT_BACKEND = "files"
+
+# Raw events BLOB: magic, event count, lengths of the key-name table, type-name
+# table and extra fields, flags; then the key names and type names as JSON lists,
+# the extra fields as a JSON object of per-field value lists, float64 timestamps,
+# uint16 key codes and uint8 type codes. JSON_EVENTS: the body is the plain event list.
+EVENTS_MAGIC = b"KEV2"
+_EVENTS_HEADER = struct.Struct("<4sIIIIB")
+_INTEGER_TIMESTAMPS = 1
+_JSON_EVENTS = 2
+# First layout (key/type/timestamp only), still readable
+_EVENTS_V1_MAGIC = b"KEV1"
+_EVENTS_V1_HEADER = struct.Struct("<4sIIB")
+COLUMN_FIELDS = ('key', 'type', 'timestamp')
+
+# Session columns stored natively; anything else a session carries goes in `extra`
+SESSION_COLUMNS = ("session_id", "timestamp", "text_typed", "typing_speed", "accuracy", "session_duration")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    session_id INTEGER,
+    timestamp TEXT,
+    text_typed TEXT,
+    typing_speed REAL,
+    accuracy REAL,
+    session_duration REAL,
+    event_count INTEGER NOT NULL,
+    events BLOB NOT NULL,
+    extra TEXT,
+    content_hash TEXT NOT NULL,
+    UNIQUE (user_id, position)
+);
+CREATE INDEX IF NOT EXISTS sessions_user_time ON sessions (user_id, timestamp);
+CREATE TABLE IF NOT EXISTS features (
+    session INTEGER PRIMARY KEY REFERENCES sessions (id) ON DELETE CASCADE,
+    features TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS auth_attempts (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    authentic INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    engine TEXT
+);
+CREATE INDEX IF NOT EXISTS auth_attempts_user_time ON auth_attempts (user_id, timestamp);
+"""
+
+# Fixed statement texts, so every connection's statement cache prepares each one once
+SELECT_SESSIONS = (
+    "SELECT s.session_id, s.timestamp, s.text_typed, s.typing_speed, s.accuracy, s.session_duration,"
+    " s.events, s.extra, f.features FROM sessions s LEFT JOIN features f ON f.session = s.id"
+)
+INSERT_SESSION = (
+    "INSERT INTO sessions (user_id, position, session_id, timestamp, text_typed, typing_speed, accuracy,"
+    " session_duration, event_count, events, extra, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+INSERT_FEATURES = "INSERT INTO features (session, features) VALUES (?, ?)"
+BUMP_REVISION = (
+    "INSERT INTO profiles (user_id, profile, revision) VALUES (?, 'null', 1)"
+    " ON CONFLICT (user_id) DO UPDATE SET revision = revision + 1"
+)
+
+
+def configured_backend(config_file="security_config.json"):
+    """Backend named by 'storage_backend' in the security config, or the default"""
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                backend = json.load(f).get('storage_backend', DEFAULT_BACKEND)
+            if backend in STORAGE_BACKENDS:
+                return backend
+            print(f"⚠️ Unknown storage_backend '{backend}', using {DEFAULT_BACKEND}")
+    except Exception as e:
+        print(f"⚠️ Could not read storage_backend from {config_file}: {e}")
+    return DEFAULT_BACKEND
+
+
+def encode_events(keystrokes):
+    """Pack event dicts into the compact BLOB, losslessly
+
+    key, type and timestamp become columns (11 bytes per event plus the
+    name tables). Other fields that every event carries, such as the web
+    client's code/ctrlKey/shiftKey/altKey, are kept as one JSON list per
+    field. Events that do not fit this shape (mixed fields, non-numeric
+    timestamps, too many distinct keys) are stored as plain JSON.
+    """
+    names, codes = [], {}
+    type_names, type_codes = [], {}
+    key_codes = np.empty(len(keystrokes), dtype='<u2')
+    event_types = np.empty(len(keystrokes), dtype=np.uint8)
+    timestamps = np.empty(len(keystrokes), dtype='<f8')
+    fields = list(keystrokes[0]) if keystrokes else list(COLUMN_FIELDS)
+    extra_fields = [field for field in fields if field not in COLUMN_FIELDS]
+    extras = {field: [] for field in extra_fields}
+    integer_timestamps = True
+    try:
+        if not set(COLUMN_FIELDS).issubset(fields):
+            raise ValueError("missing event field")
+        for i, event in enumerate(keystrokes):
+            if list(event) != fields:
+                raise ValueError("irregular event")
+            key, event_type, timestamp = event['key'], event['type'], event['timestamp']
+            if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)):
+                raise ValueError("non-numeric timestamp")
+            code = codes.get(key)
+            if code is None:
+                code = codes[key] = len(names)
+                names.append(key)
+            type_code = type_codes.get(event_type)
+            if type_code is None:
+                type_code = type_codes[event_type] = len(type_names)
+                type_names.append(event_type)
+            key_codes[i] = code
+            event_types[i] = type_code
+            timestamps[i] = timestamp
+            integer_timestamps = integer_timestamps and isinstance(timestamp, int)
+            for field in extra_fields:
+                extras[field].append(event[field])
+    except (ValueError, TypeError, OverflowError):
+        # Unhashable keys, more than 65536 keys or 256 types, or irregular events
+        body = json.dumps(keystrokes).encode('utf-8')
+        return _EVENTS_HEADER.pack(EVENTS_MAGIC, len(keystrokes), 0, 0, 0, _JSON_EVENTS) + body
+
+    name_bytes = json.dumps(names).encode('utf-8')
+    type_bytes = json.dumps(type_names).encode('utf-8')
+    extra_bytes = json.dumps({"fields": fields, "values": extras}).encode('utf-8') if fields != list(COLUMN_FIELDS) else b""
+    header = _EVENTS_HEADER.pack(EVENTS_MAGIC, len(keystrokes), len(name_bytes), len(type_bytes), len(extra_bytes),
+                                 _INTEGER_TIMESTAMPS if integer_timestamps else 0)
+    return b"".join([header, name_bytes, type_bytes, extra_bytes,
+                     timestamps.tobytes(), key_codes.tobytes(), event_types.tobytes()])
+
+
+def decode_events(blob):
+    """Unpack a BLOB from encode_events back into the original event dicts"""
+    magic = bytes(blob[:4])
+    if magic == _EVENTS_V1_MAGIC:
+        _, count, names_length, flags = _EVENTS_V1_HEADER.unpack_from(blob)
+        offset, type_names, extras = _EVENTS_V1_HEADER.size, [EVENT_TYPE_NAMES[0], EVENT_TYPE_NAMES[1]], {}
+        names = json.loads(blob[offset:offset + names_length])
+        offset += names_length
+    elif magic == EVENTS_MAGIC:
+        _, count, names_length, types_length, extras_length, flags = _EVENTS_HEADER.unpack_from(blob)
+        offset = _EVENTS_HEADER.size
+        if flags & _JSON_EVENTS:
+            return json.loads(blob[offset:])
+        names = json.loads(blob[offset:offset + names_length])
+        offset += names_length
+        type_names = json.loads(blob[offset:offset + types_length])
+        offset += types_length
+        extras = json.loads(blob[offset:offset + extras_length]) if extras_length else {}
+        offset += extras_length
+    else:
+        raise ValueError("Not a keystroke events BLOB")
+    timestamps = np.frombuffer(blob, dtype='<f8', count=count, offset=offset)
+    key_codes = np.frombuffer(blob, dtype='<u2', count=count, offset=offset + 8 * count)
+    event_types = np.frombuffer(blob, dtype=np.uint8, count=count, offset=offset + 10 * count)
+    timestamps = timestamps.astype(np.int64) if flags & _INTEGER_TIMESTAMPS else timestamps
+    events = [
+        {"key": names[code], "type": type_names[event_type], "timestamp": timestamp}
+        for timestamp, code, event_type in zip(timestamps.tolist(), key_codes.tolist(), event_types.tolist())
+    ]
+    if not extras:
+        return events
+    # Rebuild every event with the original field order
+    columns = [extras["values"].get(field) for field in extras["fields"]]
+    return [
+        {field: event[field] if column is None else column[i] for field, column in zip(extras["fields"], columns)}
+        for i, event in enumerate(events)
+    ]
+
+
+class SessionDatabase:
+    """One SQLite file shared by every user of a data directory
+
+    Runs in WAL mode so readers (stats, training, another process) never
+    block on a writer. Connections are per thread; sqlite3 keeps a
+    prepared statement cache per connection, and all SQL here is fixed
+    text with ? parameters, so every statement is compiled once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """This thread's connection, opened on first use"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def write(self):
+        """Context manager for one write transaction (BEGIN IMMEDIATE ... COMMIT)"""
+        return _WriteTransaction(self.connection())
+
+    def user_ids(self):
+        """Every user with a profile or stored sessions"""
+        rows = self.connection().execute(
+            "SELECT user_id FROM profiles WHERE profile != 'null' UNION SELECT DISTINCT user_id FROM sessions ORDER BY 1"
+        )
+        return [user_id for (user_id,) in rows]
+
+    def load_profile(self, user_id):
+        """Stored profile dict, or None"""
+        row = self.connection().execute("SELECT profile FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_profile(self, user_id, profile):
+        """Insert or replace a user's profile"""
+        with self.write() as connection:
+            connection.execute(
+                "INSERT INTO profiles (user_id, profile) VALUES (?, ?)"
+                " ON CONFLICT (user_id) DO UPDATE SET profile = excluded.profile",
+                (user_id, json.dumps(profile))
+            )
+
+    def iter_other_sessions(self, user_id):
+        """Every session of every other user, for impostor samples"""
+        for row in self.connection().execute(SELECT_SESSIONS + " WHERE s.user_id != ? ORDER BY s.user_id, s.position", (user_id,)):
+            yield session_from_row(row)
+
+    def record_attempts(self, user_id, results, engine=None):
+        """Log (is_authentic, confidence) results of a user's authentication attempts"""
+        timestamp = datetime.now().isoformat()
+        with self.write() as connection:
+            connection.executemany(
+                "INSERT INTO auth_attempts (user_id, timestamp, authentic, confidence, engine) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, timestamp, int(authentic), float(confidence), engine) for authentic, confidence in results]
+            )
+
+    def attempt_summary(self, user_id, since=None):
+        """Count, accepted count and mean confidence of a user's authentication attempts"""
+        total, accepted, confidence, last = self.connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(authentic), 0), AVG(confidence), MAX(timestamp) FROM auth_attempts"
+            " WHERE user_id = ? AND timestamp >= ?",
+            (user_id, since or "")
+        ).fetchone()
+        return {"total": total, "accepted": accepted, "rejected": total - accepted,
+                "avg_confidence": confidence, "last_attempt": last}
+
+
+class _WriteTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_DATABASES = {}
+_DATABASES_LOCK = threading.Lock()
+
+
+def open_database(data_dir="keystroke_data"):
+    """The shared SessionDatabase of a data directory"""
+    path = os.path.abspath(os.path.join(data_dir, DATABASE_NAME))
+    with _DATABASES_LOCK:
+        database = _DATABASES.get(path)
+        if database is None:
+            os.makedirs(data_dir, exist_ok=True)
+            database = _DATABASES[path] = SessionDatabase(path)
+        return database
+
+
+def session_from_row(row, with_events=True):
+    """Rebuild the stored session dict from a SELECT_SESSIONS row"""
+    session_id, timestamp, text_typed, typing_speed, accuracy, duration, events, extra, features = row
+    session = {
+        "session_id": session_id,
+        "timestamp": timestamp,
+        "text_typed": text_typed,
+        "typing_speed": typing_speed,
+        "accuracy": accuracy,
+        "session_duration": duration
+    }
+    if with_events:
+        session["keystrokes"] = decode_events(events)
+    if features is not None:
+        session["features"] = json.loads(features)
+    if extra:
+        session.update(json.loads(extra))
+    return session
+
+
+class SQLiteSessionStore:
+    """One user's sessions in a SessionDatabase, with the SessionLog interface
+
+    Sessions keep their order through a per-user position; raw events are
+    a compact BLOB and extracted features sit in their own table, so stats
+    and training never decode events they do not need.
+    """
+
+    def __init__(self, database, user_id):
+        self.database = database
+        self.user_id = user_id
+        self.path = database.path
+
+    @property
+    def exists(self):
+        return len(self) > 0
+
+    def __len__(self):
+        return self.database.connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE user_id = ?", (self.user_id,)
+        ).fetchone()[0]
+
+    def __iter__(self):
+        return self.iter_sessions()
+
+    def iter_sessions(self, start=0):
+        """Stream sessions from position `start` on"""
+        rows = self.database.connection().execute(
+            SELECT_SESSIONS + " WHERE s.user_id = ? AND s.position >= ? ORDER BY s.position", (self.user_id, start)
+        )
+        for row in rows:
+            yield session_from_row(row)
+
+    def get(self, index):
+        """The index-th session (0-based)"""
+        row = self.database.connection().execute(
+            SELECT_SESSIONS + " WHERE s.user_id = ? AND s.position = ?", (self.user_id, index)
+        ).fetchone()
+        if row is None:
+            raise IndexError(index)
+        return session_from_row(row)
+
+    def append(self, session):
+        """Add one session; returns its 0-based position"""
+        with self.database.write() as connection:
+            position = connection.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM sessions WHERE user_id = ?", (self.user_id,)
+            ).fetchone()[0]
+            self._insert(connection, position, session)
+            connection.execute(BUMP_REVISION, (self.user_id,))
+        return position
+
+    def rewrite(self, sessions):
+        """Replace all of this user's sessions in one transaction"""
+        with self.database.write() as connection:
+            connection.execute("DELETE FROM sessions WHERE user_id = ?", (self.user_id,))
+            for position, session in enumerate(sessions):
+                self._insert(connection, position, session)
+            connection.execute(BUMP_REVISION, (self.user_id,))
+
+    def _insert(self, connection, position, session):
+        keystrokes = session.get("keystrokes", [])
+        extra = {key: value for key, value in session.items()
+                 if key not in SESSION_COLUMNS and key not in ("keystrokes", "features")}
+        cursor = connection.execute(INSERT_SESSION, (
+            self.user_id, position,
+            *(session.get(column) for column in SESSION_COLUMNS),
+            len(keystrokes), encode_events(keystrokes),
+            json.dumps(extra) if extra else None,
+            FeatureMatrixCache.session_hash(session)
+        ))
+        if "features" in session:
+            connection.execute(INSERT_FEATURES, (cursor.lastrowid, json.dumps(session["features"])))
+
+    def import_files(self, user_dir):
+        """One-time copy of a user's session log or keystrokes.json into the database; returns the count or None"""
+        if self.exists or not has_sessions(user_dir):
+            return None
+        sessions = load_user_sessions(user_dir)
+        self.rewrite(sessions)
+        return len(sessions)
+
+    def stamp(self):
+        """Changes whenever this user's sessions do, for the feature cache"""
+        row = self.database.connection().execute(
+            "SELECT revision FROM profiles WHERE user_id = ?", (self.user_id,)
+        ).fetchone()
+        return ["sqlite", len(self), row[0] if row else 0]
+
+    def training_rows(self):
+        """(content hash, session) pairs in order, without raw events unless a session lacks n-gram timings"""
+        rows = self.database.connection().execute(
+            "SELECT s.content_hash, s.session_id, s.timestamp, s.text_typed, s.typing_speed, s.accuracy,"
+            " s.session_duration, s.events, s.extra, f.features"
+            " FROM sessions s LEFT JOIN features f ON f.session = s.id WHERE s.user_id = ? ORDER BY s.position",
+            (self.user_id,)
+        )
+        for content_hash, *row in rows:
+            session = session_from_row(row, with_events=False)
+            if "ngram_timings" not in session.get("features", {}):
+                session["keystrokes"] = decode_events(row[6])
+            yield content_hash, session
+
+    def sessions_between(self, since=None, until=None):
+        """Sessions whose ISO timestamp is in [since, until), using the (user_id, timestamp) index"""
+        rows = self.database.connection().execute(
+            SELECT_SESSIONS + " WHERE s.user_id = ? AND s.timestamp >= ? AND (? IS NULL OR s.timestamp < ?)"
+            " ORDER BY s.timestamp, s.position",
+            (self.user_id, since or "", until, until)
+        )
+        for row in rows:
+            yield session_from_row(row)
+
+    def summary(self):
+        """Session count and typing speed/accuracy aggregates, computed by SQLite"""
+        count, avg_speed, best_speed, avg_accuracy, best_accuracy = self.database.connection().execute(
+            "SELECT COUNT(*), AVG(typing_speed), MAX(typing_speed), AVG(accuracy), MAX(accuracy)"
+            " FROM sessions WHERE user_id = ?", (self.user_id,)
+        ).fetchone()
+        ends = self.database.connection().execute(
+            "SELECT typing_speed FROM sessions WHERE user_id = ?"
+            " AND position IN ((SELECT MIN(position) FROM sessions WHERE user_id = ?),"
+            " (SELECT MAX(position) FROM sessions WHERE user_id = ?)) ORDER BY position",
+            (self.user_id, self.user_id, self.user_id)
+        ).fetchall()
+        return {
+            "sessions": count,
+            "avg_typing_speed": avg_speed,
+            "best_typing_speed": best_speed,
+            "avg_accuracy": avg_accuracy,
+            "best_accuracy": best_accuracy,
+            "first_typing_speed": ends[0][0] if ends else None,
+            "last_typing_speed": ends[-1][0] if ends else None
+        }
+
+
+def main():
+    """Copy every user's file-backed sessions and profile in a data directory into the database"""
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "keystroke_data"
+    print("🗄️ SESSION DATABASE IMPORT")
+    print("=" * 40)
+    if not os.path.isdir(data_dir):
+        print(f"❌ {data_dir} not found")
+        return
+    database = open_database(data_dir)
+    for user_id in sorted(os.listdir(data_dir)):
+        user_dir = os.path.join(data_dir, user_id)
+        if not os.path.isdir(user_dir):
+            continue
+        profile_file = os.path.join(user_dir, "profile.json")
+        if database.load_profile(user_id) is None and os.path.isfile(profile_file):
+            with open(profile_file, 'r') as f:
+                database.save_profile(user_id, json.load(f))
+        count = SQLiteSessionStore(database, user_id).import_files(user_dir)
+        if count is not None:
+            print(f"✅ {user_id}: {count} sessions imported")
+    print(f"💾 Database: {database.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Append-Only Session Log
+One user's keystroke sessions as a JSONL log with an offset index, replacing the rewritten keystrokes.json
+"""
+
+import json
+import os
+import secrets
+import struct
+import sys
+import threading
+import numpy as np
+from atomic_files import atomic_tmp_path
+from feature_cache import FeatureMatrixCache
+
+SESSION_LOG_NAME = "sessions.jsonl"
+SESSION_INDEX_NAME = "sessions.idx"
+LEGACY_SESSIONS_NAME = "keystrokes.json"
+SESSION_LOG_FORMAT = "keystroke-session-log"
+SESSION_LOG_VERSION = 1
+
+# Index file: magic, the log generation it describes, then one uint64 byte offset per session
+INDEX_MAGIC = b"KSIDX\0\0\1"
+_INDEX_HEADER = struct.Struct("<8s8s")
+
+
+def has_sessions(user_dir):
+    """True if the directory holds a session log or a not yet migrated keystrokes.json"""
+    return (os.path.isfile(os.path.join(user_dir, SESSION_LOG_NAME))
+            or os.path.isfile(os.path.join(user_dir, LEGACY_SESSIONS_NAME)))
+
+
+def load_user_sessions(user_dir):
+    """Every stored session of a user directory, from the log or the legacy file, without migrating"""
+    log = SessionLog(user_dir)
+    if log.exists:
+        return list(log)
+    legacy_file = os.path.join(user_dir, LEGACY_SESSIONS_NAME)
+    if os.path.isfile(legacy_file):
+        with open(legacy_file, 'r') as f:
+            return json.load(f)
+    return []
+
+
+class SessionLog:
+    """Append-only JSONL log of one user's sessions
+
+    The first line is a header naming the format and a random generation;
+    every further line is one session. Saving appends one line and fsyncs
+    it, so the cost is proportional to the session, not the history, and
+    a crash can at worst leave one torn last line, which readers skip and
+    the next append cuts off. sessions.idx holds the byte offset of every
+    session for len() and random access; it is only an accelerator, tied
+    to the log by the generation, and is rebuilt by scanning whenever it
+    does not match. rewrite() replaces both files atomically under a new
+    generation.
+    """
+
+    def __init__(self, user_dir):
+        self.path = os.path.join(user_dir, SESSION_LOG_NAME)
+        self.index_path = os.path.join(user_dir, SESSION_INDEX_NAME)
+        self._lock = threading.RLock()
+        self._offsets = []
+        self._scanned_to = None  # Byte position after the last complete line seen
+        self._indexed = None  # Sessions the on-disk index covers, None if it does not match the log
+        self._generation = None
+        self._identity = None
+
+    @property
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
+
+    def __iter__(self):
+        return self.iter_sessions()
+
+    def iter_sessions(self, start=0):
+        """Stream sessions from position `start` on, parsing one line at a time"""
+        if not self.exists:
+            return
+        with open(self.path, 'rb') as f:
+            if start:
+                with self._lock:
+                    self._refresh()
+                    if start >= len(self._offsets):
+                        return
+                    f.seek(self._offsets[start])
+            else:
+                f.readline()  # Header
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Torn write from a crash; not a session
+                yield json.loads(line)
+
+    def get(self, index):
+        """The index-th session (0-based)"""
+        with self._lock:
+            self._refresh()
+            offset = self._offsets[index]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def append(self, session):
+        """Durably add one session; returns its 0-based position (one writing process at a time)"""
+        line = json.dumps(session, separators=(',', ':')).encode('utf-8') + b"\n"
+        with self._lock:
+            if not self.exists:
+                self.rewrite([])
+            self._refresh()
+            offset = self._scanned_to
+            with open(self.path, 'r+b') as f:
+                # Drop a torn line left by a crash before writing after it
+                f.truncate(offset)
+                f.seek(offset)
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._indexed == len(self._offsets):
+                with open(self.index_path, 'ab') as f:
+                    f.write(struct.pack("<Q", offset))
+                self._offsets.append(offset)
+            else:
+                self._offsets.append(offset)
+                self._write_index(self._generation)
+            self._indexed = len(self._offsets)
+            self._scanned_to = offset + len(line)
+            self._identity = self._stat_identity()
+            return len(self._offsets) - 1
+
+    def rewrite(self, sessions):
+        """Atomically replace the whole log (after re-extracting features or importing a backup)"""
+        generation = secrets.token_hex(8)
+        header = json.dumps({"format": SESSION_LOG_FORMAT, "version": SESSION_LOG_VERSION, "generation": generation})
+        offsets = []
+        with self._lock:
+            log_tmp = atomic_tmp_path(self.path)
+            with open(log_tmp, 'wb') as f:
+                f.write(header.encode('utf-8') + b"\n")
+                for session in sessions:
+                    offsets.append(f.tell())
+                    f.write(json.dumps(session, separators=(',', ':')).encode('utf-8') + b"\n")
+                end = f.tell()
+                f.flush()
+                os.fsync(f.fileno())
+            # A crash between the two leaves an index of another generation, which is then ignored
+            os.replace(log_tmp, self.path)
+            self._offsets = offsets
+            self._write_index(generation)
+            self._generation = generation
+            self._indexed = len(offsets)
+            self._scanned_to = end
+            self._identity = self._stat_identity()
+
+    def stamp(self):
+        """Size and modification time of the log, for the feature cache"""
+        return FeatureMatrixCache.source_stamp(self.path)
+
+    def training_rows(self):
+        """(content hash, session) pairs in log order"""
+        for session in self.iter_sessions():
+            yield FeatureMatrixCache.session_hash(session), session
+
+    def sessions_between(self, since=None, until=None):
+        """Sessions whose ISO timestamp is in [since, until), by scanning the log"""
+        for session in self.iter_sessions():
+            timestamp = session.get("timestamp") or ""
+            if timestamp >= (since or "") and (until is None or timestamp < until):
+                yield session
+
+    def summary(self):
+        """Session count and typing speed/accuracy aggregates, in one streaming pass"""
+        speeds = []
+        accuracies = []
+        for session in self.iter_sessions():
+            speeds.append(session.get("typing_speed", 0))
+            accuracies.append(session.get("accuracy", 0))
+        return {
+            "sessions": len(speeds),
+            "avg_typing_speed": float(np.mean(speeds)) if speeds else None,
+            "best_typing_speed": max(speeds) if speeds else None,
+            "avg_accuracy": float(np.mean(accuracies)) if accuracies else None,
+            "best_accuracy": max(accuracies) if accuracies else None,
+            "first_typing_speed": speeds[0] if speeds else None,
+            "last_typing_speed": speeds[-1] if speeds else None
+        }
+
+    def _write_index(self, generation):
+        # Caller holds the lock
+        index_tmp = atomic_tmp_path(self.index_path)
+        with open(index_tmp, 'wb') as f:
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, bytes.fromhex(generation)))
+            f.write(np.asarray(self._offsets, dtype='<u8').tobytes())
+        os.replace(index_tmp, self.index_path)
+
+    def migrate_legacy(self, legacy_file):
+        """One-time move of a keystrokes.json list into the log; returns the session count, or None if nothing to do
+
+        The old file is kept as keystrokes.json.migrated.
+        """
+        with self._lock:
+            if self.exists or not os.path.isfile(legacy_file):
+                return None
+            with open(legacy_file, 'r') as f:
+                sessions = json.load(f)
+            self.rewrite(sessions)
+            os.replace(legacy_file, legacy_file + ".migrated")
+            return len(sessions)
+
+    def _stat_identity(self):
+        stat = os.stat(self.path)
+        return (stat.st_dev, stat.st_ino)
+
+    def _read_generation(self, f):
+        header = f.readline()
+        try:
+            data = json.loads(header)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or data.get("format") != SESSION_LOG_FORMAT:
+            raise ValueError(f"{self.path} is not a keystroke session log")
+        if data.get("version") != SESSION_LOG_VERSION:
+            raise ValueError(f"Unsupported session log version {data.get('version')} in {self.path}")
+        return data["generation"], f.tell()
+
+    def _load_index(self, generation):
+        """Offsets from sessions.idx if it belongs to this log generation, else None"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _INDEX_HEADER.size:
+            return None
+        magic, index_generation = _INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or index_generation.hex() != generation:
+            return None
+        body = data[_INDEX_HEADER.size:]
+        return np.frombuffer(body[:len(body) - len(body) % 8], dtype='<u8').tolist()
+
+    def _refresh(self):
+        # Caller holds the lock. Picks up sessions appended since the last call, by this or another process.
+        if not self.exists:
+            self._offsets, self._scanned_to, self._indexed, self._identity = [], None, None, None
+            return
+        identity = self._stat_identity()
+        with open(self.path, 'rb') as f:
+            if identity != self._identity or self._scanned_to is None:
+                # First look at this log, or it was rewritten: trust the index as far as it verifiably goes
+                self._generation, data_start = self._read_generation(f)
+                self._offsets, self._scanned_to, self._indexed = [], data_start, None
+                offsets = self._load_index(self._generation)
+                if offsets is not None:
+                    if not offsets:
+                        self._indexed = 0
+                    else:
+                        f.seek(offsets[-1])
+                        if offsets[0] >= data_start and f.readline().endswith(b"\n"):
+                            self._offsets, self._scanned_to, self._indexed = offsets, f.tell(), len(offsets)
+                self._identity = identity
+
+            # Scan whatever the index does not cover yet (normally nothing)
+            f.seek(self._scanned_to)
+            position = self._scanned_to
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._offsets.append(position)
+                position += len(line)
+            self._scanned_to = position
+
+
+def main():
+    """Migrate every user's keystrokes.json in a data directory to a session log"""
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "keystroke_data"
+    print("📦 SESSION LOG MIGRATION")
+    print("=" * 40)
+    if not os.path.isdir(data_dir):
+        print(f"❌ {data_dir} not found")
+        return
+    for user_id in sorted(os.listdir(data_dir)):
+        user_dir = os.path.join(data_dir, user_id)
+        count = SessionLog(user_dir).migrate_legacy(os.path.join(user_dir, LEGACY_SESSIONS_NAME))
+        if count is not None:
+            print(f"✅ {user_id}: {count} sessions migrated")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,7 @@ import subprocess
 from datetime import datetime
 from collections import defaultdict
 import pickle
+from phrase_template import PhraseTemplate, phrase_timings, record_key_events, timing_list
 import sys
 
 class SimpleSecuritySystem:
@@ -62,9 +63,11 @@ class SimpleSecuritySystem:
         print(f"🎯 Type the phrase: '{text}'")
         print("Press Enter when done...")
         
-        start_time = time.time()
-        typed_text = input(">>> ")
-        end_time = time.time()
+        # input() only returns the finished line; a keyboard hook times each key meanwhile
+        with record_key_events() as key_events:
+            start_time = time.time()
+            typed_text = input(">>> ")
+            end_time = time.time()
         
         # Calculate typing speed and pattern
         total_time = end_time - start_time
@@ -78,6 +81,11 @@ class SimpleSecuritySystem:
             'typing_rhythm': total_time / len(typed_text) if len(typed_text) > 0 else 0
         }
         
+        # Per-position hold/latency vector for the phrase template (absent without a hook)
+        hooked_text, positions = phrase_timings(key_events, text)
+        if hooked_text.lower() == text.lower():
+            timing_pattern['positions'] = timing_list(positions)
+        
         return timing_pattern, typed_text
     
     def train_keystroke_patterns(self, username, training_phrase="security system access"):
@@ -112,6 +120,10 @@ class SimpleSecuritySystem:
                 'tolerance': 0.3  # 30% tolerance
             }
             
+            vectors = [p['positions'] for p in all_patterns if p.get('positions')]
+            if vectors:
+                self.keystroke_patterns[username]['template'] = PhraseTemplate.fit(training_phrase, vectors).to_dict()
+            
             self.save_keystroke_patterns()
             print(f"🎉 Training completed for {username}")
             return True
@@ -135,6 +147,17 @@ class SimpleSecuritySystem:
             print("❌ Text mismatch")
             return False
         
+        # Per-position hold and latency template, when both sides were timed per key
+        if 'template' in pattern and test_pattern.get('positions') and phrase == pattern['phrase']:
+            template = PhraseTemplate.from_dict(pattern['template'])
+            accepted, score = template.verify(typed_text.strip(), test_pattern['positions'])
+            print(f"📊 Template score: {score:.3f} (threshold: {template.threshold})")
+            if accepted:
+                print("✅ Authentication successful!")
+                return True
+            print("❌ Authentication failed - keystroke pattern doesn't match")
+            return False
+        
         # Check timing patterns
         time_diff = abs(test_pattern['total_time'] - pattern['avg_total_time'])
         speed_diff = abs(test_pattern['chars_per_second'] - pattern['avg_chars_per_second'])
@@ -0,0 +1,77 @@
+"""
+Collection Session Tests
+End reasons, the stop callback and a caller's cancel_event being read but never set
+"""
+
+import asyncio
+import threading
+import time
+from collection_session import CANCELLED, DURATION, ESCAPE, CollectionSession
+
+
+def start(duration=None, cancel_event=None):
+    reasons = []
+    session = CollectionSession(reasons.append, duration, cancel_event).start()
+    return session, reasons
+
+
+def test_duration_expiry():
+    session, reasons = start(0.05)
+    assert session.result(2)["reason"] == DURATION
+    assert reasons == [DURATION]
+
+
+def test_first_reason_wins():
+    session, reasons = start()
+    session.finish(ESCAPE)
+    session.cancel()
+    assert session.result(2)["reason"] == ESCAPE
+    assert reasons == [ESCAPE]
+
+
+def test_cancel_event_ends_the_session():
+    decided = threading.Event()
+    session, reasons = start(10, decided)
+    decided.set()
+    outcome = session.result(2)
+    assert outcome["reason"] == CANCELLED
+    assert outcome["seconds"] < 1
+
+
+def test_cancel_event_stays_clear_after_cancel():
+    locked = threading.Event()
+    session, _ = start(None, locked)
+    session.cancel()
+    assert session.result(2)["reason"] == CANCELLED
+    assert not locked.is_set()
+
+
+def test_cancel_event_stays_clear_after_the_duration_expires():
+    decided = threading.Event()
+    session, _ = start(0.05, decided)
+    assert session.result(2)["reason"] == DURATION
+    assert not decided.is_set()
+
+
+def test_stop_with_a_cancel_event_is_picked_up_promptly():
+    locked = threading.Event()
+    session, _ = start(None, locked)
+    started = time.monotonic()
+    session.finish(ESCAPE)
+    assert session.result(2)["reason"] == ESCAPE
+    assert time.monotonic() - started < 1
+    assert not locked.is_set()
+
+
+def test_done_callback_and_await():
+    session, _ = start(0.02)
+    finished = []
+    session.add_done_callback(finished.append)
+    outcome = asyncio.run(_await(session))
+    assert outcome["reason"] == DURATION
+    assert finished == [session]
+    assert session.done()
+
+
+async def _await(session):
+    return await session
@@ -0,0 +1,82 @@
+"""
+Keystroke Pipeline Tests
+Ring buffer ordering, overflow accounting and consumer draining
+"""
+
+from keystroke_pipeline import KeystrokeConsumer, KeystrokeRingBuffer
+
+
+def test_capacity_rounds_up_to_power_of_two():
+    assert KeystrokeRingBuffer(4096).capacity == 4096
+    assert KeystrokeRingBuffer(100).capacity == 128
+    assert KeystrokeRingBuffer(1).capacity == 2
+
+
+def test_drain_yields_events_in_order_across_wraparound():
+    ring = KeystrokeRingBuffer(4)
+    seen = []
+    for round_start in range(0, 12, 3):
+        for i in range(round_start, round_start + 3):
+            assert ring.put(float(i), f"k{i}", i % 2)
+        seen.extend(ring.drain())
+    assert seen == [(float(i), f"k{i}", i % 2) for i in range(12)]
+    assert len(ring) == 0
+    assert ring.written == ring.consumed == 12
+
+
+def test_full_ring_drops_and_counts_each_overflow_once():
+    ring = KeystrokeRingBuffer(4)
+    results = [ring.put(float(i), "a", 0) for i in range(6)]
+    assert results == [True] * 4 + [False] * 2
+    assert ring.dropped == 2
+    assert ring.overflows == 1
+
+    list(ring.drain())
+    assert ring.put(9.0, "b", 0)
+    for _ in range(4):
+        ring.put(10.0, "c", 0)
+    stats = ring.get_stats()
+    assert stats["dropped"] == 3
+    assert stats["overflows"] == 2
+    assert stats["high_water"] == 4
+
+
+def test_wait_returns_immediately_when_events_are_pending_or_woken():
+    ring = KeystrokeRingBuffer(8)
+    assert not ring.wait(0.01)
+    ring.put(1.0, "a", 0)
+    assert ring.wait(0.01)
+    list(ring.drain())
+    ring.wake()
+    assert ring.wait(0.01)
+    assert not ring.wait(0.01)
+
+
+def test_consumer_handles_every_event_before_stopping():
+    ring = KeystrokeRingBuffer(64)
+    handled = []
+    consumer = KeystrokeConsumer(ring, lambda *event: handled.append(event))
+    consumer.start()
+    for i in range(50):
+        ring.put(float(i), i, 0)
+    assert consumer.flush(2.0)
+    ring.put(50.0, 50, 1)
+    consumer.stop()
+    assert not consumer.is_running
+    assert [event[1] for event in handled] == list(range(51))
+
+
+def test_consumer_survives_handler_errors():
+    ring = KeystrokeRingBuffer(8)
+    handled = []
+
+    def handler(timestamp, key, event_type):
+        if key == "bad":
+            raise ValueError(key)
+        handled.append(key)
+
+    consumer = KeystrokeConsumer(ring, handler)
+    for key in ("a", "bad", "b"):
+        ring.put(0.0, key, 0)
+    assert consumer.flush()
+    assert handled == ["a", "b"]
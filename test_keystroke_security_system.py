@@ -0,0 +1,196 @@
+"""
+Keystroke Security System Tests
+Enrolls a synthetic typist through the training screens, then authenticates them and impostors
+"""
+
+import types
+from collections import defaultdict
+import numpy as np
+import pytest
+import keystroke_security_system
+from keystroke_events import KEY_DOWN, KEY_UP
+from keystroke_security_system import KeystrokeSecuritySystem
+from typing_population import BACKSPACE_KEY, SHIFT_KEY, TypingPopulation
+
+PHRASE = "Security is not a product but a process"
+ENROLLMENTS = 5
+# Characters Tk reports in event.char for the synthetic key names
+TK_CHARS = {SHIFT_KEY: "", BACKSPACE_KEY: "\x08"}
+
+
+class FakeWidget:
+    """Stands in for every Tk widget and variable; only keeps what the system reads back"""
+
+    def __init__(self, master=None, *args, **kwargs):
+        self.master = master
+        self.text = kwargs.get("value", "")
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def get(self, *args):
+        return self.text
+
+    def delete(self, *args):
+        self.text = ""
+
+    def winfo_children(self):
+        return []
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def system(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fake_tk = types.SimpleNamespace(
+        LabelFrame=FakeWidget, Frame=FakeWidget, Label=FakeWidget, Text=FakeWidget, Button=FakeWidget,
+        OptionMenu=FakeWidget, StringVar=FakeWidget, END="end", BOTH="both", X="x", WORD="word",
+        RAISED="raised", SUNKEN="sunken", DISABLED="disabled"
+    )
+    messages = []
+    clock = Clock()
+    monkeypatch.setattr(keystroke_security_system, "tk", fake_tk)
+    monkeypatch.setattr(keystroke_security_system, "messagebox", types.SimpleNamespace(
+        showinfo=lambda title, text: messages.append(("info", title)),
+        showerror=lambda title, text: messages.append(("error", title))
+    ))
+    monkeypatch.setattr(keystroke_security_system, "time", clock)
+
+    system = object.__new__(KeystrokeSecuritySystem)
+    system.colors = defaultdict(lambda: "#000000")
+    system.training_texts = [PHRASE] * ENROLLMENTS
+    system.keystroke_patterns = {}
+    system.failed_attempts = 0
+    system.max_attempts = 3
+    system.is_authenticated = False
+    system.current_user = "alice"
+    system.training_data = []
+    system.training_index = 0
+    system.attempts_label = FakeWidget()
+    system.key_events = keystroke_security_system.KeystrokeEventBuffer()
+    system.setup_login_interface = lambda: None
+    system.grant_system_access = lambda: None
+    system.messages = messages
+    system.clock = clock
+    return system
+
+
+def correct_typings(population, profile, count, start=0):
+    """Sessions of the phrase typed without an uncorrected mistake"""
+    sessions = []
+    index = start
+    while len(sessions) < count:
+        session = population.session(profile, index, text=PHRASE)
+        if session.typed_text == PHRASE:
+            sessions.append(session)
+        index += 1
+    return sessions
+
+
+def type_session(system, session, on_press, on_release):
+    """Replay a synthetic typing through the Tk event handlers with a matching clock"""
+    start = system.clock.now + 1.0
+    for timestamp, key, event_type in session.events():
+        system.clock.now = start + timestamp
+        event = types.SimpleNamespace(char=TK_CHARS.get(key, key))
+        (on_press if event_type == KEY_DOWN else on_release)(event)
+    system.clock.now += 1.0
+
+
+def enroll(system, population, profile):
+    parent = FakeWidget()
+    system.show_training_text(parent)
+    for session in correct_typings(population, profile, ENROLLMENTS):
+        type_session(system, session, system.capture_training_keystroke, system.capture_key_release)
+        system.training_entry.text = PHRASE
+        system.complete_current_training(PHRASE)
+
+
+def attempt(system, session):
+    """One authentication attempt from a fresh auth screen; returns whether access was granted"""
+    system.is_authenticated = False
+    system.failed_attempts = 0
+    system.show_authentication_interface(FakeWidget())
+    assert len(system.key_events) == 0
+    system.auth_entry.text = PHRASE
+    type_session(system, session, system.capture_keystroke, system.on_key_release)
+    system.authenticate_user()
+    return system.is_authenticated
+
+
+def test_enrolled_typist_is_accepted_and_impostors_rejected(system):
+    population = TypingPopulation(seed=7)
+    genuine = population.profile(0)
+    enroll(system, population, genuine)
+
+    profile = system.keystroke_patterns["alice"]
+    assert len(profile["training_data"]) == ENROLLMENTS
+    assert PHRASE in profile["phrase_templates"]
+    assert ("info", "Training Complete") in system.messages
+
+    accepted = [attempt(system, session) for session in correct_typings(population, genuine, 10, start=100)]
+    impostors = [population.profile(i, impostor=True) for i in range(5)]
+    intruded = [attempt(system, session) for impostor in impostors for session in correct_typings(population, impostor, 2)]
+    assert sum(accepted) >= 6
+    assert sum(intruded) <= 1
+
+    # A rejected attempt resets the screen for the next one
+    assert not system.is_authenticated
+    assert system.failed_attempts == 1
+    assert ("error", "Authentication Failed") in system.messages
+    assert len(system.key_events) == 0
+
+
+def test_auth_screen_discards_the_last_training_phrase(system):
+    population = TypingPopulation(seed=7)
+    type_session(system, correct_typings(population, population.profile(0), 1)[0],
+                 system.capture_training_keystroke, system.capture_key_release)
+    assert len(system.key_events) > 0
+    system.show_authentication_interface(FakeWidget())
+    assert len(system.key_events) == 0
+
+
+def test_key_timing_records_pair_presses_only(system):
+    population = TypingPopulation(seed=7)
+    session = correct_typings(population, population.profile(1), 1)[0]
+    type_session(system, session, system.capture_training_keystroke, system.capture_key_release)
+    records = system.key_timing_records()
+    presses = [(timestamp, key) for timestamp, key, event_type in session.events() if event_type == KEY_DOWN]
+    assert len(records) == len(presses) - 1
+    assert [record["char"] for record in records] == [TK_CHARS.get(key, key) for _, key in presses[1:]]
+    np.testing.assert_allclose([record["interval"] for record in records], np.diff([t for t, _ in presses]), atol=1e-6)
+    assert all(record["interval"] >= 0 for record in records)
+    assert KEY_UP in system.key_events.event_types.tolist()
+
+
+def test_auth_template_is_parsed_once_per_selection(system, monkeypatch):
+    population = TypingPopulation(seed=7)
+    genuine = population.profile(0)
+    enroll(system, population, genuine)
+    system.keystroke_patterns["bob"] = dict(system.keystroke_patterns["alice"], phrase_templates={})
+
+    parsed = []
+    monkeypatch.setattr(keystroke_security_system.PhraseTemplate, "from_dict",
+                        classmethod(lambda cls, data: parsed.append(data) or object.__new__(cls)))
+    system.show_authentication_interface(FakeWidget())
+    assert len(parsed) == 1
+    cached = system.auth_template
+    system.auth_status = FakeWidget()
+    system.auth_entry.text = PHRASE[:3]
+    monkeypatch.setattr(cached.__class__, "score", lambda self, vector: float("nan"))
+    type_session(system, correct_typings(population, genuine, 1)[0], system.capture_keystroke, system.on_key_release)
+    assert len(parsed) == 1
+    assert system.auth_template is cached
+
+    # Choosing a user without a template for this text clears the cache
+    system.user_var.text = "bob"
+    system.select_auth_user()
+    assert system.auth_template is None
+    assert len(parsed) == 1
@@ -0,0 +1,58 @@
+"""
+Keystroke Storage Tests
+Batch authentication of raw sessions, extracted feature dicts and ready feature rows through one decision_function
+"""
+
+import numpy as np
+import pytest
+from keystroke_storage import NGRAM_FEATURES, KeystrokeStorage
+from typing_population import TypingPopulation
+
+
+@pytest.fixture
+def trained(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    population = TypingPopulation(seed=3)
+    genuine = population.profile(0)
+    storage = KeystrokeStorage("alice", engine="mahalanobis", backend="files")
+    storage.auto_update_model = False
+    for session in population.sessions(genuine, 8):
+        storage.save_keystroke_session(session.payload())
+    assert storage.train_model()
+    probes = list(population.sessions(genuine, 3, start=50))
+    probes += [population.session(population.profile(i, impostor=True), 0) for i in range(3)]
+    payloads = [session.payload() for session in probes]
+    return storage, payloads, storage.authenticate_typing_batch(payloads)
+
+
+def feature_dicts(storage, payloads):
+    return [dict(storage.extract_features(payload["keystrokes"]), typing_speed=payload["typing_speed"],
+                 accuracy=payload["accuracy"], duration=payload["duration"]) for payload in payloads]
+
+
+def test_session_dicts(trained):
+    storage, payloads, expected = trained
+    assert len(expected) == len(payloads)
+    assert any(authentic for authentic, _ in expected)
+    assert not all(authentic for authentic, _ in expected)
+
+
+def test_feature_dicts(trained):
+    storage, payloads, expected = trained
+    assert storage.authenticate_typing_batch(feature_dicts(storage, payloads)) == pytest.approx(expected)
+
+
+def test_feature_rows(trained):
+    storage, payloads, expected = trained
+    rows = storage.attempt_matrix(payloads)
+    assert rows.shape == (len(payloads), 9 + NGRAM_FEATURES)
+    assert storage.authenticate_typing_batch(rows.tolist()) == pytest.approx(expected)
+    assert storage.authenticate_typing_batch(rows) == pytest.approx(expected)
+
+
+def test_mixed_forms_in_one_batch(trained):
+    storage, payloads, expected = trained
+    rows = storage.attempt_matrix(payloads)
+    mixed = [payloads[0], feature_dicts(storage, payloads[1:2])[0], rows[2].tolist()]
+    assert storage.authenticate_typing_batch(mixed) == pytest.approx(expected[:3])
+    assert storage.authenticate_typing_batch(np.empty((0, rows.shape[1]))) == []
@@ -0,0 +1,124 @@
+"""
+Model Artifact Tests
+Array/header round-trips, format checks and exported engines scoring like the fitted ones
+"""
+
+import json
+import threading
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from model_artifact import (ARTIFACT_ALIGNMENT, SchemaMismatchError, _PREFIX, load_artifact,
+                            read_header, write_artifact)
+from scoring_engines import create_engine, export_engine, load_engine
+
+SCHEMA = {"features": ["a", "b", "c"], "ngrams": []}
+
+
+def sample_arrays():
+    return {
+        "ints": np.arange(7, dtype=np.int32),
+        "matrix": np.linspace(0, 1, 12).reshape(3, 4),
+        "flags": np.array([True, False, True]),
+        "empty": np.zeros(0, dtype=np.float64),
+    }
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_arrays_and_header_round_trip(tmp_path, mmap):
+    path = str(tmp_path / "model.ksm")
+    arrays = sample_arrays()
+    write_artifact(path, arrays, {"engine": "test", "schema": SCHEMA, "threshold": 0.25, "metadata": {"n": 3}})
+
+    header, loaded = load_artifact(path, SCHEMA, mmap=mmap)
+    assert header["engine"] == "test"
+    assert header["threshold"] == 0.25
+    assert header["metadata"] == {"n": 3}
+    assert set(loaded) == set(arrays)
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        np.testing.assert_array_equal(loaded[name], array)
+        assert not loaded[name].flags.writeable
+        assert (header["data_start"] + header["arrays"][name]["offset"]) % ARTIFACT_ALIGNMENT == 0
+
+
+def test_write_leaves_no_temporary_file(tmp_path):
+    path = str(tmp_path / "model.ksm")
+    write_artifact(path, sample_arrays(), {"engine": "test"})
+    write_artifact(path, {"ints": np.arange(3)}, {"engine": "test"})
+    assert [p.name for p in tmp_path.iterdir()] == ["model.ksm"]
+    assert set(load_artifact(path)[1]) == {"ints"}
+
+
+def test_concurrent_writers_never_share_a_temporary_file(tmp_path):
+    path = str(tmp_path / "model.ksm")
+    errors = []
+
+    def writer(value):
+        try:
+            for _ in range(20):
+                write_artifact(path, {"values": np.full(5000, value)}, {"engine": "test"})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    values = load_artifact(path, mmap=False)[1]["values"]
+    assert len(set(values.tolist())) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["model.ksm"]
+
+
+def test_foreign_file_is_rejected(tmp_path):
+    path = tmp_path / "model.pkl"
+    path.write_bytes(b"not a model at all")
+    with pytest.raises(ValueError):
+        read_header(str(path))
+    (tmp_path / "short").write_bytes(b"KS")
+    with pytest.raises(ValueError):
+        read_header(str(tmp_path / "short"))
+
+
+def test_unknown_version_is_rejected(tmp_path):
+    path = str(tmp_path / "model.ksm")
+    write_artifact(path, {}, {"engine": "test"})
+    with open(path, 'rb') as f:
+        magic, length = _PREFIX.unpack(f.read(_PREFIX.size))
+        header = json.loads(f.read(length))
+    header["format_version"] = 99
+    header_bytes = json.dumps(header).encode("utf-8")
+    with open(path, 'wb') as f:
+        f.write(_PREFIX.pack(magic, len(header_bytes)) + header_bytes)
+    with pytest.raises(ValueError, match="version 99"):
+        read_header(path)
+
+
+def test_schema_mismatch_is_raised_before_loading(tmp_path):
+    path = str(tmp_path / "model.ksm")
+    write_artifact(path, sample_arrays(), {"engine": "test", "schema": SCHEMA})
+    with pytest.raises(SchemaMismatchError):
+        load_artifact(path, dict(SCHEMA, features=["a", "b"]))
+    with pytest.raises(SchemaMismatchError):
+        load_engine(path, {"features": []})
+
+
+@pytest.mark.parametrize("engine", ["isolation_forest", "mahalanobis", "scaled_manhattan"])
+def test_exported_engine_scores_like_the_fitted_one(tmp_path, engine):
+    rng = np.random.default_rng(5)
+    X = rng.normal([0.1, 0.02, 0.15], [0.01, 0.005, 0.03], size=(60, 3))
+    probes = np.vstack([X[:10], rng.normal([0.3, 0.1, 0.5], 0.05, size=(10, 3))])
+    scaler = StandardScaler().fit(X)
+    model = create_engine(engine).fit(scaler.transform(X))
+    path = str(tmp_path / f"{engine}.ksm")
+
+    export_engine(model, scaler, path, threshold=0.1, schema=SCHEMA, metadata={"samples": 60})
+    scorer = load_engine(path, SCHEMA)
+    assert read_header(path)["engine"] == engine
+    assert scorer.threshold == 0.1
+    assert scorer.metadata == {"samples": 60}
+    np.testing.assert_allclose(scorer.scaler.transform(probes), scaler.transform(probes))
+    np.testing.assert_allclose(scorer.decision_function(scaler.transform(probes)),
+                               model.decision_function(scaler.transform(probes)), rtol=1e-9, atol=1e-12)
@@ -0,0 +1,82 @@
+"""
+Sequential Authentication Tests
+Wald bounds, the log-likelihood ratio and early accept/reject decisions
+"""
+
+import math
+import pytest
+from keystroke_events import KEY_DOWN, KEY_UP
+from sequential_auth import ACCEPT, REJECT, SequentialAuthenticator
+
+
+def authenticator(**settings):
+    return SequentialAuthenticator(0.10, 0.02, 0.15, 0.04, **settings)
+
+
+def type_keys(auth, dwell, flight, count, start=0.0):
+    """Feed `count` presses with fixed dwell and flight times; returns the final timestamp"""
+    t = start
+    for i in range(count):
+        key = "abcdefghij"[i % 10]
+        auth.on_event(t, key, KEY_DOWN)
+        auth.on_event(t + dwell, key, KEY_UP)
+        t += dwell + flight
+    return t
+
+
+def test_wald_bounds():
+    auth = authenticator(far=0.01, frr=0.05)
+    assert auth.accept_bound == pytest.approx(math.log(0.95 / 0.01))
+    assert auth.reject_bound == pytest.approx(math.log(0.05 / 0.99))
+    assert auth.reject_bound < 0 < auth.accept_bound
+
+
+def test_rejects_non_positive_spreads():
+    with pytest.raises(ValueError):
+        SequentialAuthenticator(0.1, 0.0, 0.15, 0.04)
+
+
+def test_side_llr_is_stable_for_large_sums():
+    auth = authenticator()
+    shift = auth.min_shift
+    assert auth.side_llr(4, 0.0) == pytest.approx(4 * shift * shift / 2)
+    assert auth.side_llr(3, 1.5) == pytest.approx(3 * shift * shift / 2 - math.log(math.cosh(shift * 1.5)))
+    assert math.isfinite(auth.side_llr(10, 5000.0))
+
+
+def test_accepts_the_enrolled_rhythm_early():
+    auth = authenticator()
+    type_keys(auth, 0.10, 0.15, 60)
+    assert auth.wait(0) == ACCEPT
+    assert auth.get_status()["keystrokes"] < 60
+    assert auth.decided.is_set()
+
+
+def test_rejects_a_shifted_rhythm():
+    auth = authenticator()
+    type_keys(auth, 0.16, 0.30, 60)
+    assert auth.wait(0) == REJECT
+
+
+def test_waits_for_min_keystrokes_before_deciding():
+    auth = authenticator(min_keystrokes=15)
+    type_keys(auth, 0.10, 0.15, 14)
+    assert auth.decision is None
+    type_keys(auth, 0.10, 0.15, 1, start=10.0)
+    assert auth.decision == ACCEPT
+
+
+def test_one_long_pause_is_capped():
+    auth = authenticator()
+    end = type_keys(auth, 0.10, 0.15, 5)
+    auth.on_event(end + 30.0, "z", KEY_DOWN)
+    assert auth.sums["flight"] == pytest.approx(auth.max_deviation)
+
+
+def test_reset_clears_the_decision():
+    auth = authenticator()
+    type_keys(auth, 0.16, 0.30, 60)
+    auth.reset()
+    assert auth.decision is None
+    assert not auth.decided.is_set()
+    assert auth.get_status()["llr"] == 0.0
@@ -0,0 +1,143 @@
+"""
+Session Database Tests
+Event BLOB round-trips and the SQLite session, profile and attempt store
+"""
+
+import json
+import pytest
+from session_database import (EVENTS_MAGIC, SQLiteSessionStore, SessionDatabase, decode_events, encode_events)
+from session_log import LEGACY_SESSIONS_NAME
+
+
+def keystrokes(count=6, start=1000.25):
+    events = []
+    for i in range(count):
+        key = "hello world"[i % 11]
+        events.append({"key": key, "type": "down", "timestamp": start + 0.2 * i})
+        events.append({"key": key, "type": "up", "timestamp": start + 0.2 * i + 0.08})
+    return events
+
+
+def session(i, **extra):
+    return dict({"session_id": i, "timestamp": f"2025-02-{i + 1:02d}T09:00:00", "text_typed": "hello",
+                 "typing_speed": 50.0 + i, "accuracy": 95.0, "session_duration": 3.5,
+                 "keystrokes": keystrokes(start=1000.0 + i), "features": {"avg_dwell_time": 0.08}}, **extra)
+
+
+@pytest.fixture
+def database(tmp_path):
+    return SessionDatabase(str(tmp_path / "keystrokes.db"))
+
+
+@pytest.mark.parametrize("events", [
+    [],
+    keystrokes(),
+    [{"key": "a", "type": "down", "timestamp": 1}, {"key": "a", "type": "up", "timestamp": 2}],
+    [{"key": "Key.shift", "type": "press", "timestamp": 5.5}, {"key": "x", "type": "release", "timestamp": 5.6}],
+    [{"key": "a", "type": "keydown", "code": "KeyA", "ctrlKey": False, "shiftKey": True, "altKey": False,
+      "timestamp": 1.5}],
+])
+def test_events_round_trip_as_columns(events):
+    blob = encode_events(events)
+    assert blob[:4] == EVENTS_MAGIC
+    decoded = decode_events(blob)
+    assert decoded == events
+    assert [list(event) for event in decoded] == [list(event) for event in events]
+    assert [type(event["timestamp"]) for event in decoded] == [type(event["timestamp"]) for event in events]
+
+
+@pytest.mark.parametrize("events", [
+    [{"key": "a", "type": "down", "timestamp": 1.0}, {"key": "a", "type": "up"}],
+    [{"key": "a", "type": "down", "timestamp": "soon"}],
+    [{"key": ["a"], "type": "down", "timestamp": 1.0}],
+    [{"key": "a", "type": "down", "timestamp": 1.0}, {"type": "up", "key": "a", "timestamp": 2.0}],
+])
+def test_irregular_events_fall_back_to_json(events):
+    assert decode_events(encode_events(events)) == events
+
+
+def test_columns_are_smaller_than_json():
+    events = keystrokes(200)
+    assert len(encode_events(events)) < len(json.dumps(events)) / 3
+
+
+def test_foreign_blob_is_rejected():
+    with pytest.raises(ValueError):
+        decode_events(b"JSON[]")
+
+
+def test_store_round_trip_and_order(database):
+    store = SQLiteSessionStore(database, "alice")
+    assert not store.exists
+    sessions = [session(i, source="web") for i in range(3)]
+    for i, s in enumerate(sessions):
+        assert store.append(s) == i
+    assert len(store) == 3
+    assert list(store) == sessions
+    assert store.get(1) == sessions[1]
+    assert list(store.iter_sessions(2)) == sessions[2:]
+    with pytest.raises(IndexError):
+        store.get(3)
+
+
+def test_users_are_kept_apart(database):
+    alice, bob = SQLiteSessionStore(database, "alice"), SQLiteSessionStore(database, "bob")
+    alice.append(session(0))
+    bob.append(session(1))
+    bob.append(session(2))
+    assert len(alice) == 1 and len(bob) == 2
+    assert database.user_ids() == ["alice", "bob"]
+    assert [s["session_id"] for s in database.iter_other_sessions("alice")] == [1, 2]
+
+
+def test_rewrite_replaces_and_bumps_the_stamp(database):
+    store = SQLiteSessionStore(database, "alice")
+    store.append(session(0))
+    stamp = store.stamp()
+    store.rewrite([session(5), session(6)])
+    assert [s["session_id"] for s in store] == [5, 6]
+    assert store.stamp() != stamp
+
+
+def test_training_rows_skip_events_when_ngrams_are_stored(database):
+    store = SQLiteSessionStore(database, "alice")
+    store.append(session(0, features={"ngram_timings": []}))
+    store.append(session(1))
+    rows = list(store.training_rows())
+    assert "keystrokes" not in rows[0][1]
+    assert rows[1][1]["keystrokes"] == session(1)["keystrokes"]
+    assert len({content_hash for content_hash, _ in rows}) == 2
+
+
+def test_time_range_and_summary(database):
+    store = SQLiteSessionStore(database, "alice")
+    for i in range(4):
+        store.append(session(i))
+    assert [s["session_id"] for s in store.sessions_between("2025-02-02", "2025-02-04")] == [1, 2]
+    summary = store.summary()
+    assert summary["sessions"] == 4
+    assert summary["best_typing_speed"] == 53.0
+    assert summary["first_typing_speed"] == 50.0 and summary["last_typing_speed"] == 53.0
+
+
+def test_profiles_and_attempts(database):
+    assert database.load_profile("alice") is None
+    database.save_profile("alice", {"is_trained": False})
+    database.save_profile("alice", {"is_trained": True})
+    assert database.load_profile("alice") == {"is_trained": True}
+
+    database.record_attempts("alice", [(True, 0.9), (False, 0.2), (True, 0.7)], engine="mahalanobis")
+    summary = database.attempt_summary("alice")
+    assert summary["total"] == 3 and summary["accepted"] == 2 and summary["rejected"] == 1
+    assert summary["avg_confidence"] == pytest.approx(0.6)
+    assert database.attempt_summary("bob")["total"] == 0
+
+
+def test_import_files_copies_once(database, tmp_path):
+    user_dir = tmp_path / "alice"
+    user_dir.mkdir()
+    (user_dir / LEGACY_SESSIONS_NAME).write_text(json.dumps([session(0), session(1)]))
+    store = SQLiteSessionStore(database, "alice")
+    assert store.import_files(str(user_dir)) == 2
+    assert store.import_files(str(user_dir)) is None
+    assert list(store) == [session(0), session(1)]
@@ -0,0 +1,120 @@
+"""
+Session Log Tests
+Appends, the offset index, torn tails, rewrites and legacy keystrokes.json migration
+"""
+
+import json
+import os
+import pytest
+from session_log import (LEGACY_SESSIONS_NAME, SESSION_INDEX_NAME, SESSION_LOG_NAME, SessionLog,
+                         has_sessions, load_user_sessions)
+
+
+def session(i):
+    return {"session_id": i, "timestamp": f"2025-01-{i + 1:02d}T10:00:00", "typing_speed": 40 + i,
+            "accuracy": 90 + i % 5, "keystrokes": [{"key": "a", "type": "down", "timestamp": float(i)}]}
+
+
+def test_append_get_and_iterate(tmp_path):
+    log = SessionLog(str(tmp_path))
+    assert not log.exists and len(log) == 0 and list(log) == []
+    for i in range(5):
+        assert log.append(session(i)) == i
+    assert len(log) == 5
+    assert log.get(3) == session(3)
+    assert log.get(-1) == session(4)
+    assert list(log) == [session(i) for i in range(5)]
+    assert list(log.iter_sessions(3)) == [session(3), session(4)]
+    assert list(log.iter_sessions(9)) == []
+
+
+def test_a_new_reader_uses_the_index(tmp_path):
+    writer = SessionLog(str(tmp_path))
+    for i in range(4):
+        writer.append(session(i))
+    reader = SessionLog(str(tmp_path))
+    assert len(reader) == 4
+    assert reader._indexed == 4
+    assert reader.get(2) == session(2)
+
+
+def test_another_writers_appends_are_picked_up(tmp_path):
+    first, second = SessionLog(str(tmp_path)), SessionLog(str(tmp_path))
+    first.append(session(0))
+    assert len(second) == 1
+    second.append(session(1))
+    assert len(first) == 2
+    assert first.get(1) == session(1)
+
+
+def test_stale_or_missing_index_is_rebuilt_by_scanning(tmp_path):
+    log = SessionLog(str(tmp_path))
+    for i in range(3):
+        log.append(session(i))
+    os.remove(tmp_path / SESSION_INDEX_NAME)
+    assert SessionLog(str(tmp_path)).get(2) == session(2)
+
+    (tmp_path / SESSION_INDEX_NAME).write_bytes(b"garbage")
+    reader = SessionLog(str(tmp_path))
+    assert len(reader) == 3
+    assert reader._indexed is None
+    reader.append(session(3))
+    fresh = SessionLog(str(tmp_path))
+    assert len(fresh) == 4
+    assert fresh._indexed == 4
+
+
+def test_torn_tail_is_skipped_and_cut_off_by_the_next_append(tmp_path):
+    log = SessionLog(str(tmp_path))
+    log.append(session(0))
+    with open(tmp_path / SESSION_LOG_NAME, 'ab') as f:
+        f.write(b'{"session_id": 1, "timest')
+    reader = SessionLog(str(tmp_path))
+    assert len(reader) == 1
+    assert list(reader) == [session(0)]
+    reader.append(session(2))
+    assert list(SessionLog(str(tmp_path))) == [session(0), session(2)]
+
+
+def test_rewrite_replaces_everything_under_a_new_generation(tmp_path):
+    log = SessionLog(str(tmp_path))
+    for i in range(3):
+        log.append(session(i))
+    generation = log._generation
+    log.rewrite([session(7)])
+    assert log._generation != generation
+    assert len(log) == 1
+    assert list(SessionLog(str(tmp_path))) == [session(7)]
+    assert sorted(os.listdir(tmp_path)) == [SESSION_INDEX_NAME, SESSION_LOG_NAME]
+
+
+def test_foreign_file_is_rejected(tmp_path):
+    (tmp_path / SESSION_LOG_NAME).write_text('{"format": "other"}\n')
+    with pytest.raises(ValueError):
+        len(SessionLog(str(tmp_path)))
+
+
+def test_migrate_legacy_keystrokes_json(tmp_path):
+    legacy = tmp_path / LEGACY_SESSIONS_NAME
+    legacy.write_text(json.dumps([session(0), session(1)]))
+    assert has_sessions(str(tmp_path))
+    assert load_user_sessions(str(tmp_path)) == [session(0), session(1)]
+
+    log = SessionLog(str(tmp_path))
+    assert log.migrate_legacy(str(legacy)) == 2
+    assert not legacy.exists()
+    assert (tmp_path / (LEGACY_SESSIONS_NAME + ".migrated")).exists()
+    assert list(log) == [session(0), session(1)]
+    assert log.migrate_legacy(str(legacy)) is None
+    assert load_user_sessions(str(tmp_path)) == [session(0), session(1)]
+
+
+def test_summary_and_time_range(tmp_path):
+    log = SessionLog(str(tmp_path))
+    for i in range(4):
+        log.append(session(i))
+    summary = log.summary()
+    assert summary["sessions"] == 4
+    assert summary["best_typing_speed"] == 43
+    assert summary["first_typing_speed"] == 40 and summary["last_typing_speed"] == 43
+    assert [s["session_id"] for s in log.sessions_between("2025-01-02", "2025-01-04")] == [1, 2]
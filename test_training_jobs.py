@@ -0,0 +1,170 @@
+"""
+Training Job Tests
+Per-user coalescing, hand-off to the pending job and completion reporting, with an in-process executor
+"""
+
+import queue
+from concurrent.futures import Future
+import pytest
+from keystroke_storage import KeystrokeStorage, MODEL_PROFILE_FIELDS
+from training_jobs import TrainingJobManager, run_training_job
+from typing_population import TypingPopulation
+
+
+class ManualExecutor:
+    """Records submitted calls and leaves their futures for the test to resolve"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.calls.append((fn, args, future))
+        return future
+
+    def resolve(self, index, result=None, error=None):
+        future = self.calls[index][2]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def result(success=True, accuracy=0.9):
+    return {"success": success, "accuracy": accuracy, "is_trained": success, "engine": "mahalanobis",
+            "training_sessions": 5, "model_profile": {"is_trained": success} if success else None}
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    completed = []
+    manager = TrainingJobManager(on_complete=completed.append, keep_finished=3)
+    executor = ManualExecutor()
+
+    def start_pool():
+        manager._executor = executor
+
+    monkeypatch.setattr(manager, "_start_pool", start_pool)
+    manager.executor = executor
+    manager.completed = completed
+    return manager
+
+
+def test_first_request_runs_in_a_worker(jobs):
+    job, coalesced = jobs.submit("alice")
+    assert not coalesced
+    assert job["status"] == "running"
+    fn, args, _ = jobs.executor.calls[0]
+    assert fn is run_training_job
+    assert args[:2] == (job["job_id"], "alice")
+    assert jobs.running == {"alice": job["job_id"]}
+
+
+def test_requests_during_a_run_fold_into_one_pending_job(jobs):
+    running, _ = jobs.submit("alice")
+    pending, coalesced = jobs.submit("alice")
+    assert not coalesced and pending["status"] == "pending"
+    again, coalesced = jobs.submit("alice")
+    assert coalesced
+    assert again["job_id"] == pending["job_id"]
+    assert jobs.get(pending["job_id"])["requests"] == 2
+    assert len(jobs.executor.calls) == 1
+
+
+def test_users_train_in_parallel(jobs):
+    jobs.submit("alice")
+    bob, coalesced = jobs.submit("bob")
+    assert not coalesced and bob["status"] == "running"
+    assert len(jobs.executor.calls) == 2
+
+
+def test_pending_job_starts_when_the_running_one_finishes(jobs):
+    running, _ = jobs.submit("alice")
+    pending, _ = jobs.submit("alice")
+    jobs.executor.resolve(0, result())
+
+    finished = jobs.get(running["job_id"])
+    assert finished["status"] == "completed"
+    assert finished["accuracy"] == 0.9
+    assert finished["progress"] == 1.0
+    assert jobs.get(pending["job_id"])["status"] == "running"
+    assert jobs.running == {"alice": pending["job_id"]} and not jobs.pending
+    assert [job["job_id"] for job in jobs.completed] == [running["job_id"]]
+    assert jobs.completed[0]["result"]["model_profile"] == {"is_trained": True}
+
+    follow_up, coalesced = jobs.submit("alice")
+    assert not coalesced and follow_up["status"] == "pending"
+
+
+def test_failures_are_reported(jobs):
+    first, _ = jobs.submit("alice")
+    jobs.executor.resolve(0, result(success=False))
+    assert jobs.get(first["job_id"])["status"] == "failed"
+    assert "training sessions" in jobs.get(first["job_id"])["error"]
+
+    second, _ = jobs.submit("alice")
+    jobs.executor.resolve(1, error=RuntimeError("worker died"))
+    assert jobs.get(second["job_id"])["error"] == "worker died"
+    assert [job["status"] for job in jobs.completed] == ["failed", "failed"]
+    assert not jobs.running
+
+
+def test_completion_handler_errors_do_not_break_the_queue(jobs):
+    def broken(job):
+        raise ValueError("handler")
+
+    jobs.on_complete = broken
+    jobs.submit("alice")
+    pending, _ = jobs.submit("alice")
+    jobs.executor.resolve(0, result())
+    assert jobs.get(pending["job_id"])["status"] == "running"
+
+
+def test_only_recent_finished_jobs_are_kept(jobs):
+    ids = []
+    for i in range(5):
+        job, _ = jobs.submit("alice")
+        ids.append(job["job_id"])
+        jobs.executor.resolve(i, result())
+    assert [job_id for job_id in ids if jobs.get(job_id) is not None] == ids[-3:]
+    assert jobs.get("unknown") is None
+
+
+def test_worker_trains_and_hands_back_the_model_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    population = TypingPopulation(seed=3)
+    typist = population.profile(0)
+    storage = KeystrokeStorage("alice", engine="mahalanobis", backend="files")
+    for session in population.sessions(typist, 6):
+        storage.save_keystroke_session(session.payload())
+
+    progress = queue.Queue()
+    outcome = run_training_job("job1", "alice", progress)
+    assert outcome["success"] and outcome["is_trained"]
+    assert set(outcome["model_profile"]) == set(MODEL_PROFILE_FIELDS)
+    assert outcome["model_profile"]["is_trained"] is True
+    assert not progress.empty()
+    assert progress.get()[0] == "job1"
+
+
+def test_sessions_saved_after_a_job_keep_the_workers_model_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    population = TypingPopulation(seed=3)
+    typist = population.profile(0)
+    storage = KeystrokeStorage("alice", engine="mahalanobis", backend="files")
+    sessions = list(population.sessions(typist, 7))
+    for session in sessions[:6]:
+        storage.save_keystroke_session(session.payload())
+
+    outcome = run_training_job("job1", "alice", queue.Queue())
+    storage.adopt_trained_model(outcome["model_profile"])
+    storage.save_keystroke_session(sessions[6].payload())
+
+    stored = KeystrokeStorage("alice", engine="mahalanobis", backend="files").profile
+    for field in ("is_trained", "model_engine", "model_ngrams"):
+        assert stored[field] == outcome["model_profile"][field]
+    assert stored["training_sessions"] == 7
+    assert stored["model_updates"] == 1
@@ -0,0 +1,81 @@
+"""
+Typing Statistics Tests
+Welford moments, P² medians and sliding windows against numpy
+"""
+
+import math
+import numpy as np
+import pytest
+from typing_statistics import P2Quantile, RunningStats, SlidingWindowStats
+
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(1).gamma(2.0, 0.05, size=500)
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(np.mean(values))
+    assert stats.variance == pytest.approx(np.var(values))
+    assert stats.std == pytest.approx(np.std(values))
+    assert stats.min == values.min()
+    assert stats.max == values.max()
+
+
+def test_running_stats_stay_stable_with_a_large_offset():
+    values = 1e9 + np.random.default_rng(2).normal(0, 0.01, size=1000)
+    stats = RunningStats()
+    for x in values:
+        stats.add(x)
+    assert stats.variance == pytest.approx(np.var(values), rel=1e-4)
+
+
+def test_running_stats_reset_and_empty_state():
+    stats = RunningStats()
+    assert stats.variance == 0.0
+    assert math.isnan(stats.median)
+    stats.add(3.0)
+    stats.reset()
+    assert stats.count == 0
+    assert stats.min == math.inf
+    assert math.isnan(stats.median)
+
+
+def test_summary_uses_prefix():
+    stats = RunningStats()
+    for x in (1.0, 2.0, 3.0):
+        stats.add(x)
+    summary = stats.summary("hold_")
+    assert summary["hold_count"] == 3
+    assert summary["hold_median"] == 2.0
+    assert set(summary) == {f"hold_{name}" for name in ("count", "mean", "std", "median", "min", "max", "variance")}
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 5])
+def test_p2_is_exact_for_the_first_five_values(count):
+    values = [0.3, 0.1, 0.5, 0.2, 0.4][:count]
+    estimate = P2Quantile(0.5)
+    for x in values:
+        estimate.add(x)
+    assert estimate.value == pytest.approx(np.quantile(values, 0.5))
+
+
+@pytest.mark.parametrize("p", [0.25, 0.5, 0.9])
+def test_p2_tracks_numpy_quantiles(p):
+    values = np.random.default_rng(3).lognormal(-2.0, 0.4, size=5000)
+    estimate = P2Quantile(p)
+    for x in values:
+        estimate.add(x)
+    assert estimate.value == pytest.approx(np.quantile(values, p), rel=0.03)
+
+
+def test_sliding_window_matches_the_last_values():
+    values = np.random.default_rng(4).normal(0.12, 0.03, size=257)
+    window = SlidingWindowStats(50)
+    for x in values:
+        window.add(x)
+    assert len(window) == 50
+    assert window.mean == pytest.approx(np.mean(values[-50:]))
+    assert window.std == pytest.approx(np.std(values[-50:]))
+    window.clear()
+    assert window.mean == 0.0 and window.std == 0.0
@@ -0,0 +1,181 @@
+"""
+Background Training Jobs
+Runs KeystrokeStorage.train_model in worker processes with per-user coalescing and progress
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+def run_training_job(job_id, user_id, progress_queue):
+    """Worker-process entry point: train one user's model and report progress"""
+    from keystroke_storage import KeystrokeStorage, MODEL_PROFILE_FIELDS
+
+    def progress(stage, fraction):
+        progress_queue.put((job_id, stage, fraction))
+
+    storage = KeystrokeStorage(user_id)
+    success = storage.train_model(progress=progress)
+    return {
+        "success": success,
+        "accuracy": storage.profile.get("model_accuracy", 0.0),
+        "is_trained": storage.profile.get("is_trained", False),
+        "engine": storage.profile.get("model_engine"),
+        "training_sessions": storage.profile.get("training_sessions", 0),
+        # Merged into the server's cached profile, which may have saved sessions meanwhile
+        "model_profile": {field: storage.profile.get(field) for field in MODEL_PROFILE_FIELDS} if success else None
+    }
+
+
+class TrainingJobManager:
+    """Queue of training jobs, at most one running per user
+
+    A request for a user whose model is already training is folded into a
+    single pending job that starts when the running one finishes; further
+    requests return that pending job's id. Jobs for different users run in
+    parallel up to max_workers.
+    """
+
+    def __init__(self, max_workers=2, on_complete=None, keep_finished=100):
+        self.max_workers = max_workers
+        self.on_complete = on_complete
+        self.keep_finished = keep_finished
+        self.jobs = OrderedDict()  # job_id -> job dict
+        self.running = {}  # user_id -> job_id
+        self.pending = {}  # user_id -> job_id
+        # Re-entrant: a future that is already done runs its callback inside submit()
+        self._lock = threading.RLock()
+        self._executor = None
+        self._manager = None
+        self._progress_queue = None
+        self._progress_thread = None
+
+    def _start_pool(self):
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._progress_queue = self._manager.Queue()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._progress_thread = threading.Thread(target=self._read_progress, name="training-progress", daemon=True)
+            self._progress_thread.start()
+
+    def submit(self, user_id):
+        """Request a training run; returns (job, coalesced)"""
+        with self._lock:
+            pending_id = self.pending.get(user_id)
+            if pending_id is not None:
+                job = self.jobs[pending_id]
+                job["requests"] += 1
+                return dict(job), True
+
+            job = {
+                "job_id": uuid.uuid4().hex[:12],
+                "user_id": user_id,
+                "status": "queued",
+                "stage": "queued",
+                "progress": 0.0,
+                "requests": 1,
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "duration": None,
+                "accuracy": None,
+                "result": None,
+                "error": None
+            }
+            self.jobs[job["job_id"]] = job
+
+            if user_id in self.running:
+                job["status"] = job["stage"] = "pending"
+                self.pending[user_id] = job["job_id"]
+            else:
+                self._launch(job)
+            return dict(job), False
+
+    def _launch(self, job):
+        # Caller holds the lock
+        self._start_pool()
+        job["status"] = "running"
+        job["stage"] = "starting"
+        job["started"] = time.time()
+        self.running[job["user_id"]] = job["job_id"]
+        future = self._executor.submit(run_training_job, job["job_id"], job["user_id"], self._progress_queue)
+        future.add_done_callback(lambda f, job_id=job["job_id"]: self._finish(job_id, f))
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            job = self.jobs[job_id]
+            job["finished"] = time.time()
+            job["duration"] = job["finished"] - job["started"]
+            try:
+                result = future.result()
+                job["result"] = result
+                job["accuracy"] = result["accuracy"]
+                job["status"] = "completed" if result["success"] else "failed"
+                if not result["success"]:
+                    job["error"] = "Model training failed. Need at least 3 training sessions."
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+            job["stage"] = job["status"]
+            job["progress"] = 1.0
+
+            user_id = job["user_id"]
+            self.running.pop(user_id, None)
+            next_id = self.pending.pop(user_id, None)
+            if next_id is not None:
+                try:
+                    self._launch(self.jobs[next_id])
+                except RuntimeError as e:
+                    # Pool already shut down
+                    self.running.pop(user_id, None)
+                    self.jobs[next_id].update(status="failed", stage="failed", error=str(e), finished=time.time())
+            self._prune()
+            finished = dict(job)
+
+        if self.on_complete:
+            try:
+                self.on_complete(finished)
+            except Exception as e:
+                print(f"❌ Training completion handler error: {e}")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["finished"] is not None]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    def _read_progress(self):
+        while True:
+            try:
+                job_id, stage, fraction = self._progress_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is not None and job["status"] == "running":
+                    job["stage"] = stage
+                    job["progress"] = fraction
+
+    def get(self, job_id):
+        """Get a snapshot of a job, or None if unknown"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        if job["status"] == "running":
+            job["elapsed"] = time.time() - job["started"]
+        return job
+
+    def shutdown(self):
+        """Stop accepting work and wait for running jobs"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._manager.shutdown()
+            self._executor = None
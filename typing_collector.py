@@ -1,115 +1,181 @@
 import time
+import threading
 import numpy as np
 from pynput import keyboard
 import json
 import os
 from datetime import datetime
+from keystroke_events import KeystrokeEventBuffer, KEY_DOWN, KEY_UP
+from keystroke_pipeline import KeystrokeRingBuffer, KeystrokeConsumer, key_name
+from typing_statistics import RunningStats
+from collection_session import CollectionSession, ESCAPE, STOPPED
 
 class TypingPatternCollector:
     def __init__(self):
-        self.key_times = []
-        self.key_intervals = []
-        self.key_hold_times = []
+        self.events = KeystrokeEventBuffer()
+        self.ring = KeystrokeRingBuffer()
+        self.consumer = KeystrokeConsumer(self.ring, self.process_event)
         self.current_key_down = {}
+        self.first_press_time = None
+        self.last_press_time = None
+        self.press_count = 0
+        self.interval_stats = RunningStats()
+        self.hold_stats = RunningStats()
         self.is_collecting = False
         self.collected_data = []
+        self.listener = None
+        self.session = None
+        self._stop_lock = threading.Lock()
+        
+    @property
+    def key_times(self):
+        """Timestamp of every key press"""
+        self.consumer.flush()
+        return self.events.press_times()
+        
+    @property
+    def key_intervals(self):
+        """Interval between consecutive key presses"""
+        return np.diff(self.key_times)
+        
+    @property
+    def key_hold_times(self):
+        """Time each key is held down"""
+        self.consumer.flush()
+        return self.events.hold_times()
         
     def on_key_press(self, key):
         if not self.is_collecting:
             return
             
-        current_time = time.time()
-        try:
-            key_char = key.char if hasattr(key, 'char') and key.char else str(key)
-        except AttributeError:
-            key_char = str(key)
-            
-        self.current_key_down[key_char] = current_time
-        
-        # Calculate interval between keystrokes
-        if len(self.key_times) > 0:
-            interval = current_time - self.key_times[-1]
-            self.key_intervals.append(interval)
-            
-        self.key_times.append(current_time)
+        # Only hand the raw event off; the consumer thread does the rest
+        self.ring.put(time.time(), key, KEY_DOWN)
         
     def on_key_release(self, key):
         if not self.is_collecting:
             return
             
-        current_time = time.time()
-        try:
-            key_char = key.char if hasattr(key, 'char') and key.char else str(key)
-        except AttributeError:
-            key_char = str(key)
-            
-        if key_char in self.current_key_down:
-            hold_time = current_time - self.current_key_down[key_char]
-            self.key_hold_times.append(hold_time)
-            del self.current_key_down[key_char]
+        self.ring.put(time.time(), key, KEY_UP)
             
         # Stop collection on ESC key
         if key == keyboard.Key.esc:
-            self.stop_collection()
+            self.stop_collection(ESCAPE)
             return False
             
+    def process_event(self, timestamp, key, event_type):
+        """Resolve and record one raw key event (runs on the consumer thread)"""
+        key_char = key_name(key)
+        self.events.append(timestamp, key_char, event_type)
+        
+        if event_type == KEY_DOWN:
+            self.current_key_down[key_char] = timestamp
+            
+            # Interval between keystrokes
+            if self.last_press_time is not None:
+                self.interval_stats.add(timestamp - self.last_press_time)
+            else:
+                self.first_press_time = timestamp
+                
+            self.last_press_time = timestamp
+            self.press_count += 1
+        else:
+            press_time = self.current_key_down.pop(key_char, None)
+            if press_time is not None:
+                self.hold_stats.add(timestamp - press_time)
+            
     def start_collection(self, duration=30):
         """Start collecting typing patterns for specified duration (seconds)"""
+        # Wait for duration or ESC key
+        return self.start_session(duration).result()
+        
+    def start_session(self, duration=30, cancel_event=None):
+        """Start collecting without blocking; returns the CollectionSession to join or await"""
         print(f"Starting typing pattern collection for {duration} seconds...")
         print("Type naturally. Press ESC to stop early.")
         
-        self.key_times = []
-        self.key_intervals = []
-        self.key_hold_times = []
+        self.stop_collection()
+        self.events.clear()
         self.current_key_down = {}
-        self.is_collecting = True
+        self.first_press_time = None
+        self.last_press_time = None
+        self.press_count = 0
+        self.interval_stats.reset()
+        self.hold_stats.reset()
+        self.ring = KeystrokeRingBuffer()
+        self.consumer = KeystrokeConsumer(self.ring, self.process_event)
+        self.consumer.start()
         
         # Start keyboard listener
-        listener = keyboard.Listener(
+        self.listener = keyboard.Listener(
             on_press=self.on_key_press,
             on_release=self.on_key_release
         )
-        listener.start()
+        self.listener.start()
         
-        # Wait for duration or ESC key
-        start_time = time.time()
-        while self.is_collecting and (time.time() - start_time) < duration:
-            time.sleep(0.1)
-            
-        self.stop_collection()
-        listener.stop()
+        session = CollectionSession(lambda reason: self.end_session(session, reason), duration, cancel_event)
+        # Together, so a late end callback of the previous session can never see the new one as its own
+        with self._stop_lock:
+            self.session = session
+            self.is_collecting = True
+        return session.start()
         
-    def stop_collection(self):
+    def end_session(self, session, reason):
+        """Stop collecting when `session` finishes; ignored once a newer collection has replaced it"""
+        with self._stop_lock:
+            if session is not self.session or not self.is_collecting:
+                return
+            self.is_collecting = False
+        self._shutdown(session, reason)
+            
+    def stop_collection(self, reason=STOPPED):
         """Stop collecting typing patterns"""
-        self.is_collecting = False
+        with self._stop_lock:
+            if not self.is_collecting:
+                return
+            self.is_collecting = False
+            session = self.session
+        self._shutdown(session, reason)
+        
+    def _shutdown(self, session, reason):
+        # Caller has just cleared is_collecting for `session`
+        if self.listener is not None:
+            self.listener.stop()
+        self.consumer.stop()
+        if self.ring.dropped:
+            print(f"⚠️ {self.ring.dropped} keystrokes dropped - processing fell behind")
         print("Collection stopped.")
+        if session is not None:
+            session.finish(reason)
         
     def get_features(self):
         """Extract statistical features from collected typing data"""
-        if len(self.key_intervals) == 0 or len(self.key_hold_times) == 0:
+        self.consumer.flush()
+        intervals = self.interval_stats
+        holds = self.hold_stats
+        if intervals.count == 0 or holds.count == 0:
             return None
             
         features = {
             # Keystroke interval statistics
-            'interval_mean': np.mean(self.key_intervals),
-            'interval_std': np.std(self.key_intervals),
-            'interval_median': np.median(self.key_intervals),
-            'interval_min': np.min(self.key_intervals),
-            'interval_max': np.max(self.key_intervals),
+            'interval_mean': intervals.mean,
+            'interval_std': intervals.std,
+            'interval_median': intervals.median,
+            'interval_min': intervals.min,
+            'interval_max': intervals.max,
             
             # Key hold time statistics
-            'hold_mean': np.mean(self.key_hold_times),
-            'hold_std': np.std(self.key_hold_times),
-            'hold_median': np.median(self.key_hold_times),
-            'hold_min': np.min(self.key_hold_times),
-            'hold_max': np.max(self.key_hold_times),
+            'hold_mean': holds.mean,
+            'hold_std': holds.std,
+            'hold_median': holds.median,
+            'hold_min': holds.min,
+            'hold_max': holds.max,
             
             # Typing speed
-            'typing_speed': len(self.key_times) / (self.key_times[-1] - self.key_times[0]) if len(self.key_times) > 1 else 0,
+            'typing_speed': self.press_count / (self.last_press_time - self.first_press_time) if self.press_count > 1 else 0,
             
             # Additional rhythm features
-            'interval_variance': np.var(self.key_intervals),
-            'hold_variance': np.var(self.key_hold_times),
+            'interval_variance': intervals.variance,
+            'hold_variance': holds.variance,
             
             'timestamp': datetime.now().isoformat()
         }
@@ -1,24 +1,30 @@
 import numpy as np
 import json
 import os
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
 import joblib
-import matplotlib.pyplot as plt
+from datetime import datetime
+from model_artifact import SchemaMismatchError
+from scoring_engines import configured_engine, create_engine, decision_confidence, export_engine, load_engine
+
+DEFAULT_FEATURE_NAMES = [
+    'avg_dwell_time', 'std_dwell_time', 'avg_flight_time', 
+    'std_flight_time', 'typing_speed', 'rhythm_consistency', 'pressure_pattern'
+]
 
 class TypingPatternModel:
-    def __init__(self, model_path="typing_model.pkl", scaler_path="scaler.pkl"):
+    def __init__(self, model_path="typing_model.pkl", scaler_path="scaler.pkl", engine=None, feature_names=None):
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None
         self.model_path = model_path
         self.scaler_path = scaler_path
+        # Exported model artifact, so authentication never has to import sklearn
+        self.scorer_path = os.path.splitext(model_path)[0] + ".model"
+        # Detector trained by train_model(); see scoring_engines.ENGINES
+        self.engine = engine or configured_engine()
+        # Acceptance threshold on the decision score; set by calibrate() and saved with the scorer
+        self.threshold = 0.0
         self.is_trained = False
-        self.feature_names = [
-            'avg_dwell_time', 'std_dwell_time', 'avg_flight_time', 
-            'std_flight_time', 'typing_speed', 'rhythm_consistency', 'pressure_pattern'
-        ]
+        self.feature_names = list(feature_names or DEFAULT_FEATURE_NAMES)
         
     def load_training_data(self, filename="training_data.json"):
         """Load training data from JSON file"""
@@ -43,7 +49,7 @@ class TypingPatternModel:
             
         return np.array(features), len(data)
         
-    def train_model(self, training_file="training_data.json", contamination=0.1):
+    def train_model(self, training_file="training_data.json", contamination=0.1, n_estimators=100):
         """Train the typing pattern recognition model"""
         print("Loading training data...")
         X, num_sessions = self.load_training_data(training_file)
@@ -54,31 +60,54 @@ class TypingPatternModel:
             
         print(f"Training with {num_sessions} sessions...")
         
+        accuracy = self.fit(X, contamination, n_estimators)
+        normal_predictions = int(round(accuracy * len(X)))
+        
+        print(f"Training completed!")
+        print(f"Training accuracy: {accuracy:.2%}")
+        print(f"Model considers {normal_predictions}/{len(X)} training samples as normal")
+        return True
+        
+    def fit(self, X, contamination=0.1, n_estimators=100):
+        """Fit the scaler and engine on an n_samples x n_features matrix; returns training accuracy"""
+        # sklearn is only needed for training; scoring uses the exported engine
+        from sklearn.preprocessing import StandardScaler
+        
         # Normalize features
-        X_scaled = self.scaler.fit_transform(X)
+        self.scaler = StandardScaler()
+        X_scaled = self.scaler.fit_transform(np.asarray(X, dtype=np.float64))
         
-        # Use Isolation Forest for anomaly detection (one-class classification)
+        # Use one-class anomaly detection (Isolation Forest by default)
         # This treats the user's typing pattern as "normal" and everything else as anomalous
-        self.model = IsolationForest(
-            contamination=contamination,  # Expected proportion of outliers
-            random_state=42,
-            n_estimators=100
-        )
+        self.model = create_engine(self.engine, contamination, n_estimators)  # contamination = expected proportion of outliers
         
         # Train the model
         self.model.fit(X_scaled)
+        self.is_trained = True
         
         # Calculate training accuracy
         predictions = self.model.predict(X_scaled)
-        normal_predictions = np.sum(predictions == 1)
-        accuracy = normal_predictions / len(predictions)
+        return float(np.sum(predictions == 1) / len(predictions))
         
-        print(f"Training completed!")
-        print(f"Training accuracy: {accuracy:.2%}")
-        print(f"Model considers {normal_predictions}/{len(predictions)} training samples as normal")
+    def calibrate(self, training_file="training_data.json", workers=None):
+        """Choose contamination, tree count and threshold by leave-one-session-out EER, then retrain"""
+        from calibration import DEFAULT_GRID, calibrate, synthetic_impostors
         
-        self.is_trained = True
-        return True
+        X, num_sessions = self.load_training_data(training_file)
+        
+        if X is None or len(X) < 4:
+            print("Insufficient training data! Need at least 4 sessions to calibrate.")
+            return None
+            
+        # Single-user training data has no impostors, so sample them around the user's template
+        best, results = calibrate(X, synthetic_impostors(X), {self.engine: DEFAULT_GRID[self.engine]}, workers)
+        print(f"Calibrated over {len(results)} settings: contamination={best['contamination']}, "
+              f"trees={best['n_estimators']}, threshold={best['threshold']:.4f}, EER={best['eer']:.3f}")
+        
+        if not self.train_model(training_file, best["contamination"], best["n_estimators"]):
+            return None
+        self.threshold = best["threshold"]
+        return best
         
     def save_model(self):
         """Save the trained model and scaler"""
@@ -88,12 +117,28 @@ class TypingPatternModel:
             
         joblib.dump(self.model, self.model_path)
         joblib.dump(self.scaler, self.scaler_path)
+        export_engine(self.model, self.scaler, self.scorer_path, self.threshold, self.feature_schema(), self.artifact_metadata())
         print(f"Model saved to {self.model_path}")
         print(f"Scaler saved to {self.scaler_path}")
+        print(f"Scoring export saved to {self.scorer_path}")
         return True
         
     def load_model(self):
         """Load a previously trained model"""
+        if os.path.exists(self.scorer_path) and self._scorer_is_current():
+            try:
+                self.model = load_engine(self.scorer_path, self.feature_schema())
+                self.scaler = self.model.scaler
+                self.threshold = self.model.threshold
+                self.is_trained = True
+                print("Model loaded successfully!")
+                return True
+            except SchemaMismatchError as e:
+                print(f"Refusing model with a different feature layout: {e}")
+                return False
+            except Exception as e:
+                print(f"Error loading exported model, falling back to pickle: {e}")
+                
         if not os.path.exists(self.model_path) or not os.path.exists(self.scaler_path):
             print("Model files not found!")
             return False
@@ -102,38 +147,83 @@ class TypingPatternModel:
             self.model = joblib.load(self.model_path)
             self.scaler = joblib.load(self.scaler_path)
             self.is_trained = True
-            print("Model loaded successfully!")
-            return True
         except Exception as e:
             print(f"Error loading model: {e}")
             return False
             
-    def authenticate(self, features_dict, threshold=0.0):
-        """Authenticate user based on typing pattern"""
+        try:
+            # Export once so later launches can skip sklearn entirely
+            export_engine(self.model, self.scaler, self.scorer_path, self.threshold, self.feature_schema(), self.artifact_metadata())
+        except Exception as e:
+            print(f"Could not export model for fast loading: {e}")
+            
+        print("Model loaded successfully!")
+        return True
+            
+    def feature_schema(self):
+        """Feature layout the exported model must be scored with"""
+        return {"features": list(self.feature_names)}
+        
+    def artifact_metadata(self):
+        """Training metadata stored in the model artifact header"""
+        return {
+            "trained_at": datetime.now().isoformat(),
+            "training_samples": int(np.max(getattr(self.scaler, "n_samples_seen_", 0))),
+            "model_path": self.model_path
+        }
+        
+    def _scorer_is_current(self):
+        """True unless the pickled model was rewritten after the scorer was exported"""
+        if not os.path.exists(self.model_path):
+            return True
+        return os.path.getmtime(self.scorer_path) >= os.path.getmtime(self.model_path)
+        
+    def feature_vector(self, features_dict):
+        """Convert a features dict to a 1 x n_features array"""
+        return np.array([features_dict.get(name, 0) for name in self.feature_names], dtype=np.float64).reshape(1, -1)
+        
+    def feature_matrix(self, features):
+        """Convert a list of features dicts (or an existing array) to an n x n_features array"""
+        if isinstance(features, np.ndarray):
+            return features.astype(np.float64).reshape(-1, len(self.feature_names))
+        return np.array(
+            [[features_dict.get(name, 0) for name in self.feature_names] for features_dict in features],
+            dtype=np.float64
+        ).reshape(-1, len(self.feature_names))
+        
+    def score(self, features_dict):
+        """Get the raw decision score for a features dict (negative means anomalous)"""
+        return self.score_batch([features_dict])[0]
+        
+    def score_batch(self, features):
+        """Get raw decision scores for many feature dicts with one transform and one decision_function"""
+        return self.model.decision_function(self.scaler.transform(self.feature_matrix(features)))
+        
+    def authenticate(self, features_dict, threshold=None):
+        """Authenticate user based on typing pattern (threshold=None uses the calibrated one)"""
         if not self.is_trained:
             print("Model not trained! Please train the model first.")
             return False, 0.0
             
-        # Convert features dict to vector
-        feature_vector = []
-        for feature_name in self.feature_names:
-            feature_vector.append(features_dict.get(feature_name, 0))
-            
-        feature_vector = np.array(feature_vector).reshape(1, -1)
-        
-        # Scale features
-        feature_vector_scaled = self.scaler.transform(feature_vector)
+        return self.authenticate_batch([features_dict], threshold)[0]
         
-        # Get prediction and decision score
-        prediction = self.model.predict(feature_vector_scaled)[0]
-        decision_score = self.model.decision_function(feature_vector_scaled)[0]
+    def authenticate_batch(self, features, threshold=None):
+        """Authenticate many typing samples at once; returns one (is_authentic, confidence) per sample"""
+        if not self.is_trained:
+            print("Model not trained! Please train the model first.")
+            return [(False, 0.0)] * len(features)
+            
+        if threshold is None:
+            threshold = self.threshold
+            
+        decision_scores = self.score_batch(features)
         
-        # Convert decision score to confidence (0-1 scale)
-        confidence = max(0, min(1, (decision_score + 0.5) / 1.0))
+        # Convert decision scores to confidence (0-1 scale, 0.5 at the threshold)
+        confidences = decision_confidence(decision_scores, threshold)
         
-        is_authentic = prediction == 1 and decision_score >= threshold
+        is_authentic = decision_scores >= threshold
         
-        return is_authentic, confidence
+        return [(bool(authentic), float(confidence)) for authentic, confidence in zip(is_authentic, confidences)]
         
     def get_model_info(self):
         """Get information about the trained model"""
@@ -141,9 +231,11 @@ class TypingPatternModel:
             return "Model not trained"
             
         info = {
-            'model_type': 'Isolation Forest',
+            'model_type': self.engine,
+            'scorer': type(self.model).__name__,
             'features': self.feature_names,
             'is_trained': self.is_trained,
+            'threshold': self.threshold,
             'model_path': self.model_path,
             'scaler_path': self.scaler_path
         }
@@ -152,6 +244,8 @@ class TypingPatternModel:
         
     def visualize_training_data(self, training_file="training_data.json"):
         """Visualize the training data distribution"""
+        import matplotlib.pyplot as plt
+        
         X, num_sessions = self.load_training_data(training_file)
         
         if X is None:
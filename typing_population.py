@@ -0,0 +1,384 @@
+"""
+Synthetic Typing Population
+Seeded per-user timing profiles that emit keystroke sessions in the formats the collectors, storage and web API consume
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+import zlib
+import numpy as np
+from keystroke_events import KeystrokeEventBuffer, KEY_DOWN, KEY_UP
+from phrase_template import phrase_timings
+
+# The web app's training texts
+TRAINING_TEXTS = [
+    "I love to eat pizza and ice cream on sunny days.",
+    "My cat likes to sleep on the warm window sill.",
+    "The blue car drove slowly down the quiet street.",
+    "She reads books every night before going to bed.",
+    "We went to the park to play with our friends.",
+    "The red apple tastes sweet and fresh from the tree.",
+    "He walks his dog every morning at seven o clock.",
+    "The children play games in the backyard after school.",
+    "I like to drink coffee while watching the sunrise.",
+    "The small bird sings beautiful songs in the garden.",
+    "We cook dinner together as a family every Sunday.",
+    "The green grass grows tall in the summer months."
+]
+
+# Keys with their own timing offsets; anything else shares the last slot
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789 .,'"
+OTHER_KEY = len(ALPHABET)
+SHIFT_KEY = "Shift"
+BACKSPACE_KEY = "Backspace"
+# Browser (web API) key names as the pynput hook reports them to the collectors
+PYNPUT_KEY_NAMES = {" ": "Key.space", SHIFT_KEY: "Key.shift", BACKSPACE_KEY: "Key.backspace"}
+
+# Independent random streams per role, so adding impostors never changes the users
+USER_STREAM = 0
+IMPOSTOR_STREAM = 1
+SHARED_STREAM = 2
+
+
+def key_index(char):
+    """Timing-table slot of a typed character (case-insensitive)"""
+    index = ALPHABET.find(char.lower())
+    return index if index >= 0 else OTHER_KEY
+
+
+class TypistProfile:
+    """Parametric timing profile of one synthetic typist
+
+    Hold times and press-to-press latencies are log-normal around the
+    user's medians. Each key scales the hold median and each digraph the
+    latency median by exp(offset), from the user's offset tables, which
+    already include the population's shared offsets, so common digraphs
+    are fast for everybody yet every typist keeps their own rhythm. After a
+    space a pause is added with probability pause_rate; each character is
+    mistyped with probability error_rate and, with probability
+    correction_rate, fixed with Backspace.
+    """
+
+    def __init__(self, user_id, dwell_median, dwell_sigma, latency_median, latency_sigma, pause_rate, pause_mean,
+                 error_rate, correction_rate, key_offsets, digraph_offsets, tempo_sigma=0.08, correction_delay=0.25):
+        self.user_id = user_id
+        self.dwell_median = dwell_median
+        self.dwell_sigma = dwell_sigma
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.pause_rate = pause_rate
+        self.pause_mean = pause_mean
+        self.error_rate = error_rate
+        self.correction_rate = correction_rate
+        self.key_offsets = np.asarray(key_offsets, dtype=np.float64)
+        self.digraph_offsets = np.asarray(digraph_offsets, dtype=np.float64)
+        self.tempo_sigma = tempo_sigma
+        self.correction_delay = correction_delay
+
+    @classmethod
+    def sample(cls, user_id, rng, shared_key_offsets, shared_digraph_offsets):
+        """Draw a typist from the population distributions (all times in seconds)"""
+        return cls(
+            user_id,
+            dwell_median=float(np.exp(rng.normal(np.log(0.095), 0.2))),
+            dwell_sigma=float(rng.uniform(0.2, 0.4)),
+            latency_median=float(np.exp(rng.uniform(np.log(0.12), np.log(0.35)))),
+            latency_sigma=float(rng.uniform(0.3, 0.55)),
+            pause_rate=float(rng.uniform(0.02, 0.2)),
+            pause_mean=float(rng.uniform(0.2, 1.0)),
+            error_rate=float(rng.uniform(0.005, 0.05)),
+            correction_rate=float(rng.uniform(0.8, 1.0)),
+            key_offsets=shared_key_offsets + rng.normal(0.0, 0.12, shared_key_offsets.shape),
+            digraph_offsets=shared_digraph_offsets + rng.normal(0.0, rng.uniform(0.1, 0.3), shared_digraph_offsets.shape)
+        )
+
+    def to_dict(self):
+        """JSON-safe form, e.g. to pin a population's profiles in a file"""
+        return {
+            "user_id": self.user_id,
+            "dwell_median": self.dwell_median,
+            "dwell_sigma": self.dwell_sigma,
+            "latency_median": self.latency_median,
+            "latency_sigma": self.latency_sigma,
+            "pause_rate": self.pause_rate,
+            "pause_mean": self.pause_mean,
+            "error_rate": self.error_rate,
+            "correction_rate": self.correction_rate,
+            "key_offsets": self.key_offsets.tolist(),
+            "digraph_offsets": self.digraph_offsets.tolist(),
+            "tempo_sigma": self.tempo_sigma,
+            "correction_delay": self.correction_delay
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a profile saved with to_dict(); missing offset tables mean no per-key variation"""
+        data = dict(data)
+        data.setdefault("key_offsets", np.zeros(OTHER_KEY + 1))
+        data.setdefault("digraph_offsets", np.zeros((OTHER_KEY + 1, OTHER_KEY + 1)))
+        return cls(**data)
+
+    def type_text(self, text, rng):
+        """Simulate typing `text` once; returns a SyntheticSession"""
+        chars = list(text)
+        mistakes = rng.random(len(chars)) < self.error_rate
+        corrected = rng.random(len(chars)) < self.correction_rate
+        wrong_keys = rng.integers(0, 26, len(chars))
+
+        # Keys actually pressed, in order; a corrected mistake is wrong key + Backspace + intended key
+        keys, typed = [], []
+        for char, mistake, fix, wrong in zip(chars, mistakes.tolist(), corrected.tolist(), wrong_keys.tolist()):
+            if mistake and char != " ":
+                wrong_char = ALPHABET[wrong]
+                keys.append(wrong_char)
+                if not fix:
+                    typed.append(wrong_char)
+                    continue
+                keys.append(BACKSPACE_KEY)
+            keys.append(char)
+            typed.append(char)
+
+        n = len(keys)
+        slots = np.array([key_index(key) for key in keys], dtype=np.int64)
+        previous = np.concatenate([slots[:1], slots[:-1]])
+        tempo = np.exp(rng.normal(0.0, self.tempo_sigma))
+
+        dwell = self.dwell_median * tempo * np.exp(self.key_offsets[slots] + self.dwell_sigma * rng.standard_normal(n))
+        latency = self.latency_median * tempo * np.exp(self.digraph_offsets[previous, slots] + self.latency_sigma * rng.standard_normal(n))
+        is_backspace = np.array([key == BACKSPACE_KEY for key in keys])
+        latency[is_backspace] += self.correction_delay * np.exp(0.3 * rng.standard_normal(int(is_backspace.sum())))
+        after_space = np.concatenate([[False], np.array(keys[:-1]) == " "]) if n else np.zeros(0, dtype=bool)
+        pauses = after_space & (rng.random(n) < self.pause_rate)
+        latency[pauses] += rng.exponential(self.pause_mean, int(pauses.sum()))
+        if n:
+            latency[0] = 0.0
+
+        press = np.cumsum(latency)
+        # The same key cannot go down again before it came up
+        repeats = np.flatnonzero(slots[:-1] == slots[1:]) if n else np.zeros(0, dtype=np.int64)
+        dwell[repeats] = np.minimum(dwell[repeats], 0.8 * latency[repeats + 1])
+        release = press + dwell
+        return SyntheticSession(self.user_id, text, "".join(typed), keys, press, release)
+
+
+class SyntheticSession:
+    """One simulated typing of a text, as pressed keys with press/release times in seconds from the first press
+
+    Capital letters are typed with Shift held around them.
+    """
+
+    def __init__(self, user_id, text, typed_text, keys, press, release):
+        self.user_id = user_id
+        self.text = text
+        self.typed_text = typed_text
+        self.keys = keys
+        self.press = press
+        self.release = release
+
+    @property
+    def duration(self):
+        return float(self.release.max()) if len(self.release) else 0.0
+
+    def events(self):
+        """(seconds, browser key name, KEY_DOWN/KEY_UP) in time order, Shift events included"""
+        events = []
+        for key, down, up in zip(self.keys, self.press.tolist(), self.release.tolist()):
+            if key.isupper():
+                events.append((max(down - 0.06, 0.0), SHIFT_KEY, KEY_DOWN))
+                events.append((up + 0.03, SHIFT_KEY, KEY_UP))
+            events.append((down, key, KEY_DOWN))
+            events.append((up, key, KEY_UP))
+        events.sort(key=lambda event: event[0])
+        return events
+
+    def keystrokes(self):
+        """Stored/web format: [{'key', 'type', 'timestamp'}] with integer ms since the session started"""
+        return [
+            {"key": key, "type": "down" if event_type == KEY_DOWN else "up", "timestamp": int(round(timestamp * 1000))}
+            for timestamp, key, event_type in self.events()
+        ]
+
+    def payload(self):
+        """Body of POST /api/keystroke/save (and KeystrokeStorage.save_keystroke_session), as the web app sends it"""
+        minutes = max(self.duration, 1e-3) / 60
+        matching = sum(1 for typed, target in zip(self.typed_text, self.text) if typed == target)
+        return {
+            "user_id": self.user_id,
+            "text": self.text,
+            "keystrokes": self.keystrokes(),
+            "typing_speed": round(len(self.text.split(" ")) / minutes),
+            "accuracy": matching / len(self.text) if self.text else 0,
+            "duration": self.duration
+        }
+
+    def collector_events(self, start=0.0):
+        """(timestamp, key name, event_type) for KeystrokeCollector/TypingPatternCollector.process_event"""
+        return [(start + timestamp, PYNPUT_KEY_NAMES.get(key, key), event_type) for timestamp, key, event_type in self.events()]
+
+    def event_buffer(self, start=0.0):
+        """The session as the KeystrokeEventBuffer a live collector would have filled"""
+        buffer = KeystrokeEventBuffer(capacity=2 * len(self.keys) + 2)
+        for timestamp, key, event_type in self.collector_events(start):
+            buffer.append(timestamp, key, event_type)
+        return buffer
+
+    def feed(self, collector, start=None):
+        """Replay the session into a collector's event handler as if it had just been typed live"""
+        start = time.time() - self.duration if start is None else start
+        for timestamp, key, event_type in self.collector_events(start):
+            collector.process_event(timestamp, key, event_type)
+
+    def dsl_vector(self):
+        """[H, DD, UD, ...] per phrase position as in the CMU DSL dataset, or None unless typed correctly"""
+        typed, vector = phrase_timings(self.event_buffer(), self.text)
+        if typed != self.text:
+            return None
+        holds, latencies = vector[0::2], vector[1::2]
+        row = []
+        for i, latency in enumerate(latencies.tolist()):
+            row.extend([holds[i], latency, latency - holds[i]])
+        row.append(holds[-1])
+        return row
+
+
+def dsl_columns(phrase):
+    """CMU-DSL-style timing column names for a phrase"""
+    names = ["space" if char == " " else char for char in phrase]
+    columns = []
+    for current, following in zip(names, names[1:]):
+        columns.extend([f"H.{current}", f"DD.{current}.{following}", f"UD.{current}.{following}"])
+    columns.append(f"H.{names[-1]}")
+    return columns
+
+
+class TypingPopulation:
+    """Reproducible population of enrolled users and impostors
+
+    Every profile and session draws from its own generator seeded by
+    (seed, stream, index), so any user or session can be regenerated alone,
+    in any order or in parallel, and always comes out the same.
+    """
+
+    def __init__(self, seed=0, shared_digraph_spread=0.25):
+        self.seed = seed
+        rng = np.random.default_rng([seed, SHARED_STREAM])
+        self.shared_key_offsets = rng.normal(0.0, 0.15, OTHER_KEY + 1)
+        self.shared_digraph_offsets = rng.normal(0.0, shared_digraph_spread, (OTHER_KEY + 1, OTHER_KEY + 1))
+
+    def profile(self, index, impostor=False):
+        """The index-th enrolled user (user_00000, ...) or impostor (impostor_00000, ...)"""
+        stream = IMPOSTOR_STREAM if impostor else USER_STREAM
+        user_id = f"{'impostor' if impostor else 'user'}_{index:05d}"
+        rng = np.random.default_rng([self.seed, stream, index])
+        return TypistProfile.sample(user_id, rng, self.shared_key_offsets, self.shared_digraph_offsets)
+
+    def session(self, profile, index, text=None):
+        """The index-th session of a profile; without a text one of TRAINING_TEXTS is chosen"""
+        rng = np.random.default_rng([self.seed, zlib.crc32(profile.user_id.encode("utf-8")), index])
+        if text is None:
+            text = TRAINING_TEXTS[int(rng.integers(len(TRAINING_TEXTS)))]
+        return profile.type_text(text, rng)
+
+    def sessions(self, profile, count, text=None, start=0):
+        """Yield `count` consecutive sessions of one profile"""
+        for index in range(start, start + count):
+            yield self.session(profile, index, text)
+
+    def generate(self, users, sessions_per_user, impostors=0, impostor_sessions=1, text=None, profiles=None):
+        """Yield (profile, session) for every user, then every impostor, streaming so any size fits in memory
+
+        `profiles` replaces the sampled enrolled users with given TypistProfiles.
+        """
+        enrolled = profiles if profiles is not None else (self.profile(i) for i in range(users))
+        for profile in enrolled:
+            for session in self.sessions(profile, sessions_per_user, text):
+                yield profile, session
+        for i in range(impostors):
+            profile = self.profile(i, impostor=True)
+            for session in self.sessions(profile, impostor_sessions, text):
+                yield profile, session
+
+
+def main():
+    """Generate a synthetic typing population"""
+    parser = argparse.ArgumentParser(description="Generate reproducible synthetic keystroke sessions")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions per enrolled user")
+    parser.add_argument("--impostors", type=int, default=0)
+    parser.add_argument("--impostor-sessions", type=int, default=1, help="Sessions per impostor")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--text", default=None, help="Fixed text for every session (default: the web app's training texts)")
+    parser.add_argument("--profiles", default=None, help="JSON list of TypistProfile dicts to use as the enrolled users")
+    parser.add_argument("--save-profiles", default=None, help="Write the enrolled users' profiles to this JSON file")
+    parser.add_argument("--format", choices=["jsonl", "csv", "storage"], default="jsonl",
+                        help="jsonl: one /api/keystroke/save body per line; csv: CMU-DSL rows (needs --text); "
+                             "storage: save through KeystrokeStorage into ./keystroke_data")
+    parser.add_argument("--output", default="-", help="Output file for jsonl/csv ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.format == "csv" and not args.text:
+        parser.error("--format csv needs a fixed --text")
+
+    population = TypingPopulation(args.seed)
+    profiles = None
+    if args.profiles:
+        with open(args.profiles, 'r') as f:
+            profiles = [TypistProfile.from_dict(data) for data in json.load(f)]
+    if args.save_profiles:
+        saved = profiles if profiles is not None else [population.profile(i) for i in range(args.users)]
+        with open(args.save_profiles, 'w') as f:
+            json.dump([profile.to_dict() for profile in saved], f)
+
+    log = sys.stderr
+    print("🧬 SYNTHETIC TYPING POPULATION", file=log)
+    print("=" * 40, file=log)
+    started = time.perf_counter()
+    count = skipped = 0
+    generated = population.generate(args.users, args.sessions, args.impostors, args.impostor_sessions, args.text, profiles)
+
+    if args.format == "storage":
+        import contextlib
+        import io
+        from keystroke_storage import KeystrokeStorage
+
+        storages = {}
+        for profile, session in generated:
+            storage = storages.get(profile.user_id)
+            if storage is None:
+                storage = storages[profile.user_id] = KeystrokeStorage(profile.user_id)
+            with contextlib.redirect_stdout(io.StringIO()):
+                storage.save_keystroke_session(session.payload())
+            count += 1
+    else:
+        output = sys.stdout if args.output == "-" else open(args.output, 'w', newline='')
+        try:
+            if args.format == "csv":
+                writer = csv.writer(output)
+                writer.writerow(["subject", "sessionIndex", "rep"] + dsl_columns(args.text))
+                reps = {}
+                for profile, session in generated:
+                    row = session.dsl_vector()
+                    if row is None:
+                        skipped += 1
+                        continue
+                    rep = reps[profile.user_id] = reps.get(profile.user_id, 0) + 1
+                    writer.writerow([profile.user_id, 1, rep] + [f"{value:.4f}" for value in row])
+                    count += 1
+            else:
+                for profile, session in generated:
+                    output.write(json.dumps(session.payload()) + "\n")
+                    count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {count} sessions in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f}/s)"
+          + (f", {skipped} with uncorrected errors skipped" if skipped else ""), file=log)
+
+
+if __name__ == "__main__":
+    main()
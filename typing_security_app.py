@@ -14,6 +14,7 @@ import os
 from keystroke_collector import KeystrokeCollector
 from typing_model import TypingPatternModel
 from security_system import SecuritySystem
+from keystroke_events import KeystrokeEventBuffer, KEY_DOWN, KEY_UP
 
 class TypingSecurityApp:
     def __init__(self, root):
@@ -34,7 +35,8 @@ class TypingSecurityApp:
         self.training_active = False
         self.current_session = 0
         self.total_sessions = 0
-        self.training_data = []
+        self.training_data = KeystrokeEventBuffer()
+        self.session_events = KeystrokeEventBuffer()
         self.start_time = None
         
         # Sample texts for training
@@ -440,7 +442,7 @@ class TypingSecurityApp:
             
         self.training_active = True
         self.current_session = 0
-        self.training_data = []
+        self.training_data.clear()
         
         # Update UI
         self.start_btn.config(state=tk.DISABLED)
@@ -477,7 +479,7 @@ class TypingSecurityApp:
         
         # Start session timer
         self.start_time = time.time()
-        self.session_keystroke_data = []
+        self.session_events.clear()
         self.update_session_timer()
         
     def update_session_timer(self):
@@ -499,8 +501,8 @@ class TypingSecurityApp:
     def end_current_session(self):
         """End the current training session"""
         # Save session data
-        if self.session_keystroke_data:
-            self.training_data.extend(self.session_keystroke_data)
+        if len(self.session_events):
+            self.training_data.extend(self.session_events)
             
         self.progress_var.set(f"Session {self.current_session} completed! Preparing next session...")
         
@@ -511,21 +513,13 @@ class TypingSecurityApp:
         """Handle key press events during training"""
         if self.training_active and self.start_time:
             timestamp = time.time() - self.start_time
-            self.session_keystroke_data.append({
-                'key': event.keysym,
-                'time': timestamp,
-                'event': 'press'
-            })
+            self.session_events.append(timestamp, event.keysym, KEY_DOWN)
             
     def on_key_release(self, event):
         """Handle key release events during training"""
         if self.training_active and self.start_time:
             timestamp = time.time() - self.start_time
-            self.session_keystroke_data.append({
-                'key': event.keysym,
-                'time': timestamp,
-                'event': 'release'
-            })
+            self.session_events.append(timestamp, event.keysym, KEY_UP)
             
     def stop_training(self):
         """Stop the training process"""
@@ -0,0 +1,187 @@
+"""
+Running Typing Statistics
+Constant-memory accumulators for dwell, flight and interval features
+"""
+
+import math
+from collections import deque
+
+
+class P2Quantile:
+    """Streaming quantile estimate using the P² algorithm (Jain & Chlamtac)
+
+    Keeps five markers regardless of how many values are added. Until five
+    values have been seen the exact quantile is returned.
+    """
+
+    def __init__(self, p=0.5):
+        self.p = p
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x):
+        """Add one observation"""
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._initial.sort()
+                p = self.p
+                self._heights = list(self._initial)
+                self._positions = [0, 1, 2, 3, 4]
+                self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+            return
+
+        q = self._heights
+        n = self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the three middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = candidate
+                n[i] += step
+
+    @property
+    def value(self):
+        """Current quantile estimate (NaN if nothing has been added)"""
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return math.nan
+        # Exact quantile with linear interpolation, as numpy.quantile does
+        values = sorted(self._initial)
+        position = self.p * (len(values) - 1)
+        lower = math.floor(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class RunningStats:
+    """Welford mean/variance, min/max and a streaming median for one timing series"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget every value seen so far"""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._median = P2Quantile(0.5)
+
+    def add(self, x):
+        """Add one interval"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self._median.add(x)
+
+    @property
+    def variance(self):
+        """Population variance, matching numpy.var"""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        """Population standard deviation, matching numpy.std"""
+        return math.sqrt(self.variance)
+
+    @property
+    def median(self):
+        return self._median.value
+
+    def summary(self, prefix=""):
+        """Get every statistic as a feature dict, optionally with a key prefix"""
+        return {
+            f"{prefix}count": self.count,
+            f"{prefix}mean": self.mean,
+            f"{prefix}std": self.std,
+            f"{prefix}median": self.median,
+            f"{prefix}min": self.min,
+            f"{prefix}max": self.max,
+            f"{prefix}variance": self.variance
+        }
+
+
+class SlidingWindowStats:
+    """Mean and standard deviation over the most recent `size` values
+
+    Sums are updated as values enter and leave the window, and re-summed
+    once per full window turnover so rounding error cannot build up.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._since_resync = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, x):
+        """Add a value, evicting the oldest one once the window is full"""
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self._sum -= old
+            self._sum_sq -= old * old
+        self.values.append(x)
+        self._sum += x
+        self._sum_sq += x * x
+        self._since_resync += 1
+        if self._since_resync >= self.size:
+            self._sum = math.fsum(self.values)
+            self._sum_sq = math.fsum(v * v for v in self.values)
+            self._since_resync = 0
+
+    def clear(self):
+        """Empty the window"""
+        self.values.clear()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._since_resync = 0
+
+    @property
+    def mean(self):
+        return self._sum / len(self.values) if self.values else 0.0
+
+    @property
+    def std(self):
+        """Population standard deviation of the window"""
+        if not self.values:
+            return 0.0
+        mean = self.mean
+        return math.sqrt(max(self._sum_sq / len(self.values) - mean * mean, 0.0))
@@ -12,15 +12,26 @@ import time
 import json
 import urllib.parse
 from mobile_alert_backend import MobileAlertSystem
-from keystroke_storage import KeystrokeStorage
+from keystroke_storage import KeystrokeStorageCache
+from model_registry import MODEL_REGISTRY
+from training_jobs import TrainingJobManager
+
+DEFAULT_USER_ID = "main_user"
+MAX_CACHED_USERS = 32          # KeystrokeStorage instances kept open
+MAX_CACHED_MODELS = 16         # Trained models kept in memory
+MAX_MODEL_CACHE_MB = 256       # Upper bound on cached model artifact size
+TRAINING_WORKERS = 2           # Training jobs run in parallel (different users only)
 
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory="web_app", **kwargs)
+        # Shared state must exist before super().__init__, which handles the request
         if not hasattr(self.__class__, 'alert_system'):
             self.__class__.alert_system = MobileAlertSystem()
-        if not hasattr(self.__class__, 'keystroke_storage'):
-            self.__class__.keystroke_storage = KeystrokeStorage("main_user")
+        if not hasattr(self.__class__, 'keystroke_storages'):
+            self.__class__.keystroke_storages = KeystrokeStorageCache(MAX_CACHED_USERS)
+        if not hasattr(self.__class__, 'training_jobs'):
+            self.__class__.training_jobs = TrainingJobManager(TRAINING_WORKERS, self.__class__.on_training_complete)
+        super().__init__(*args, directory="web_app", **kwargs)
     
     def end_headers(self):
         self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate, max-age=0')
@@ -37,9 +48,24 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_response(200)
         self.end_headers()
         
+    @classmethod
+    def on_training_complete(cls, job):
+        """Pick up the model fields and caches a background training job rewrote"""
+        if job["status"] == "completed":
+            storage = cls.keystroke_storages.get(job["user_id"])
+            storage.adopt_trained_model(job["result"]["model_profile"])
+        print(f"🤖 Training job {job['job_id']} for {job['user_id']}: {job['status']} in {job['duration']:.1f}s")
+        
+    def do_GET(self):
+        """Serve training job status; everything else is a static file"""
+        if self.path.startswith('/api/keystroke/train/'):
+            self.handle_get_training_job()
+        else:
+            super().do_GET()
+            
     def do_POST(self):
         """Handle POST requests for API endpoints"""
-        if self.path.startswith('/api/alert/'):
+        if self.path.startswith(('/api/alert/', '/api/keystroke/', '/api/remote/')):
             self.handle_alert_api()
         else:
             super().do_POST()
@@ -63,18 +89,28 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 self.handle_save_keystroke_session(data)
             elif self.path == '/api/keystroke/train':
                 self.handle_train_model(data)
+            elif self.path.startswith('/api/keystroke/train/'):
+                self.handle_get_training_job()
             elif self.path == '/api/keystroke/authenticate':
                 self.handle_authenticate_typing(data)
+            elif self.path == '/api/keystroke/authenticate/batch':
+                self.handle_authenticate_typing_batch(data)
             elif self.path == '/api/keystroke/stats':
-                self.handle_get_keystroke_stats()
+                self.handle_get_keystroke_stats(data)
             elif self.path == '/api/remote/command':
                 self.handle_remote_command(data)
             else:
                 self.send_error(404, "API endpoint not found")
                 
+        except ValueError as e:
+            self.send_json_response({"success": False, "error": str(e)}, 400)
         except Exception as e:
             self.send_json_response({"success": False, "error": str(e)}, 500)
             
+    def keystroke_storage(self, data):
+        """Get the KeystrokeStorage for the request's user_id"""
+        return self.keystroke_storages.get(data.get("user_id", DEFAULT_USER_ID))
+        
     def handle_test_alert(self, data):
         """Handle alert testing"""
         alert_type = data.get('type', 'all')
@@ -168,45 +204,55 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             
     def handle_save_keystroke_session(self, data):
         """Save keystroke training session"""
+        storage = self.keystroke_storage(data)
         try:
-            session_id = self.keystroke_storage.save_keystroke_session(data)
+            session_id = storage.save_keystroke_session(data)
             response = {
                 "success": True,
                 "message": f"Training session {session_id} saved successfully",
+                "user_id": storage.user_id,
                 "session_id": session_id,
-                "total_sessions": len(self.keystroke_storage.load_all_sessions())
+                "total_sessions": storage.session_count()
             }
             self.send_json_response(response)
         except Exception as e:
             self.send_json_response({"success": False, "error": str(e)}, 500)
             
     def handle_train_model(self, data):
-        """Train the typing pattern recognition model"""
+        """Start (or join) a background training job for the user's typing model"""
+        storage = self.keystroke_storage(data)
         try:
-            success = self.keystroke_storage.train_model()
-            if success:
-                stats = self.keystroke_storage.get_user_stats()
-                response = {
-                    "success": True,
-                    "message": "Model trained successfully!",
-                    "accuracy": stats["profile"]["model_accuracy"],
-                    "is_trained": stats["profile"]["is_trained"]
-                }
-            else:
-                response = {
-                    "success": False,
-                    "message": "Model training failed. Need at least 3 training sessions."
-                }
-            self.send_json_response(response)
+            job, coalesced = self.training_jobs.submit(storage.user_id)
+            response = {
+                "success": True,
+                "user_id": storage.user_id,
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "coalesced": coalesced,
+                "status_url": f"/api/keystroke/train/{job['job_id']}",
+                "message": "Training already queued" if coalesced else "Training started"
+            }
+            self.send_json_response(response, 202)
         except Exception as e:
             self.send_json_response({"success": False, "error": str(e)}, 500)
             
+    def handle_get_training_job(self):
+        """Report a training job's status, progress, duration and accuracy"""
+        job_id = self.path.rstrip('/').rsplit('/', 1)[-1]
+        job = self.training_jobs.get(job_id)
+        if job is None:
+            self.send_json_response({"success": False, "error": f"Unknown training job: {job_id}"}, 404)
+        else:
+            self.send_json_response({"success": True, "job": job})
+            
     def handle_authenticate_typing(self, data):
         """Authenticate user based on typing pattern"""
+        storage = self.keystroke_storage(data)
         try:
-            is_authentic, confidence = self.keystroke_storage.authenticate_typing(data)
+            is_authentic, confidence = storage.authenticate_typing(data)
             response = {
                 "success": True,
+                "user_id": storage.user_id,
                 "is_authentic": is_authentic,
                 "confidence": confidence,
                 "message": "Authentication completed"
@@ -215,13 +261,38 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_json_response({"success": False, "error": str(e)}, 500)
             
-    def handle_get_keystroke_stats(self):
+    def handle_authenticate_typing_batch(self, data):
+        """Authenticate a list of typing sessions, extracted feature dicts or feature rows in one model call"""
+        storage = self.keystroke_storage(data)
+        try:
+            # "sessions" may mix all three forms; "features" and "rows" name the batch by its form
+            attempts = data.get("sessions") or data.get("features") or data.get("rows") or []
+            results = storage.authenticate_typing_batch(attempts)
+            response = {
+                "success": True,
+                "user_id": storage.user_id,
+                "count": len(results),
+                "authentic_count": sum(1 for is_authentic, _ in results if is_authentic),
+                "results": [
+                    {"is_authentic": is_authentic, "confidence": confidence}
+                    for is_authentic, confidence in results
+                ],
+                "message": "Batch authentication completed"
+            }
+            self.send_json_response(response)
+        except Exception as e:
+            self.send_json_response({"success": False, "error": str(e)}, 500)
+            
+    def handle_get_keystroke_stats(self, data):
         """Get keystroke statistics and user profile"""
+        storage = self.keystroke_storage(data)
         try:
-            stats = self.keystroke_storage.get_user_stats()
+            stats = storage.get_user_stats()
             response = {
                 "success": True,
-                "stats": stats
+                "user_id": storage.user_id,
+                "stats": stats,
+                "cache": self.keystroke_storages.get_stats()
             }
             self.send_json_response(response)
         except Exception as e:
@@ -347,6 +418,16 @@ def start_server():
     """Start the web server"""
     PORT = 8080
     
+    # Load typing models up front so first authentications are not slowed by unpickling
+    MODEL_REGISTRY.configure(MAX_CACHED_MODELS, MAX_MODEL_CACHE_MB * 1024 * 1024)
+    CustomHTTPRequestHandler.keystroke_storages = KeystrokeStorageCache(MAX_CACHED_USERS)
+    CustomHTTPRequestHandler.training_jobs = TrainingJobManager(TRAINING_WORKERS, CustomHTTPRequestHandler.on_training_complete)
+    preloaded = CustomHTTPRequestHandler.keystroke_storages.preload(
+        KeystrokeStorageCache.trained_user_ids()[:MAX_CACHED_MODELS]
+    )
+    if preloaded:
+        print(f"🧠 Preloaded {preloaded} typing model(s)")
+    
     try:
         with socketserver.TCPServer(("", PORT), CustomHTTPRequestHandler) as httpd:
             print("🚀 KEYSTROKE SECURITY WEB APP")
@@ -385,6 +466,8 @@ def start_server():
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
         print("👋 Goodbye!")
+    finally:
+        CustomHTTPRequestHandler.training_jobs.shutdown()
 
 if __name__ == "__main__":
     # Change to the project directory